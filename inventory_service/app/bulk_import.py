@@ -0,0 +1,156 @@
+import codecs
+import csv
+import json
+import os
+from typing import AsyncIterator, Literal, Optional, Union
+
+# Default number of validated rows written per upsert statement
+IMPORT_BATCH_SIZE: int = int(os.getenv("INVENTORY_IMPORT_BATCH_SIZE", "500"))
+# Upper bound on per-row errors kept in an import report
+MAX_REPORTED_ERRORS: int = int(os.getenv("INVENTORY_IMPORT_MAX_ERRORS", "1000"))
+
+ImportFormat = Literal["csv", "ndjson"]
+
+CONTENT_TYPE_FORMATS: dict[str, ImportFormat] = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/x-jsonlines": "ndjson",
+}
+
+
+def detect_format(content_type: Optional[str]) -> Optional[ImportFormat]:
+    """
+    Maps a request ``Content-Type`` header to an import format.
+
+    :param content_type: The raw ``Content-Type`` header, parameters included.
+    :type content_type: Optional[str]
+    :return: ``"csv"``, ``"ndjson"``, or None if the type is not recognised.
+    :rtype: Optional[ImportFormat]
+    """
+
+    if not content_type:
+        return None
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return CONTENT_TYPE_FORMATS.get(media_type)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Splits a stream of UTF-8 byte chunks into lines without buffering the whole body.
+
+    Multi-byte characters split across chunk boundaries are handled by an
+    incremental decoder. Trailing ``\\r`` characters are stripped.
+
+    :param chunks: The raw body chunks, e.g. ``request.stream()``.
+    :type chunks: AsyncIterator[bytes]
+    :return: An async iterator over the decoded lines.
+    :rtype: AsyncIterator[str]
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_csv_records(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[tuple[int, Union[dict, ValueError]]]:
+    """
+    Parses CSV records from a line stream, using the first record as the header.
+
+    Quoted fields may span several lines; a record is complete once it holds an
+    even number of quote characters. Empty cells are dropped so that optional
+    columns (such as ``id``) fall back to their defaults.
+
+    :param lines: The decoded lines of the upload.
+    :type lines: AsyncIterator[str]
+    :return: ``(row_number, record)`` pairs, where a malformed record is
+        reported as a ``ValueError`` instead of a dict.
+    :rtype: AsyncIterator[tuple[int, Union[dict, ValueError]]]
+    """
+
+    header: Optional[list[str]] = None
+    row_number = 0
+    buffered = ""
+    async for line in lines:
+        buffered = f"{buffered}\n{line}" if buffered else line
+        if buffered.count('"') % 2:
+            continue
+        record, buffered = buffered, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [column.strip() for column in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, ValueError(
+                f"Expected {len(header)} columns, got {len(values)}"
+            )
+            continue
+        yield row_number, {
+            column: value for column, value in zip(header, values) if value != ""
+        }
+
+    if buffered:
+        yield row_number + 1, ValueError("Unterminated quoted field")
+
+
+async def iter_ndjson_records(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[tuple[int, Union[dict, ValueError]]]:
+    """
+    Parses one JSON object per line, skipping blank lines.
+
+    :param lines: The decoded lines of the upload.
+    :type lines: AsyncIterator[str]
+    :return: ``(row_number, record)`` pairs, where a malformed line is reported
+        as a ``ValueError`` instead of a dict.
+    :rtype: AsyncIterator[tuple[int, Union[dict, ValueError]]]
+    """
+
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, ValueError(f"Invalid JSON: {e.msg}")
+            continue
+        if not isinstance(record, dict):
+            yield row_number, ValueError("Expected a JSON object")
+            continue
+        yield row_number, record
+
+
+def iter_records(
+    chunks: AsyncIterator[bytes], fmt: ImportFormat
+) -> AsyncIterator[tuple[int, Union[dict, ValueError]]]:
+    """
+    Streams raw records out of an uploaded CSV or NDJSON body.
+
+    :param chunks: The raw body chunks.
+    :type chunks: AsyncIterator[bytes]
+    :param fmt: The upload format, ``"csv"`` or ``"ndjson"``.
+    :type fmt: ImportFormat
+    :return: ``(row_number, record)`` pairs in file order.
+    :rtype: AsyncIterator[tuple[int, Union[dict, ValueError]]]
+    """
+
+    lines = iter_lines(chunks)
+    if fmt == "csv":
+        return iter_csv_records(lines)
+    return iter_ndjson_records(lines)
@@ -0,0 +1,379 @@
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+import numpy as np
+from app.models import Category
+
+# Categories are interned as one-byte codes indexing this tuple
+CATEGORIES: tuple[str, ...] = tuple(category.value for category in Category)
+CATEGORY_CODES: dict[str, int] = {name: code for code, name in enumerate(CATEGORIES)}
+
+COLUMNS: tuple[str, ...] = (
+    "ids",
+    "prices",
+    "counts",
+    "categories",
+    "name_offsets",
+    "name_bytes",
+    "description_offsets",
+    "description_bytes",
+)
+
+
+def _offsets_array(offsets: array) -> np.ndarray:
+    """
+    Converts string offsets to the narrowest dtype that can address the buffer.
+
+    :param offsets: The ``n + 1`` byte offsets of ``n`` packed strings.
+    :type offsets: array
+    :return: The offsets as ``uint32``, or ``int64`` for buffers over 4 GiB.
+    :rtype: np.ndarray
+    """
+
+    packed = np.frombuffer(offsets, dtype=np.int64)
+    if packed[-1] < 2**32:
+        return packed.astype(np.uint32)
+    return packed.copy()
+
+
+class CatalogSnapshot:
+    """
+    Read-only columnar copy of the inventory table.
+
+    Numeric fields are NumPy columns aligned by position and sorted by ID;
+    categories are one-byte codes into ``CATEGORIES``; names and descriptions
+    are UTF-8 bytes packed back to back, with ``n + 1`` offsets per column so
+    string ``i`` spans ``offsets[i]:offsets[i + 1]``. At 1M goods this is
+    about 100 MB, against several GB for the same rows as ``Good`` models.
+
+    Snapshots can be saved as one ``.npy`` file per column and loaded back
+    memory-mapped, so a process can start on a snapshot without reading it.
+
+    :param ids: The good IDs, ascending.
+    :type ids: np.ndarray
+    :param prices: The unit prices.
+    :type prices: np.ndarray
+    :param counts: The units in stock; shard totals for sharded goods.
+    :type counts: np.ndarray
+    :param categories: The category codes.
+    :type categories: np.ndarray
+    :param name_offsets: The ``n + 1`` offsets into ``name_bytes``.
+    :type name_offsets: np.ndarray
+    :param name_bytes: The packed UTF-8 names.
+    :type name_bytes: np.ndarray
+    :param description_offsets: The ``n + 1`` offsets into ``description_bytes``.
+    :type description_offsets: np.ndarray
+    :param description_bytes: The packed UTF-8 descriptions.
+    :type description_bytes: np.ndarray
+
+    :ivar created_at: When the snapshot was built, as an ISO 8601 string.
+    :vartype created_at: str
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        prices: np.ndarray,
+        counts: np.ndarray,
+        categories: np.ndarray,
+        name_offsets: np.ndarray,
+        name_bytes: np.ndarray,
+        description_offsets: np.ndarray,
+        description_bytes: np.ndarray,
+        created_at: Optional[str] = None,
+    ):
+        self.ids = ids
+        self.prices = prices
+        self.counts = counts
+        self.categories = categories
+        self.name_offsets = name_offsets
+        self.name_bytes = name_bytes
+        self.description_offsets = description_offsets
+        self.description_bytes = description_bytes
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat()
+        self._category_positions: dict[int, np.ndarray] = {}
+        self._sorted_views: dict[tuple, tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The total size of the columns in bytes.
+        """
+
+        return sum(getattr(self, column).nbytes for column in COLUMNS)
+
+    def category_positions(self, code: int) -> np.ndarray:
+        """
+        Lists the row positions of one category, computed once per snapshot.
+
+        :param code: The category code, an index into ``CATEGORIES``.
+        :type code: int
+        :return: The ascending positions of the category's goods.
+        :rtype: np.ndarray
+        """
+
+        positions = self._category_positions.get(code)
+        if positions is None:
+            positions = np.flatnonzero(self.categories == code)
+            self._category_positions[code] = positions
+        return positions
+
+    def sorted_view(
+        self, column: str, code: Optional[int] = None, descending: bool = False
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Orders the rows (of one category) by a column, computed once per snapshot.
+
+        Ties are ordered by ID. For a descending view the keys are negated, so
+        they ascend either way and can be binary searched.
+
+        :param column: The column to order by, e.g. ``"prices"``.
+        :type column: str
+        :param code: The category code to restrict to; all rows if None.
+        :type code: Optional[int]
+        :param descending: Whether to order from highest to lowest.
+        :type descending: bool
+        :return: The row positions in order, and the (ascending) sort keys.
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+
+        key = (column, code, descending)
+        view = self._sorted_views.get(key)
+        if view is None:
+            positions = (
+                np.arange(len(self)) if code is None else self.category_positions(code)
+            )
+            values = getattr(self, column)[positions]
+            if descending:
+                values = -values.astype(
+                    np.float64 if values.dtype.kind == "f" else np.int64
+                )
+            # Positions ascend with ID, so they break ties by ID
+            order = np.lexsort((positions, values))
+            view = self._sorted_views[key] = (positions[order], values[order])
+        return view
+
+    def position(self, good_id: int) -> Optional[int]:
+        """
+        Finds a good's row position by binary search over the sorted IDs.
+
+        :param good_id: The ID of the good.
+        :type good_id: int
+        :return: The position, or None if the good is not in the snapshot.
+        :rtype: Optional[int]
+        """
+
+        position = int(np.searchsorted(self.ids, good_id))
+        if position < len(self.ids) and self.ids[position] == good_id:
+            return position
+        return None
+
+    def name(self, position: int) -> str:
+        """
+        Decodes the name at a row position.
+
+        :param position: The row position.
+        :type position: int
+        :return: The name.
+        :rtype: str
+        """
+
+        start, end = self.name_offsets[position], self.name_offsets[position + 1]
+        return self.name_bytes[start:end].tobytes().decode()
+
+    def description(self, position: int) -> str:
+        """
+        Decodes the description at a row position.
+
+        :param position: The row position.
+        :type position: int
+        :return: The description.
+        :rtype: str
+        """
+
+        start = self.description_offsets[position]
+        end = self.description_offsets[position + 1]
+        return self.description_bytes[start:end].tobytes().decode()
+
+    def row(self, position: int) -> dict:
+        """
+        Materializes one row as an inventory dictionary.
+
+        :param position: The row position.
+        :type position: int
+        :return: ``id``, ``name``, ``category``, ``price``, ``description`` and
+            ``count``.
+        :rtype: dict
+        """
+
+        return {
+            "id": int(self.ids[position]),
+            "name": self.name(position),
+            "category": CATEGORIES[self.categories[position]],
+            "price": float(self.prices[position]),
+            "description": self.description(position),
+            "count": int(self.counts[position]),
+        }
+
+    def get(self, good_id: int) -> Optional[dict]:
+        """
+        Looks up a good by ID.
+
+        :param good_id: The ID of the good.
+        :type good_id: int
+        :return: The good's row, or None if it is not in the snapshot.
+        :rtype: Optional[dict]
+        """
+
+        position = self.position(good_id)
+        return None if position is None else self.row(position)
+
+    def save(self, directory: Union[str, Path]):
+        """
+        Writes each column to ``<directory>/<column>.npy``.
+
+        :param directory: The target directory; created if missing.
+        :type directory: Union[str, Path]
+        """
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for column in COLUMNS:
+            np.save(directory / f"{column}.npy", getattr(self, column))
+        (directory / "created_at").write_text(self.created_at)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], mmap: bool = True) -> "CatalogSnapshot":
+        """
+        Reads a snapshot written by ``save``.
+
+        :param directory: The directory holding the column files.
+        :type directory: Union[str, Path]
+        :param mmap: Whether to memory-map the columns read-only instead of
+            reading them into memory.
+        :type mmap: bool
+        :return: The snapshot.
+        :rtype: CatalogSnapshot
+        """
+
+        directory = Path(directory)
+        columns = {
+            column: np.load(
+                directory / f"{column}.npy", mmap_mode="r" if mmap else None
+            )
+            for column in COLUMNS
+        }
+        created_at_file = directory / "created_at"
+        created_at = created_at_file.read_text() if created_at_file.exists() else None
+        return cls(**columns, created_at=created_at)
+
+
+class CatalogBuilder:
+    """
+    Accumulates inventory rows page by page into a ``CatalogSnapshot``.
+
+    Rows are appended to compact ``array``/``bytearray`` buffers, so building
+    never holds more than one page of row dictionaries.
+    """
+
+    def __init__(self):
+        self._ids = array("q")
+        self._prices = array("d")
+        self._counts = array("q")
+        self._categories = array("B")
+        self._name_offsets = array("q", (0,))
+        self._name_bytes = bytearray()
+        self._description_offsets = array("q", (0,))
+        self._description_bytes = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add_page(self, goods: Iterable[dict]):
+        """
+        Appends a page of inventory rows.
+
+        :param goods: Rows containing ``id``, ``name``, ``category``, ``price``,
+            ``description`` and ``count``.
+        :type goods: Iterable[dict]
+        :raises KeyError: If a row has an unknown category.
+        """
+
+        for good in goods:
+            self._ids.append(good["id"])
+            self._prices.append(good["price"])
+            self._counts.append(good["count"])
+            self._categories.append(CATEGORY_CODES[good["category"]])
+            self._name_bytes += good["name"].encode()
+            self._name_offsets.append(len(self._name_bytes))
+            self._description_bytes += (good.get("description") or "").encode()
+            self._description_offsets.append(len(self._description_bytes))
+
+    def build(self) -> CatalogSnapshot:
+        """
+        Freezes the accumulated rows into a snapshot sorted by ID.
+
+        :return: The snapshot.
+        :rtype: CatalogSnapshot
+        """
+
+        snapshot = CatalogSnapshot(
+            ids=np.frombuffer(self._ids, dtype=np.int64).copy(),
+            prices=np.frombuffer(self._prices, dtype=np.float64).copy(),
+            counts=np.frombuffer(self._counts, dtype=np.int64).astype(np.int32),
+            categories=np.frombuffer(self._categories, dtype=np.uint8).copy(),
+            name_offsets=_offsets_array(self._name_offsets),
+            name_bytes=np.frombuffer(bytes(self._name_bytes), dtype=np.uint8),
+            description_offsets=_offsets_array(self._description_offsets),
+            description_bytes=np.frombuffer(
+                bytes(self._description_bytes), dtype=np.uint8
+            ),
+        )
+        if len(snapshot) > 1 and not np.all(snapshot.ids[1:] > snapshot.ids[:-1]):
+            snapshot = _sorted_by_id(snapshot)
+        return snapshot
+
+
+def _sorted_by_id(snapshot: CatalogSnapshot) -> CatalogSnapshot:
+    """
+    Reorders a snapshot whose rows did not arrive in ID order.
+
+    Pages read with keyset pagination are already ordered, so this is only a
+    fallback.
+
+    :param snapshot: The unordered snapshot.
+    :type snapshot: CatalogSnapshot
+    :return: The snapshot with every column permuted into ID order.
+    :rtype: CatalogSnapshot
+    """
+
+    order = np.argsort(snapshot.ids, kind="stable")
+
+    def repack(offsets: np.ndarray, data: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        lengths = np.diff(offsets.astype(np.int64))[order]
+        new_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=new_offsets[1:])
+        pieces = [data[offsets[i] : offsets[i + 1]] for i in order]
+        packed = np.concatenate(pieces) if pieces else data[:0]
+        return new_offsets.astype(offsets.dtype), packed
+
+    name_offsets, name_bytes = repack(snapshot.name_offsets, snapshot.name_bytes)
+    description_offsets, description_bytes = repack(
+        snapshot.description_offsets, snapshot.description_bytes
+    )
+    return CatalogSnapshot(
+        ids=snapshot.ids[order],
+        prices=snapshot.prices[order],
+        counts=snapshot.counts[order],
+        categories=snapshot.categories[order],
+        name_offsets=name_offsets,
+        name_bytes=name_bytes,
+        description_offsets=description_offsets,
+        description_bytes=description_bytes,
+        created_at=snapshot.created_at,
+    )
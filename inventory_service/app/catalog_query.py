@@ -0,0 +1,93 @@
+from typing import Optional
+
+import numpy as np
+from app.catalog import CATEGORY_CODES, CatalogSnapshot
+from app.models import CatalogQuery
+
+SORT_COLUMNS: dict[str, str] = {"price": "prices", "count": "counts", "id": "ids"}
+# Rows filtered per step while scanning a sorted view; doubles up to the maximum
+FIRST_BLOCK_SIZE = 1024
+MAX_BLOCK_SIZE = 65536
+
+
+def _bounds(query: CatalogQuery) -> dict[str, tuple[Optional[float], Optional[float]]]:
+    return {
+        "prices": (query.min_price, query.max_price),
+        "counts": (query.min_count, query.max_count),
+        "ids": (None, None),
+    }
+
+
+def query_positions(snapshot: CatalogSnapshot, query: CatalogQuery) -> np.ndarray:
+    """
+    Finds the row positions of the first ``query.limit`` matches, in order.
+
+    The snapshot's sorted view for the query's category and ordering turns the
+    bounds on the sort column into a binary search. The remaining filters are
+    evaluated as NumPy boolean masks over consecutive blocks of that view,
+    stopping as soon as ``limit`` rows have matched, so a typical query reads a
+    few thousand rows instead of the whole catalog.
+
+    :param snapshot: The catalog to query.
+    :type snapshot: CatalogSnapshot
+    :param query: The filters, ordering and limit.
+    :type query: CatalogQuery
+    :return: Up to ``query.limit`` positions, ties ordered by ID.
+    :rtype: np.ndarray
+    """
+
+    code = None if query.category is None else CATEGORY_CODES[query.category]
+    sort_column = SORT_COLUMNS[query.sort_by]
+    positions, keys = snapshot.sorted_view(sort_column, code, query.descending)
+
+    bounds = _bounds(query)
+    low, high = bounds.pop(sort_column)
+    if query.descending:
+        low, high = (
+            None if high is None else -high,
+            None if low is None else -low,
+        )
+    start = 0 if low is None else int(np.searchsorted(keys, low, side="left"))
+    stop = len(keys) if high is None else int(np.searchsorted(keys, high, side="right"))
+
+    filters = [
+        (getattr(snapshot, column), compare, bound)
+        for column, (low, high) in bounds.items()
+        for compare, bound in ((np.greater_equal, low), (np.less_equal, high))
+        if bound is not None
+    ]
+    if not filters:
+        return positions[start : min(stop, start + query.limit)]
+
+    found = []
+    remaining = query.limit
+    block_size = FIRST_BLOCK_SIZE
+    while start < stop and remaining:
+        block = positions[start : min(start + block_size, stop)]
+        mask = None
+        for values, compare, bound in filters:
+            condition = compare(values[block], bound)
+            mask = (
+                condition if mask is None else np.logical_and(mask, condition, out=mask)
+            )
+        matched = block[mask][:remaining]
+        found.append(matched)
+        remaining -= len(matched)
+        start += block_size
+        block_size = min(block_size * 2, MAX_BLOCK_SIZE)
+    return np.concatenate(found) if found else positions[:0]
+
+
+def query_catalog(snapshot: CatalogSnapshot, query: CatalogQuery) -> list[dict]:
+    """
+    Runs a filtered, sorted, limited query over the catalog columns.
+
+    :param snapshot: The catalog to query.
+    :type snapshot: CatalogSnapshot
+    :param query: The filters, ordering and limit.
+    :type query: CatalogQuery
+    :return: The matching goods in order, at most ``query.limit`` of them.
+    :rtype: list[dict]
+    """
+
+    return [snapshot.row(position) for position in query_positions(snapshot, query)]
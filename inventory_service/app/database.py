@@ -1,17 +1,131 @@
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator, Optional
+
+from app.events import StockEventBus
 from app.models import Good, GoodUpdate
 from loguru import logger
 from postgrest import SyncRequestBuilder, SyncSelectRequestBuilder
-from supabase import Client, create_client
+from supabase import AsyncClient, Client, acreate_client, create_client
+
+# Reads and conditional updates a price-checked deduction tries before giving up
+CONDITIONAL_DEDUCT_ATTEMPTS: int = 5
+
+
+class _InventoryTableBase:
+    """
+    State and helpers shared by the synchronous and asynchronous inventory tables.
+
+    :param events: Where stock and price changes are published. Optional.
+    :type events: Optional[StockEventBus]
+    """
+
+    def __init__(self, events: Optional[StockEventBus] = None):
+        self.events: Optional[StockEventBus] = events
+        self._last_probe: Optional[dict] = None
+        self._last_probe_at: float = 0.0
+
+    def _publish_stock_changes(self, rows: list[dict]):
+        """
+        Publishes the current count and price of updated rows.
+
+        The stored count of a sharded row is always 0, so it is left out of
+        the event rather than published as the good's stock.
+
+        :param rows: The inventory rows returned by an update.
+        :type rows: list[dict]
+        """
+
+        if self.events is None:
+            return
+        for row in rows:
+            fields = ("id", "price", "version")
+            if not row.get("shards"):
+                fields = ("id", "count", "price", "version")
+            self.events.publish({field: row[field] for field in fields if field in row})
+
+    def _publish_count_delta(self, good_id: int, count_delta: int):
+        """
+        Publishes a relative stock change, for sharded goods whose total is not known.
+
+        :param good_id: The ID of the changed item.
+        :type good_id: int
+        :param count_delta: The change applied to its stock.
+        :type count_delta: int
+        """
+
+        if self.events is not None:
+            self.events.publish({"id": good_id, "count_delta": count_delta})
+
+    def _cached_probe(self, max_age: float) -> Optional[dict]:
+        """
+        Returns the last connectivity probe if it is younger than ``max_age`` seconds.
+
+        :param max_age: How long, in seconds, a probe result is reused.
+        :type max_age: float
+        :return: The cached probe, or None if a new one is due.
+        :rtype: Optional[dict]
+        """
+
+        if (
+            self._last_probe is not None
+            and time.monotonic() - self._last_probe_at < max_age
+        ):
+            return self._last_probe
+        return None
+
+    def _store_probe(self, probe: dict, started: float) -> dict:
+        """
+        Stamps a connectivity probe with its latency and time and caches it.
+
+        :param probe: ``connected`` plus ``error`` when the probe failed.
+        :type probe: dict
+        :param started: The ``time.perf_counter()`` value taken before the probe.
+        :type started: float
+        :return: The completed probe.
+        :rtype: dict
+        """
+
+        probe["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        probe["checked_at"] = datetime.now(timezone.utc).isoformat()
+        self._last_probe = probe
+        self._last_probe_at = time.monotonic()
+        return probe
+
+    @staticmethod
+    def _update_payload(updated_good: GoodUpdate) -> tuple[dict, Optional[int]]:
+        """
+        Splits an update into the absolute fields to write and the count delta.
+
+        :param updated_good: The requested update.
+        :type updated_good: GoodUpdate
+        :return: The fields explicitly set, and ``count_delta`` if given.
+        :rtype: tuple[dict, Optional[int]]
+        :raises ValueError: If no fields are provided for the update.
+        """
+
+        update_data = updated_good.model_dump(
+            mode="json", exclude_unset=True, exclude_none=True, exclude={"count_delta"}
+        )
+        count_delta = updated_good.count_delta
+        if not update_data and count_delta is None:
+            raise ValueError("No fields provided to update.")
+        return update_data, count_delta
 
 
-class InventoryTable:
+class InventoryTable(_InventoryTableBase):
     """
-    Manages the inventory database table.
+    Manages the inventory database table with blocking calls, for scripts and tools.
 
     :param url: The Supabase database URL.
     :type url: str
     :param key: The Supabase API key.
     :type key: str
+    :param events: Where stock and price changes are published. Optional.
+    :type events: Optional[StockEventBus]
 
     :ivar client: The Supabase client for database operations.
     :vartype client: Client
@@ -19,7 +133,7 @@ class InventoryTable:
     :vartype table: SyncRequestBuilder
     """
 
-    def __init__(self, url: str, key: str):
+    def __init__(self, url: str, key: str, events: Optional[StockEventBus] = None):
         """
         Initializes the InventoryTable with a Supabase client.
 
@@ -27,10 +141,43 @@ class InventoryTable:
         :type url: str
         :param key: The Supabase API key.
         :type key: str
+        :param events: Where stock and price changes are published. Optional.
+        :type events: Optional[StockEventBus]
         """
 
+        super().__init__(events)
         self.client: Client = create_client(url, key)
         self.table: SyncRequestBuilder = self.client.table("inventory")
+        self._probe_lock = threading.Lock()
+
+    def check_connection(self, max_age: float = 5.0) -> dict:
+        """
+        Probes database connectivity with the cheapest possible query.
+
+        The probe selects at most one ``id`` and so does not depend on any
+        particular row existing. Its result is cached for ``max_age`` seconds, so
+        frequent health checks from several orchestrators cost one query.
+
+        :param max_age: How long, in seconds, a previous probe result is reused.
+        :type max_age: float
+        :return: ``connected``, ``latency_ms`` and ``checked_at`` of the last probe,
+            plus ``error`` when it failed.
+        :rtype: dict
+        """
+
+        with self._probe_lock:
+            cached = self._cached_probe(max_age)
+            if cached is not None:
+                return cached
+
+            started = time.perf_counter()
+            try:
+                self.client.table("inventory").select("id").limit(1).execute()
+                probe = {"connected": True}
+            except Exception as e:
+                logger.error(f"Database probe failed: {e}")
+                probe = {"connected": False, "error": str(e)}
+            return self._store_probe(probe, started)
 
     def add_good_to_db(self, good: Good):
         """
@@ -52,32 +199,111 @@ class InventoryTable:
             raise Exception(f"Failed to add good: {response.error.message}")
         return response.data
 
+    def upsert_goods_to_db(self, goods: list[dict]) -> list[dict]:
+        """
+        Writes a batch of inventory items in at most two statements.
+
+        Items that carry an ``id`` are upserted on that key; the rest are inserted.
+        Callers must only pass IDs of existing items: an explicit ID does not
+        advance the ID sequence, so a later insert could collide with it.
+
+        :param goods: The validated items to write, as dictionaries.
+        :type goods: list[dict]
+        :return: The written rows, including their IDs.
+        :rtype: list[dict]
+        :raises Exception: If the database rejects the batch.
+        """
+
+        with_id = [good for good in goods if good.get("id") is not None]
+        without_id = [good for good in goods if good.get("id") is None]
+        written = []
+        if with_id:
+            response = (
+                self.client.table("inventory")
+                .upsert(with_id, on_conflict="id")
+                .execute()
+            )
+            written.extend(response.data or [])
+        if without_id:
+            response = self.client.table("inventory").insert(without_id).execute()
+            written.extend(response.data or [])
+        return written
+
+    def iter_goods(
+        self, columns: str = "*", page_size: int = 1000
+    ) -> Iterator[list[dict]]:
+        """
+        Reads the whole inventory table in pages, ordered by ID.
+
+        Pages are fetched with keyset pagination (``id > last_id``), so each page
+        costs the same regardless of how deep into the table it is.
+
+        :param columns: The columns to select; must include ``id``.
+        :type columns: str
+        :param page_size: The number of rows per page.
+        :type page_size: int
+        :return: An iterator over pages of rows.
+        :rtype: Iterator[list[dict]]
+        """
+
+        last_id = 0
+        while True:
+            response = (
+                self.client.table("inventory")
+                .select(columns)
+                .gt("id", last_id)
+                .order("id")
+                .limit(page_size)
+                .execute()
+            )
+            page = response.data or []
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_id = page[-1]["id"]
+
     def update_good_in_db(self, good_id: int, updated_good: GoodUpdate):
         """
-        Updates an existing inventory item in the database.
+        Updates an existing inventory item in the database in a single round trip.
+
+        Only the fields explicitly set on ``updated_good`` are written. A
+        ``count_delta`` is applied relative to the stored count by the
+        ``apply_good_update`` database function (``sql/001_apply_good_update.sql``),
+        which refuses to take the count below zero, so concurrent deductions are
+        never overwritten. Count edits are refused for goods with sharded stock.
 
         :param good_id: The ID of the item to update.
         :type good_id: int
         :param updated_good: The fields to update as a `GoodUpdate` object.
         :type updated_good: GoodUpdate
-        :return: The response data from the database after the update.
-        :rtype: dict
+        :return: The updated rows; empty if no row matched the update.
+        :rtype: list[dict]
         :raises ValueError: If no fields are provided for the update.
-        :raises Exception: If the item could not be updated in the database.
         """
 
-        update_data = updated_good
-        if not update_data:
-            raise ValueError("No fields provided to update.")
-        response = (
-            self.client.table("inventory")
-            .update(update_data)
-            .eq("id", good_id)
-            .execute()
+        update_data, count_delta = self._update_payload(updated_good)
+        if count_delta is None:
+            query = self.client.table("inventory").update(update_data).eq("id", good_id)
+            if "count" in update_data:
+                query = query.eq("shards", 0)
+        else:
+            query = self.client.rpc(
+                "apply_good_update",
+                {
+                    "p_good_id": good_id,
+                    "p_fields": update_data,
+                    "p_count_delta": count_delta,
+                },
+            )
+        response = query.execute()
+        stock_changed = (
+            count_delta is not None or "count" in update_data or "price" in update_data
         )
-        if not response.data:
-            raise Exception(f"Failed to update good: {response.error.message}")
-        return response.data
+        if response.data and stock_changed:
+            self._publish_stock_changes(response.data)
+        return response.data or []
 
     def get_good_from_db(self, good_id: int):
         """
@@ -96,7 +322,96 @@ class InventoryTable:
 
         if not response.data:
             raise Exception(f"Failed to fetch good: {response.error.message}")
-        return response.data[0]
+        good = response.data[0]
+        if good.get("shards"):
+            good["count"] = self.get_sharded_count(good_id)
+        return good
+
+    def enable_sharding_in_db(self, good_id: int, shards: int) -> list[dict]:
+        """
+        Splits the stock of an inventory item across ``shards`` sub-counters.
+
+        Deductions on a sharded item update one randomly chosen sub-counter, so
+        concurrent buyers contend on ``shards`` rows instead of one.
+
+        :param good_id: The ID of the item to shard.
+        :type good_id: int
+        :param shards: The number of sub-counters to split the stock across.
+        :type shards: int
+        :return: The updated item; empty if it does not exist or is already sharded.
+        :rtype: list[dict]
+        """
+
+        response = self.client.rpc(
+            "enable_stock_sharding", {"p_good_id": good_id, "p_shards": shards}
+        ).execute()
+        return response.data or []
+
+    def disable_sharding_in_db(self, good_id: int) -> list[dict]:
+        """
+        Folds the sub-counters of an inventory item back into its ``count``.
+
+        :param good_id: The ID of the item.
+        :type good_id: int
+        :return: The updated item; empty if it does not exist or is not sharded.
+        :rtype: list[dict]
+        """
+
+        response = self.client.rpc(
+            "disable_stock_sharding", {"p_good_id": good_id}
+        ).execute()
+        return response.data or []
+
+    def get_sharded_count(self, good_id: int) -> int:
+        """
+        Sums the sub-counters of a sharded inventory item.
+
+        :param good_id: The ID of the item.
+        :type good_id: int
+        :return: The total stock across all shards.
+        :rtype: int
+        """
+
+        response = (
+            self.client.table("inventory_shards")
+            .select("count")
+            .eq("good_id", good_id)
+            .execute()
+        )
+        return sum(shard["count"] for shard in response.data or [])
+
+    def deduct_sharded_good_from_db(
+        self, good_id: int, shards: int, amount: int = 1
+    ) -> list[dict]:
+        """
+        Deducts stock from a random sub-counter of a sharded inventory item.
+
+        If the chosen shard cannot cover ``amount``, the database falls back to
+        the fullest shard in the same call.
+
+        :param good_id: The ID of the item to deduct.
+        :type good_id: int
+        :param shards: The number of sub-counters the item is split across.
+        :type shards: int
+        :param amount: The number of units to deduct.
+        :type amount: int
+        :return: The updated shard.
+        :rtype: list[dict]
+        :raises ValueError: If no shard holds enough stock.
+        """
+
+        response = self.client.rpc(
+            "decrement_stock_shard",
+            {
+                "p_good_id": good_id,
+                "p_shard": random.randrange(shards),
+                "p_amount": amount,
+            },
+        ).execute()
+        if not response.data:
+            raise ValueError("Product count less than 0")
+        self._publish_count_delta(good_id, -amount)
+        return response.data
 
     def deduct_good_from_db(self, good_id: int):
         """
@@ -112,6 +427,8 @@ class InventoryTable:
         product = self.table.select("*").eq("id", good_id).execute()
         if product.data:
             product = product.data[0]
+            if product.get("shards"):
+                return self.deduct_sharded_good_from_db(good_id, product["shards"])
             product_count = product["count"]
             if product_count > 0:
                 product_count = product_count - 1
@@ -126,4 +443,621 @@ class InventoryTable:
 
         if not response.data:
             raise Exception(f"Failed to deduct inventory: {response.error.message}")
+        self._publish_stock_changes(response.data)
+        return response.data
+
+
+class AsyncInventoryTable(_InventoryTableBase):
+    """
+    Manages the inventory database table without blocking the event loop.
+
+    Construction only records the connection settings; the Supabase client is
+    created by ``connect`` (from the application's lifespan handler) and released
+    by ``close``, so importing the service opens no connections.
+
+    :param url: The Supabase database URL.
+    :type url: str
+    :param key: The Supabase API key.
+    :type key: str
+    :param events: Where stock and price changes are published. Optional.
+    :type events: Optional[StockEventBus]
+    """
+
+    def __init__(self, url: str, key: str, events: Optional[StockEventBus] = None):
+        """
+        Initializes the AsyncInventoryTable without connecting.
+
+        :param url: The Supabase database URL.
+        :type url: str
+        :param key: The Supabase API key.
+        :type key: str
+        :param events: Where stock and price changes are published. Optional.
+        :type events: Optional[StockEventBus]
+        """
+
+        super().__init__(events)
+        self.url = url
+        self.key = key
+        self._client: Optional[AsyncClient] = None
+        self._probe_lock = asyncio.Lock()
+
+    @property
+    def client(self) -> AsyncClient:
+        """
+        The connected Supabase client.
+
+        :raises RuntimeError: If ``connect`` has not been awaited.
+        """
+
+        if self._client is None:
+            raise RuntimeError("Inventory database is not connected")
+        return self._client
+
+    async def connect(self):
+        """
+        Creates the Supabase client; a no-op if already connected.
+        """
+
+        if self._client is None:
+            self._client = await acreate_client(self.url, self.key)
+
+    async def close(self):
+        """
+        Closes the client's HTTP connection pool.
+        """
+
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.postgrest.aclose()
+
+    async def check_connection(self, max_age: float = 5.0) -> dict:
+        """
+        Probes database connectivity with the cheapest possible query.
+
+        Concurrent callers share one in-flight probe, and its result is cached
+        for ``max_age`` seconds.
+
+        :param max_age: How long, in seconds, a previous probe result is reused.
+        :type max_age: float
+        :return: ``connected``, ``latency_ms`` and ``checked_at`` of the last probe,
+            plus ``error`` when it failed.
+        :rtype: dict
+        """
+
+        async with self._probe_lock:
+            cached = self._cached_probe(max_age)
+            if cached is not None:
+                return cached
+
+            started = time.perf_counter()
+            try:
+                await self.client.table("inventory").select("id").limit(1).execute()
+                probe = {"connected": True}
+            except Exception as e:
+                logger.error(f"Database probe failed: {e}")
+                probe = {"connected": False, "error": str(e)}
+            return self._store_probe(probe, started)
+
+    async def add_good_to_db(self, good: Good):
+        """
+        Adds a new inventory item to the database.
+
+        :param good: The `Good` object containing the item details.
+        :type good: Good
+        :return: The response data from the database after insertion.
+        :rtype: list[dict]
+        :raises Exception: If the item could not be added to the database.
+        """
+
+        response = (
+            await self.client.table("inventory").insert(good.model_dump()).execute()
+        )
+        logger.info(f"Adding {good.model_dump()}")
+
+        if not response.data:
+            raise Exception("Failed to add good")
         return response.data
+
+    async def upsert_goods_to_db(self, goods: list[dict]) -> list[dict]:
+        """
+        Writes a batch of inventory items in at most two statements.
+
+        Items that carry an ``id`` are upserted on that key; the rest are inserted.
+        Callers must only pass IDs of existing items: an explicit ID does not
+        advance the ID sequence, so a later insert could collide with it.
+
+        :param goods: The validated items to write, as dictionaries.
+        :type goods: list[dict]
+        :return: The written rows, including their IDs.
+        :rtype: list[dict]
+        :raises Exception: If the database rejects the batch.
+        """
+
+        with_id = [good for good in goods if good.get("id") is not None]
+        without_id = [good for good in goods if good.get("id") is None]
+        written = []
+        if with_id:
+            response = (
+                await self.client.table("inventory")
+                .upsert(with_id, on_conflict="id")
+                .execute()
+            )
+            written.extend(response.data or [])
+        if without_id:
+            response = await self.client.table("inventory").insert(without_id).execute()
+            written.extend(response.data or [])
+        return written
+
+    async def iter_goods(
+        self, columns: str = "*", page_size: int = 1000
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Reads the whole inventory table in keyset-paginated pages, ordered by ID.
+
+        :param columns: The columns to select; must include ``id``.
+        :type columns: str
+        :param page_size: The number of rows per page.
+        :type page_size: int
+        :return: An async iterator over pages of rows.
+        :rtype: AsyncIterator[list[dict]]
+        """
+
+        async for page in self._iter_pages("inventory", columns, page_size):
+            yield page
+
+    async def iter_price_history(
+        self, page_size: int = 5000
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Reads the whole price history (``sql/005_price_history.sql``) in pages.
+
+        :param page_size: The number of rows per page.
+        :type page_size: int
+        :return: An async iterator over pages of ``good_id``, ``price`` and
+            ``valid_from`` rows.
+        :rtype: AsyncIterator[list[dict]]
+        """
+
+        async for page in self._iter_pages(
+            "inventory_price_history", "id,good_id,price,valid_from", page_size
+        ):
+            yield page
+
+    async def _iter_pages(
+        self, table: str, columns: str, page_size: int
+    ) -> AsyncIterator[list[dict]]:
+        last_id = 0
+        while True:
+            response = (
+                await self.client.table(table)
+                .select(columns)
+                .gt("id", last_id)
+                .order("id")
+                .limit(page_size)
+                .execute()
+            )
+            page = response.data or []
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_id = page[-1]["id"]
+
+    async def update_good_in_db(self, good_id: int, updated_good: GoodUpdate):
+        """
+        Updates an existing inventory item in a single round trip.
+
+        See ``InventoryTable.update_good_in_db`` for the count semantics.
+
+        :param good_id: The ID of the item to update.
+        :type good_id: int
+        :param updated_good: The fields to update as a `GoodUpdate` object.
+        :type updated_good: GoodUpdate
+        :return: The updated rows; empty if no row matched the update.
+        :rtype: list[dict]
+        :raises ValueError: If no fields are provided for the update.
+        """
+
+        update_data, count_delta = self._update_payload(updated_good)
+        if count_delta is None:
+            query = self.client.table("inventory").update(update_data).eq("id", good_id)
+            if "count" in update_data:
+                query = query.eq("shards", 0)
+        else:
+            query = self.client.rpc(
+                "apply_good_update",
+                {
+                    "p_good_id": good_id,
+                    "p_fields": update_data,
+                    "p_count_delta": count_delta,
+                },
+            )
+        response = await query.execute()
+        stock_changed = (
+            count_delta is not None or "count" in update_data or "price" in update_data
+        )
+        if response.data and stock_changed:
+            self._publish_stock_changes(response.data)
+        return response.data or []
+
+    async def bulk_adjust_stock_in_db(self, adjustments: list[dict]) -> list[dict]:
+        """
+        Applies a chunk of stock adjustments in one statement and transaction.
+
+        Runs the ``bulk_adjust_stock`` database function
+        (``sql/004_bulk_adjust_stock.sql``), which updates every eligible row with
+        a single ``UPDATE`` and reports an outcome for each requested ID.
+
+        :param adjustments: ``{"id", "delta"}`` or ``{"id", "absolute"}`` items
+            with distinct IDs.
+        :type adjustments: list[dict]
+        :return: ``{"id", "status", "count"}`` per item, where ``status`` is
+            ``applied``, ``not_found``, ``sharded`` or ``insufficient_stock``.
+        :rtype: list[dict]
+        """
+
+        response = await self.client.rpc(
+            "bulk_adjust_stock", {"p_adjustments": adjustments}
+        ).execute()
+        outcomes = response.data or []
+        self._publish_stock_changes(
+            [outcome for outcome in outcomes if outcome["status"] == "applied"]
+        )
+        return outcomes
+
+    async def deduct_stock_batch_in_db(self, items: list[dict]) -> list[dict]:
+        """
+        Deducts stock from several items in one transaction, all or nothing.
+
+        Runs the ``deduct_stock_batch`` database function
+        (``sql/007_deduct_stock_batch.sql``): either every item has enough stock
+        and all are deducted, or nothing changes.
+
+        :param items: ``{"id", "quantity"}`` items with distinct IDs.
+        :type items: list[dict]
+        :return: ``{"id", "status", "count"}`` per item, where ``status`` is
+            ``applied`` for every item, or ``not_found``, ``insufficient_stock``
+            or ``not_applied`` when the batch was refused.
+        :rtype: list[dict]
+        """
+
+        response = await self.client.rpc(
+            "deduct_stock_batch", {"p_items": items}
+        ).execute()
+        outcomes = response.data or []
+        self._publish_stock_changes(
+            [outcome for outcome in outcomes if outcome["status"] == "applied"]
+        )
+        return outcomes
+
+    async def restock_batch_in_db(self, items: list[dict]) -> list[dict]:
+        """
+        Adds stock back to several items in one transaction.
+
+        :param items: ``{"id", "quantity"}`` items with distinct IDs.
+        :type items: list[dict]
+        :return: ``{"id", "status", "count"}`` per item, where ``status`` is
+            ``applied`` or ``not_found``.
+        :rtype: list[dict]
+        """
+
+        response = await self.client.rpc("restock_batch", {"p_items": items}).execute()
+        outcomes = response.data or []
+        self._publish_stock_changes(
+            [outcome for outcome in outcomes if outcome["status"] == "applied"]
+        )
+        return outcomes
+
+    async def get_good_from_db(self, good_id: int):
+        """
+        Retrieves an inventory item by its ID.
+
+        :param good_id: The ID of the item to retrieve.
+        :type good_id: int
+        :return: The details of the retrieved item.
+        :rtype: dict
+        :raises Exception: If the item could not be fetched from the database.
+        """
+
+        response = (
+            await self.client.table("inventory").select("*").eq("id", good_id).execute()
+        )
+
+        if not response.data:
+            raise Exception(f"Failed to fetch good {good_id}")
+        good = response.data[0]
+        if good.get("shards"):
+            good["count"] = await self.get_sharded_count(good_id)
+        return good
+
+    async def get_stock_state_from_db(self, good_id: int) -> Optional[dict]:
+        """
+        Reads whether an inventory item exists, and its stored count and shards.
+
+        :param good_id: The ID of the item.
+        :type good_id: int
+        :return: ``id``, ``count`` and ``shards``, or None if the item does not exist.
+        :rtype: Optional[dict]
+        """
+
+        response = (
+            await self.client.table("inventory")
+            .select("id,count,shards")
+            .eq("id", good_id)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    async def get_shards_in_db(self, good_ids: list[int]) -> dict[int, int]:
+        """
+        Reads which of several inventory items exist, and their shard counts.
+
+        :param good_ids: The IDs of the items.
+        :type good_ids: list[int]
+        :return: The number of stock shards (0 if unsharded) of each existing
+            item, by ID; missing items are left out.
+        :rtype: dict[int, int]
+        """
+
+        if not good_ids:
+            return {}
+        response = (
+            await self.client.table("inventory")
+            .select("id,shards")
+            .in_("id", good_ids)
+            .execute()
+        )
+        return {row["id"]: row.get("shards") or 0 for row in response.data or []}
+
+    async def get_availability_from_db(self, good_ids: list[int]) -> list[dict]:
+        """
+        Retrieves only the stock, price and versions of inventory items.
+
+        Reads the few columns needed to decide a sale in one query, with the
+        shard totals of sharded items summed concurrently.
+
+        :param good_ids: The IDs of the items.
+        :type good_ids: list[int]
+        :return: ``id``, ``count``, ``price``, ``version`` and ``price_version``
+            of each item found.
+        :rtype: list[dict]
+        """
+
+        response = (
+            await self.client.table("inventory")
+            .select("id,count,price,version,price_version,shards")
+            .in_("id", good_ids)
+            .execute()
+        )
+        goods = response.data or []
+        sharded = [good for good in goods if good.get("shards")]
+        counts = await asyncio.gather(
+            *(self.get_sharded_count(good["id"]) for good in sharded)
+        )
+        for good, count in zip(sharded, counts):
+            good["count"] = count
+        return [
+            {
+                "id": good["id"],
+                "count": good["count"],
+                "price": good["price"],
+                "version": good.get("version"),
+                "price_version": good.get("price_version"),
+            }
+            for good in goods
+        ]
+
+    async def enable_sharding_in_db(self, good_id: int, shards: int) -> list[dict]:
+        """
+        Splits the stock of an inventory item across ``shards`` sub-counters.
+
+        :param good_id: The ID of the item to shard.
+        :type good_id: int
+        :param shards: The number of sub-counters to split the stock across.
+        :type shards: int
+        :return: The updated item; empty if it does not exist or is already sharded.
+        :rtype: list[dict]
+        """
+
+        response = await self.client.rpc(
+            "enable_stock_sharding", {"p_good_id": good_id, "p_shards": shards}
+        ).execute()
+        return response.data or []
+
+    async def disable_sharding_in_db(self, good_id: int) -> list[dict]:
+        """
+        Folds the sub-counters of an inventory item back into its ``count``.
+
+        :param good_id: The ID of the item.
+        :type good_id: int
+        :return: The updated item; empty if it does not exist or is not sharded.
+        :rtype: list[dict]
+        """
+
+        response = await self.client.rpc(
+            "disable_stock_sharding", {"p_good_id": good_id}
+        ).execute()
+        return response.data or []
+
+    async def get_sharded_count(self, good_id: int) -> int:
+        """
+        Sums the sub-counters of a sharded inventory item.
+
+        :param good_id: The ID of the item.
+        :type good_id: int
+        :return: The total stock across all shards.
+        :rtype: int
+        """
+
+        response = (
+            await self.client.table("inventory_shards")
+            .select("count")
+            .eq("good_id", good_id)
+            .execute()
+        )
+        return sum(shard["count"] for shard in response.data or [])
+
+    async def get_sharded_counts(self, good_ids: list[int]) -> dict[int, int]:
+        """
+        Sums the sub-counters of several sharded inventory items in one query.
+
+        :param good_ids: The IDs of the items.
+        :type good_ids: list[int]
+        :return: The total stock across all shards, by item ID.
+        :rtype: dict[int, int]
+        """
+
+        if not good_ids:
+            return {}
+        response = (
+            await self.client.table("inventory_shards")
+            .select("good_id,count")
+            .in_("good_id", good_ids)
+            .execute()
+        )
+        counts = dict.fromkeys(good_ids, 0)
+        for shard in response.data or []:
+            counts[shard["good_id"]] += shard["count"]
+        return counts
+
+    async def deduct_sharded_good_from_db(
+        self, good_id: int, shards: int, amount: int = 1
+    ) -> list[dict]:
+        """
+        Deducts stock from a random sub-counter of a sharded inventory item.
+
+        :param good_id: The ID of the item to deduct.
+        :type good_id: int
+        :param shards: The number of sub-counters the item is split across.
+        :type shards: int
+        :param amount: The number of units to deduct.
+        :type amount: int
+        :return: The updated shard.
+        :rtype: list[dict]
+        :raises ValueError: If no shard holds enough stock.
+        """
+
+        response = await self.client.rpc(
+            "decrement_stock_shard",
+            {
+                "p_good_id": good_id,
+                "p_shard": random.randrange(shards),
+                "p_amount": amount,
+            },
+        ).execute()
+        if not response.data:
+            raise ValueError("Product count less than 0")
+        self._publish_count_delta(good_id, -amount)
+        return response.data
+
+    async def deduct_stock_up_to_in_db(self, good_id: int, amount: int) -> int:
+        """
+        Deducts as many of ``amount`` units as are in stock, in one statement.
+
+        Sharded items are deducted one unit per shard round trip instead.
+
+        :param good_id: The ID of the item to deduct.
+        :type good_id: int
+        :param amount: The number of units wanted.
+        :type amount: int
+        :return: The number of units deducted, from 0 to ``amount``.
+        :rtype: int
+        :raises Exception: If the item does not exist.
+        """
+
+        response = await self.client.rpc(
+            "deduct_stock_up_to", {"p_good_id": good_id, "p_amount": amount}
+        ).execute()
+        if not response.data:
+            raise Exception(f"Failed to deduct inventory: good {good_id} not found")
+        outcome = response.data[0]
+
+        if outcome["shards"]:
+            results = await asyncio.gather(
+                *(
+                    self.deduct_sharded_good_from_db(good_id, outcome["shards"])
+                    for _ in range(amount)
+                ),
+                return_exceptions=True,
+            )
+            errors = [result for result in results if isinstance(result, Exception)]
+            deducted = amount - len(errors)
+            failures = [error for error in errors if not isinstance(error, ValueError)]
+            if not deducted and failures:
+                raise failures[0]
+            return deducted
+
+        if outcome["deducted"]:
+            self._publish_stock_changes(
+                [
+                    {
+                        "id": good_id,
+                        "count": outcome["count"],
+                        "version": outcome["version"],
+                    }
+                ]
+            )
+        return outcome["deducted"]
+
+    async def deduct_good_from_db(
+        self, good_id: int, price_version: Optional[int] = None
+    ):
+        """
+        Deducts one unit from the stock of an inventory item by its ID.
+
+        The unit is taken by ``deduct_stock_up_to`` (``sql/006``), which locks
+        the row, so concurrent deductions cannot both sell the last unit.
+
+        With ``price_version`` the row is read, checked, and updated on
+        condition that neither its count nor its price version changed, so a
+        caller holding a cached price cannot sell at a price that has since
+        changed. A lost race is retried from a fresh read. Sharded items only
+        have their price checked on the read.
+
+        :param good_id: The ID of the item to deduct.
+        :type good_id: int
+        :param price_version: The price version the caller saw. Optional.
+        :type price_version: Optional[int]
+        :raises ValueError: If the item stock is already zero.
+        :raises RuntimeError: If the price is no longer at ``price_version``.
+        :raises Exception: If the item does not exist or the update fails.
+        """
+
+        if price_version is None:
+            if not await self.deduct_stock_up_to_in_db(good_id, 1):
+                raise ValueError("Product count less than 0")
+            return
+
+        for _ in range(CONDITIONAL_DEDUCT_ATTEMPTS):
+            product = (
+                await self.client.table("inventory")
+                .select("*")
+                .eq("id", good_id)
+                .execute()
+            )
+            if not product.data:
+                raise Exception(f"Failed to deduct inventory: good {good_id} not found")
+            product = product.data[0]
+            if product.get("price_version") != price_version:
+                raise RuntimeError(f"The price of good {good_id} has changed")
+            if product.get("shards"):
+                return await self.deduct_sharded_good_from_db(
+                    good_id, product["shards"]
+                )
+            if product["count"] <= 0:
+                raise ValueError("Product count less than 0")
+            # Applies only if neither the stock nor the price moved since the read
+            response = (
+                await self.client.table("inventory")
+                .update({"count": product["count"] - 1})
+                .eq("id", good_id)
+                .eq("count", product["count"])
+                .eq("price_version", price_version)
+                .execute()
+            )
+            if response.data:
+                self._publish_stock_changes(response.data)
+                return
+            # Lost a race; the next read tells a price change from a stock change
+        raise Exception(f"Failed to deduct inventory: good {good_id} kept changing")
@@ -0,0 +1,114 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from loguru import logger
+
+
+class _Batch:
+    """
+    The deductions of one good waiting for the same flush.
+    """
+
+    __slots__ = ("waiters", "timer")
+
+    def __init__(self):
+        self.waiters: list[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class DeductionCombiner:
+    """
+    Merges concurrent single-unit deductions of the same good into one decrement.
+
+    The first deduction of a good opens a batch that stays open for ``window``
+    seconds (or until ``max_batch`` deductions join it). The batch is then
+    applied with one ``deduct_up_to(good_id, n)`` call, which takes as many of
+    the ``n`` units as are in stock. Waiters are granted units in arrival
+    order; those past the available stock fail with ``ValueError``, and if the
+    call itself fails every waiter receives its exception. Waiters cancelled
+    while the call was in flight are skipped, and the units taken for them are
+    given back with ``restock``.
+
+    Each deduction waits up to ``window`` longer, in exchange for one database
+    round trip and one row lock per batch instead of per unit.
+
+    :param deduct_up_to: Deducts up to ``n`` units of a good and returns how
+        many it took.
+    :type deduct_up_to: Callable[[int, int], Awaitable[int]]
+    :param restock: Adds ``n`` units of a good back.
+    :type restock: Optional[Callable[[int, int], Awaitable]]
+    :param window: Seconds a batch waits for more deductions.
+    :type window: float
+    :param max_batch: Deductions that flush a batch before its window ends.
+    :type max_batch: int
+    """
+
+    def __init__(
+        self,
+        deduct_up_to: Callable[[int, int], Awaitable[int]],
+        window: float,
+        max_batch: int = 1000,
+        restock: Optional[Callable[[int, int], Awaitable]] = None,
+    ):
+        self.deduct_up_to = deduct_up_to
+        self.restock = restock
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: dict[int, _Batch] = {}
+        self._flushes: set[asyncio.Task] = set()
+
+    async def deduct(self, good_id: int):
+        """
+        Deducts one unit of a good as part of the next batch for it.
+
+        :param good_id: The ID of the good.
+        :type good_id: int
+        :raises ValueError: If the stock ran out before this deduction's turn.
+        :raises Exception: If applying the batch failed.
+        """
+
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(good_id)
+        if batch is None:
+            batch = self._pending[good_id] = _Batch()
+            batch.timer = loop.call_later(self.window, self._flush, good_id, batch)
+        waiter = loop.create_future()
+        batch.waiters.append(waiter)
+        if len(batch.waiters) >= self.max_batch:
+            batch.timer.cancel()
+            self._flush(good_id, batch)
+        await waiter
+
+    def _flush(self, good_id: int, batch: _Batch):
+        if self._pending.get(good_id) is batch:
+            del self._pending[good_id]
+        task = asyncio.create_task(self._apply(good_id, batch))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _apply(self, good_id: int, batch: _Batch):
+        # Deductions cancelled while waiting (e.g. client disconnects) are dropped
+        waiters = [waiter for waiter in batch.waiters if not waiter.done()]
+        if not waiters:
+            return
+        try:
+            granted = await self.deduct_up_to(good_id, len(waiters))
+        except Exception as e:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        # Waiters cancelled during the call must not use up a granted unit
+        waiters = [waiter for waiter in waiters if not waiter.done()]
+        for index, waiter in enumerate(waiters):
+            if index < granted:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(ValueError("Product count less than 0"))
+        surplus = granted - len(waiters)
+        if surplus > 0 and self.restock is not None:
+            try:
+                await self.restock(good_id, surplus)
+            except Exception as e:
+                logger.error(f"Failed to restock {surplus} of good {good_id}: {e}")
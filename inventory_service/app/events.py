@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import threading
+from typing import AsyncIterator, Optional
+
+# Events buffered per subscriber before it is considered too slow and dropped
+SUBSCRIBER_QUEUE_SIZE: int = int(os.getenv("INVENTORY_STREAM_QUEUE_SIZE", "100"))
+# Seconds of silence after which a keep-alive comment is sent
+KEEPALIVE_SECONDS: float = float(os.getenv("INVENTORY_STREAM_KEEPALIVE", "15"))
+
+
+class Subscription:
+    """
+    A single stream consumer with its own bounded event queue.
+
+    :param loop: The event loop the consumer runs on.
+    :type loop: asyncio.AbstractEventLoop
+    :param good_ids: The goods to receive events for, or None for all goods.
+    :type good_ids: Optional[frozenset[int]]
+    :param queue_size: The number of undelivered events kept before dropping.
+    :type queue_size: int
+
+    :ivar dropped: Whether the subscriber fell behind and was cut off.
+    :vartype dropped: bool
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        good_ids: Optional[frozenset[int]],
+        queue_size: int,
+    ):
+        self.loop = loop
+        self.good_ids = good_ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped: bool = False
+
+    def wants(self, good_id: int) -> bool:
+        """
+        Checks whether this subscriber listens to a good.
+
+        :param good_id: The ID of the good the event is about.
+        :type good_id: int
+        :return: True if the event should be delivered.
+        :rtype: bool
+        """
+
+        return self.good_ids is None or good_id in self.good_ids
+
+    def offer(self, event: dict):
+        """
+        Enqueues an event; must run on the subscriber's loop.
+
+        A full queue means the consumer is not keeping up: its backlog is
+        discarded and it is sent an end-of-stream marker instead, so one slow
+        client cannot grow memory without bound.
+
+        :param event: The event to deliver.
+        :type event: dict
+        """
+
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class StockEventBus:
+    """
+    In-process publish/subscribe hub for stock and price changes.
+
+    ``publish`` may be called from any thread; delivery is handed to each
+    subscriber's event loop.
+
+    :param queue_size: The per-subscriber queue bound.
+    :type queue_size: int
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscriptions: set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self, good_ids: Optional[frozenset[int]] = None) -> Subscription:
+        """
+        Registers a subscriber; must be called from the consumer's event loop.
+
+        :param good_ids: The goods to receive events for, or None for all goods.
+        :type good_ids: Optional[frozenset[int]]
+        :return: The new subscription.
+        :rtype: Subscription
+        """
+
+        subscription = Subscription(
+            asyncio.get_running_loop(), good_ids, self.queue_size
+        )
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+        Removes a subscriber.
+
+        :param subscription: The subscription to remove.
+        :type subscription: Subscription
+        """
+
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event: dict):
+        """
+        Delivers an event to every subscriber listening to its good.
+
+        :param event: The event; must contain the good's ``id``.
+        :type event: dict
+        """
+
+        with self._lock:
+            subscriptions = [
+                sub for sub in self._subscriptions if sub.wants(event["id"])
+            ]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+    async def stream(
+        self, subscription: Subscription, keepalive: float = KEEPALIVE_SECONDS
+    ) -> AsyncIterator[str]:
+        """
+        Formats a subscription's events as a Server-Sent Events stream.
+
+        The subscription is removed when the stream ends or the client goes away.
+
+        :param subscription: The subscription to stream.
+        :type subscription: Subscription
+        :param keepalive: Seconds of silence after which a comment is sent.
+        :type keepalive: float
+        :return: An async iterator over SSE frames.
+        :rtype: AsyncIterator[str]
+        """
+
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    yield "event: overflow\ndata: {}\n\n"
+                    return
+                yield f"event: stock\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(subscription)
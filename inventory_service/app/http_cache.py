@@ -0,0 +1,163 @@
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+# Seconds shared caches may reuse a response, per class of field it contains
+STATIC_MAX_AGE: int = int(os.getenv("INVENTORY_STATIC_MAX_AGE", "300"))
+VOLATILE_MAX_AGE: int = int(os.getenv("INVENTORY_VOLATILE_MAX_AGE", "5"))
+
+FIELD_CLASSES: dict[str, str] = {
+    "id": "static",
+    "name": "static",
+    "category": "static",
+    "description": "static",
+    "price": "volatile",
+    "count": "volatile",
+    "shards": "volatile",
+    "version": "volatile",
+    "price_version": "volatile",
+    "updated_at": "volatile",
+}
+MAX_AGES: dict[str, int] = {"static": STATIC_MAX_AGE, "volatile": VOLATILE_MAX_AGE}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[list[str]]:
+    """
+    Parses a comma-separated ``fields`` query parameter.
+
+    :param fields: The raw parameter, e.g. ``"name,description"``.
+    :type fields: Optional[str]
+    :return: The requested field names, or None to return every field.
+    :rtype: Optional[list[str]]
+    :raises ValueError: If a requested field does not exist.
+    """
+
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in FIELD_CLASSES]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def cache_control(fields: Iterable[str]) -> str:
+    """
+    Builds a ``Cache-Control`` header for a response containing ``fields``.
+
+    The response may be cached for as long as its most volatile field allows.
+
+    :param fields: The fields present in the response.
+    :type fields: Iterable[str]
+    :return: The header value.
+    :rtype: str
+    """
+
+    max_age = min(
+        (MAX_AGES[FIELD_CLASSES.get(field, "volatile")] for field in fields),
+        default=VOLATILE_MAX_AGE,
+    )
+    return f"public, max-age={max_age}"
+
+
+def make_etag(good: dict) -> Optional[str]:
+    """
+    Derives a strong ETag from an inventory row's version.
+
+    For sharded goods the summed stock is included, since shard updates do not
+    bump the parent row's version.
+
+    :param good: The inventory row.
+    :type good: dict
+    :return: The quoted ETag, or None if the row carries no version.
+    :rtype: Optional[str]
+    """
+
+    if good.get("version") is None:
+        return None
+    tag = f"{good['id']}-{good['version']}"
+    if good.get("shards"):
+        tag = f"{tag}-{good['count']}"
+    return f'"{tag}"'
+
+
+def last_modified(good: dict) -> Optional[datetime]:
+    """
+    Reads an inventory row's ``updated_at`` timestamp.
+
+    Sharded goods have none: shard deductions change their stock without
+    touching the parent row, so only their ETag can tell whether they changed.
+
+    :param good: The inventory row.
+    :type good: dict
+    :return: The modification time, or None if unknown.
+    :rtype: Optional[datetime]
+    """
+
+    updated_at = good.get("updated_at")
+    if not updated_at or good.get("shards"):
+        return None
+    return datetime.fromisoformat(updated_at).replace(microsecond=0)
+
+
+def validator_headers(good: dict, fields: Iterable[str]) -> dict[str, str]:
+    """
+    Builds the ``ETag``, ``Last-Modified`` and ``Cache-Control`` response headers.
+
+    :param good: The inventory row.
+    :type good: dict
+    :param fields: The fields present in the response body.
+    :type fields: Iterable[str]
+    :return: The headers to send.
+    :rtype: dict[str, str]
+    """
+
+    headers = {"Cache-Control": cache_control(fields)}
+    etag = make_etag(good)
+    if etag:
+        headers["ETag"] = etag
+    modified = last_modified(good)
+    if modified:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(
+    good: dict, if_none_match: Optional[str], if_modified_since: Optional[str]
+) -> bool:
+    """
+    Evaluates conditional request headers against an inventory row.
+
+    ``If-None-Match`` takes precedence; ``If-Modified-Since`` is only consulted
+    when it is absent, as required by RFC 9110.
+
+    :param good: The inventory row.
+    :type good: dict
+    :param if_none_match: The ``If-None-Match`` request header.
+    :type if_none_match: Optional[str]
+    :param if_modified_since: The ``If-Modified-Since`` request header.
+    :type if_modified_since: Optional[str]
+    :return: True if a 304 Not Modified response should be sent.
+    :rtype: bool
+    """
+
+    if if_none_match:
+        etag = make_etag(good)
+        if etag is None:
+            return False
+        candidates = {
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        }
+        return "*" in candidates or etag in candidates
+
+    modified = last_modified(good)
+    if if_modified_since and modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return modified <= since
+    return False
@@ -1,9 +1,99 @@
-from app.models import Good, GoodUpdate
-from app.service import add_good, deduct_good, get_good, update_good
-from fastapi import FastAPI, HTTPException
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Annotated, Optional
+
+from app.bulk_import import IMPORT_BATCH_SIZE, ImportFormat, detect_format
+from app.http_cache import is_not_modified, parse_fields, validator_headers
+from app.models import (
+    CatalogQuery,
+    Good,
+    GoodUpdate,
+    StockAdjustment,
+    StockDeduction,
+    StockSharding,
+)
+from app.service import (
+    CATALOG_REFRESH_SECONDS,
+    add_good,
+    adjust_stock_bulk,
+    build_inventory_stats,
+    build_price_history,
+    build_search_index,
+    check_database,
+    close_database,
+    connect_database,
+    deduct_good,
+    deduct_stock_batch,
+    get_availability,
+    get_availability_batch,
+    get_good,
+    get_inventory_stats,
+    get_price_at,
+    import_goods,
+    query_goods,
+    refresh_catalog_periodically,
+    restock_batch,
+    search_goods,
+    set_stock_sharding,
+    stream_stock_events,
+    update_good,
+)
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from loguru import logger
 
-app = FastAPI()
+# Seconds before a failed startup build is retried; doubles up to a minute
+WARM_UP_RETRY_SECONDS: float = float(os.getenv("INVENTORY_WARM_UP_RETRY_SECONDS", "1"))
+
+
+async def _build_until_done(build):
+    # A failed build would otherwise leave its endpoints answering 503 for good
+    delay = WARM_UP_RETRY_SECONDS
+    while True:
+        try:
+            return await build()
+        except Exception as e:
+            logger.exception(e)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60)
+
+
+async def _warm_up():
+    await asyncio.gather(
+        _build_until_done(build_search_index),
+        _build_until_done(build_inventory_stats),
+        _build_until_done(build_price_history),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Connects to the database, then builds the search index, inventory
+    statistics and price history, and keeps the catalog snapshot fresh if
+    ``INVENTORY_CATALOG_REFRESH_SECONDS`` is set, in the background while
+    serving requests. The database client is closed on shutdown.
+
+    :param app: The application being started.
+    :type app: FastAPI
+    """
+
+    await connect_database()
+    tasks = [asyncio.create_task(_warm_up())]
+    if CATALOG_REFRESH_SECONDS > 0:
+        # Re-reads the whole table each time, so only run it when it is wanted
+        tasks.append(asyncio.create_task(refresh_catalog_periodically()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await close_database()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/health")
@@ -11,25 +101,47 @@ async def health_check():
     """
     Health check endpoint to verify the service is operational.
 
-    :return: A simple status message indicating service health.
+    :return: The service status and the result of the last database probe.
+    :rtype: dict
+    """
+
+    probe = await check_database()
+    return {
+        "status": "OK" if probe["connected"] else "ERROR",
+        "db_status": "connected" if probe["connected"] else "disconnected",
+        **probe,
+    }
+
+
+@app.get("/health/live")
+async def liveness_check():
+    """
+    Liveness probe: the process is up and serving requests.
+
+    It never touches the database, so a database outage does not get the pod
+    restarted.
+
+    :return: A static status message.
     :rtype: dict
     """
-    try:
-        # Perform a simple check to ensure the service is operational
-        # For example, check if you can retrieve an inventory item or perform a simple query
-        inventory_check = get_good(1)  # Assuming an item with ID 1 exists for the check
-        return {
-            "status": "OK",
-            "db_status": "connected",
-            "sample_item_check": inventory_check,
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return {
-            "status": "ERROR",
-            "db_status": "disconnected",
-            "error": str(e),
-        }
+
+    return {"status": "OK"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness probe: the service can reach its database.
+
+    :return: The last database probe; status code 503 if it failed.
+    :rtype: JSONResponse
+    """
+
+    probe = await check_database()
+    return JSONResponse(
+        {"status": "OK" if probe["connected"] else "ERROR", **probe},
+        status_code=200 if probe["connected"] else 503,
+    )
 
 
 @app.post("/api/v1/inventory/add")
@@ -45,12 +157,172 @@ async def add_good_endpoint(good: Good):
     """
 
     try:
-        return add_good(good)
+        return await add_good(good)
     except Exception as e:
         logger.exception(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/v1/inventory/import")
+async def import_goods_endpoint(
+    request: Request,
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=5000),
+    format: Optional[ImportFormat] = None,
+):
+    """
+    Bulk imports inventory items from a streamed CSV or NDJSON request body.
+
+    The format is taken from the ``format`` query parameter, or else from the
+    ``Content-Type`` header (``text/csv`` or ``application/x-ndjson``). Rows with
+    an ``id`` column replace the existing item; other rows are added.
+
+    :param request: The incoming request whose body is streamed.
+    :type request: Request
+    :param batch_size: The number of rows written per database statement.
+    :type batch_size: int
+    :param format: The body format, overriding the ``Content-Type`` header.
+    :type format: Optional[ImportFormat]
+    :return: A report of processed, imported and failed rows with per-row errors.
+    :rtype: dict
+    :raises HTTPException: If the body format is not supported or the import fails.
+    """
+
+    fmt = format or detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Body must be CSV or NDJSON (newline-delimited JSON)",
+        )
+    try:
+        return await import_goods(request.stream(), fmt, batch_size)
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/inventory/search")
+async def search_goods_endpoint(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    prefix: bool = True,
+):
+    """
+    Searches inventory items by name and description.
+
+    :param q: The search text.
+    :type q: str
+    :param limit: The maximum number of results.
+    :type limit: int
+    :param prefix: Whether query words also match longer words they prefix.
+    :type prefix: bool
+    :return: Matching items as ``{"id", "name", "score"}``, best first.
+    :rtype: list[dict]
+    :raises HTTPException: If the search index is still being built.
+    """
+
+    try:
+        return search_goods(q, limit=limit, prefix=prefix)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.get("/api/v1/inventory/stats")
+async def get_inventory_stats_endpoint():
+    """
+    Retrieves per-category counts and stock value, and the goods low on stock.
+
+    The figures are maintained incrementally as goods change, so this does not
+    scan the inventory.
+
+    :return: Overall and per-category ``goods``, ``units`` and ``stock_value``,
+        the low-stock threshold, the goods below it, and when the figures were
+        last rebuilt.
+    :rtype: dict
+    :raises HTTPException: If the statistics are still being built.
+    """
+
+    try:
+        return get_inventory_stats()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.post("/api/v1/inventory/stats/rebuild")
+async def rebuild_inventory_stats_endpoint():
+    """
+    Recomputes the inventory statistics from the database to reconcile any drift.
+
+    :return: The rebuilt statistics.
+    :rtype: dict
+    :raises HTTPException: If a rebuild is already running or the rebuild fails.
+    """
+
+    try:
+        return await build_inventory_stats()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/inventory/catalog/query")
+async def query_goods_endpoint(query: Annotated[CatalogQuery, Query()]):
+    """
+    Filters and sorts the catalog in memory, for internal high-rate callers.
+
+    For example, electronics priced up to $200 with more than 5 units in stock,
+    cheapest first: ``?category=electronics&max_price=200&min_count=6&sort_by=price``.
+    Results come from a columnar snapshot refreshed every
+    ``INVENTORY_CATALOG_REFRESH_SECONDS``; ``snapshot_at`` tells how fresh it is.
+    The snapshot is off unless that setting is positive.
+
+    :param query: The filters, ordering and limit.
+    :type query: CatalogQuery
+    :return: ``snapshot_at`` and the matching ``goods``.
+    :rtype: dict
+    :raises HTTPException: If the catalog snapshot is disabled or has not been
+        loaded yet.
+    """
+
+    try:
+        return query_goods(query)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.get("/api/v1/inventory/stream")
+async def stream_stock_events_endpoint(ids: Optional[str] = None):
+    """
+    Streams stock and price changes as Server-Sent Events.
+
+    Each change is sent as an ``event: stock`` frame whose data holds the good's
+    ``id`` and its new ``count``/``price`` (sharded goods send ``count_delta``
+    instead of ``count``). A client that falls too far behind receives
+    ``event: overflow`` and the stream ends; it should refetch and reconnect.
+
+    :param ids: Comma-separated IDs of the goods to follow; all goods if omitted.
+    :type ids: Optional[str]
+    :return: A ``text/event-stream`` response.
+    :rtype: StreamingResponse
+    :raises HTTPException: If ``ids`` is not a list of integers.
+    """
+
+    good_ids = None
+    if ids:
+        try:
+            good_ids = frozenset(int(good_id) for good_id in ids.split(","))
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail="ids must be comma-separated integers"
+            )
+    return StreamingResponse(
+        stream_stock_events(good_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.put("/api/v1/inventory/update/{good_id}")
 async def update_good_endpoint(good_id: int, good: GoodUpdate):
     """
@@ -62,52 +334,260 @@ async def update_good_endpoint(good_id: int, good: GoodUpdate):
     :type good: GoodUpdate
     :return: The response from the service layer after updating the item.
     :rtype: dict
-    :raises HTTPException: If the item is not found or if an error occurs during the update process.
+    :raises HTTPException: If the item is not found (404), its stock cannot be
+        changed as asked (409), or an error occurs during the update process.
     """
 
     try:
-        return update_good(good_id, good)
+        return await update_good(good_id, good)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/v1/inventory/stock/bulk")
+async def adjust_stock_bulk_endpoint(adjustments: list[StockAdjustment]):
+    """
+    Applies many stock changes at once, e.g. for warehouse reconciliation.
+
+    Each item sets either an ``absolute`` count or a relative ``delta``. Items
+    are applied in chunked single-statement updates and reported individually
+    as ``applied``, ``not_found``, ``sharded``, ``insufficient_stock`` or
+    ``error``.
+
+    :param adjustments: The ``{"id", "delta"}`` or ``{"id", "absolute"}`` items.
+    :type adjustments: list[StockAdjustment]
+    :return: The numbers of applied and failed items and the per-item outcomes.
+    :rtype: dict
+    :raises HTTPException: If the request is too large or repeats an ID, or the update fails.
+    """
+
+    try:
+        return await adjust_stock_bulk(adjustments)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/v1/inventory/stock/deduct")
+async def deduct_stock_batch_endpoint(items: list[StockDeduction]):
+    """
+    Deducts the items of a checkout in one transaction, all or nothing.
+
+    :param items: The ``{"id", "quantity"}`` items.
+    :type items: list[StockDeduction]
+    :return: The per-item outcomes, all ``applied``.
+    :rtype: dict
+    :raises HTTPException: If the items are invalid or any good is missing or short
+        of stock (nothing is deducted), or the update fails.
+    """
+
+    try:
+        return await deduct_stock_batch(items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/v1/inventory/stock/restock")
+async def restock_batch_endpoint(items: list[StockDeduction]):
+    """
+    Adds the units of a checkout that could not be completed back to stock.
+
+    :param items: The ``{"id", "quantity"}`` items.
+    :type items: list[StockDeduction]
+    :return: The per-item outcomes, ``applied`` or ``not_found``.
+    :rtype: dict
+    :raises HTTPException: If the items are invalid or the update fails.
+    """
+
+    try:
+        return await restock_batch(items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.put("/api/v1/inventory/sharding/{good_id}")
+async def set_stock_sharding_endpoint(good_id: int, sharding: StockSharding):
+    """
+    Splits an item's stock across sub-counters for high-contention sales, or merges it back.
+
+    :param good_id: The ID of the item.
+    :type good_id: int
+    :param sharding: The number of sub-counters; 0 disables sharding.
+    :type sharding: StockSharding
+    :return: The response from the service layer with the updated item.
+    :rtype: dict
+    :raises HTTPException: If the item is not found or is already in the requested mode.
+    """
+
+    try:
+        return await set_stock_sharding(good_id, sharding.shards)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/inventory/availability")
+async def get_availability_batch_endpoint(ids: str):
+    """
+    Retrieves the stock, price and versions of several inventory items at once.
+
+    :param ids: Comma-separated IDs of the items.
+    :type ids: str
+    :return: ``goods`` as ``{"id", "count", "price", "version", "price_version"}``
+        and the ``missing`` IDs.
+    :rtype: dict
+    :raises HTTPException: If ``ids`` is malformed or too long, or an error
+        occurs during retrieval.
+    """
+
+    try:
+        good_ids = [int(good_id) for good_id in ids.split(",")]
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="ids must be comma-separated integers"
+        )
+
+    try:
+        return await get_availability_batch(good_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/inventory/{good_id}/availability")
+async def get_availability_endpoint(good_id: int):
+    """
+    Retrieves whether an inventory item is in stock and at what price.
+
+    A projection of the item for the purchase path: no name or description.
+
+    :param good_id: The ID of the item.
+    :type good_id: int
+    :return: The item's ``count``, ``price``, ``version`` and ``price_version``.
+    :rtype: dict
+    :raises HTTPException: If the item is not found or an error occurs during retrieval.
+    """
+
+    try:
+        return await get_availability(good_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/inventory/{good_id}/price")
+async def get_price_endpoint(good_id: int, at: Optional[datetime] = None):
+    """
+    Resolves the price an inventory item had at a point in time.
+
+    Served from an in-memory index of price changes, so sales and analytics can
+    price a purchase as of when it was placed without querying the database.
+
+    :param good_id: The ID of the item.
+    :type good_id: int
+    :param at: An ISO 8601 time or Unix timestamp; now if omitted.
+    :type at: Optional[datetime]
+    :return: The ``price``, when it took effect (``valid_from``) and ``at``.
+    :rtype: dict
+    :raises HTTPException: If no price was recorded for the item at that time,
+        or the price history is still loading.
+    """
+
+    try:
+        return get_price_at(good_id, at)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
 @app.get("/api/v1/inventory/{good_id}")
-async def get_good_endpoint(good_id: int):
+async def get_good_endpoint(
+    good_id: int,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+):
     """
-    Retrieves an inventory item by its ID.
+    Retrieves an inventory item by its ID, with HTTP cache validators.
+
+    The response carries an ``ETag`` derived from the row version, a
+    ``Last-Modified`` date, and a ``Cache-Control`` max-age chosen by the most
+    volatile field returned. A matching ``If-None-Match`` (or, without it, a
+    current ``If-Modified-Since``) is answered with 304 and no body.
 
     :param good_id: The ID of the item to be retrieved.
     :type good_id: int
+    :param fields: Comma-separated fields to return, e.g. ``name,description``.
+    :type fields: Optional[str]
+    :param if_none_match: ETags the client already holds.
+    :type if_none_match: Optional[str]
+    :param if_modified_since: The date of the copy the client already holds.
+    :type if_modified_since: Optional[str]
     :return: The details of the requested inventory item.
     :rtype: dict
-    :raises HTTPException: If the item is not found or if an error occurs during retrieval.
+    :raises HTTPException: If the item is not found, a field is unknown, or an error occurs during retrieval.
     """
 
     try:
-        return get_good(good_id)
+        selected_fields = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        good = await get_good(good_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    body = (
+        good
+        if selected_fields is None
+        else {field: good.get(field) for field in selected_fields}
+    )
+    headers = validator_headers(good, body.keys())
+    if is_not_modified(good, if_none_match, if_modified_since):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
 
 @app.put("/api/v1/inventory/deduct/{good_id}")
-async def deduct_good_endpoint(good_id: int):
+async def deduct_good_endpoint(good_id: int, price_version: Optional[int] = None):
     """
     Deducts one unit from an inventory item by its ID.
 
     :param good_id: The ID of the item to be deducted.
     :type good_id: int
+    :param price_version: Refuse the deduction unless the item's price is still
+        at this version, as returned by the availability endpoints. Optional.
+    :type price_version: Optional[int]
     :return: The response from the service layer after deduction.
     :rtype: dict
-    :raises HTTPException: If the stock is insufficient or if an error occurs during deduction.
+    :raises HTTPException: If the stock is insufficient, the price has changed
+        (409), or an error occurs during deduction.
     """
 
     try:
-        return deduct_good(good_id)
+        return await deduct_good(good_id, price_version)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,7 @@
 from enum import Enum
 from typing import Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class Category(str, Enum):
@@ -48,6 +48,9 @@ class GoodUpdate(BaseModel):
     :type description: Optional[str]
     :param count: The new stock count of the item. Must be non-negative. Optional.
     :type count: Optional[int]
+    :param count_delta: A relative change applied to the current stock count, e.g. ``-3``
+        or ``+10``. Cannot be combined with ``count``. Optional.
+    :type count_delta: Optional[int]
     """
 
     name: Optional[str] = Field(None, max_length=100)
@@ -55,3 +58,119 @@ class GoodUpdate(BaseModel):
     price: Optional[float] = Field(None, gt=0)
     description: Optional[str] = Field(None, max_length=255)
     count: Optional[int] = Field(None, ge=0)
+    count_delta: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_count_or_delta(self):
+        """
+        Ensures an update sets the stock either absolutely or relatively, not both.
+
+        :raises ValueError: If both ``count`` and ``count_delta`` are provided.
+        """
+
+        if self.count is not None and self.count_delta is not None:
+            raise ValueError("Provide either 'count' or 'count_delta', not both.")
+        return self
+
+
+class GoodImport(Good):
+    """
+    Represents one row of a bulk inventory import.
+
+    Rows carrying an ``id`` replace the existing item with that ID; rows
+    without one are inserted as new items.
+
+    :param id: The ID of the existing item to replace. Optional.
+    :type id: Optional[int]
+    """
+
+    id: Optional[int] = Field(None, gt=0)
+
+
+class StockAdjustment(BaseModel):
+    """
+    Represents one stock change in a bulk adjustment.
+
+    :param id: The ID of the item to adjust.
+    :type id: int
+    :param delta: A relative change applied to the current stock count. Optional.
+    :type delta: Optional[int]
+    :param absolute: The new stock count. Must be non-negative. Optional.
+    :type absolute: Optional[int]
+    """
+
+    id: int = Field(..., gt=0)
+    delta: Optional[int] = None
+    absolute: Optional[int] = Field(None, ge=0)
+
+    @model_validator(mode="after")
+    def check_delta_or_absolute(self):
+        """
+        Ensures exactly one of ``delta`` and ``absolute`` is provided.
+
+        :raises ValueError: If neither or both are provided.
+        """
+
+        if (self.delta is None) == (self.absolute is None):
+            raise ValueError("Provide exactly one of 'delta' or 'absolute'.")
+        return self
+
+
+class StockDeduction(BaseModel):
+    """
+    Represents the units of one item taken by a checkout.
+
+    :param id: The ID of the item.
+    :type id: int
+    :param quantity: The number of units. Must be positive.
+    :type quantity: int
+    """
+
+    id: int = Field(..., gt=0)
+    quantity: int = Field(1, gt=0)
+
+
+class StockSharding(BaseModel):
+    """
+    Represents the sharded-stock setting of an inventory item.
+
+    :param shards: The number of sub-counters to split the stock across; 0 folds
+        the stock back into a single counter.
+    :type shards: int
+    """
+
+    shards: int = Field(..., ge=0, le=64)
+
+
+class CatalogQuery(BaseModel):
+    """
+    Represents a filtered, sorted query over the catalog snapshot.
+
+    All bounds are inclusive; e.g. "stock > 5" is ``min_count=6``.
+
+    :param category: Only goods in this category. Optional.
+    :type category: Optional[Category]
+    :param min_price: The lowest price. Optional.
+    :type min_price: Optional[float]
+    :param max_price: The highest price. Optional.
+    :type max_price: Optional[float]
+    :param min_count: The fewest units in stock. Optional.
+    :type min_count: Optional[int]
+    :param max_count: The most units in stock. Optional.
+    :type max_count: Optional[int]
+    :param sort_by: The column to order by.
+    :type sort_by: Literal["price", "count", "id"]
+    :param descending: Whether to order from highest to lowest.
+    :type descending: bool
+    :param limit: The maximum number of goods returned (1 to 1000).
+    :type limit: int
+    """
+
+    category: Optional[Category] = None
+    min_price: Optional[float] = Field(None, ge=0)
+    max_price: Optional[float] = Field(None, ge=0)
+    min_count: Optional[int] = Field(None, ge=0)
+    max_count: Optional[int] = Field(None, ge=0)
+    sort_by: Literal["price", "count", "id"] = "price"
+    descending: bool = False
+    limit: int = Field(50, ge=1, le=1000)
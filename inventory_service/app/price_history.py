@@ -0,0 +1,122 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Union
+
+
+def to_timestamp(value: Union[str, datetime]) -> float:
+    """
+    Converts a timestamp to seconds since the epoch; naive values are taken as UTC.
+
+    :param value: An ISO 8601 string, as returned by the database, or a datetime.
+    :type value: Union[str, datetime]
+    :return: The POSIX timestamp.
+    :rtype: float
+    """
+
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class PriceHistory:
+    """
+    In-memory index of every good's price changes, for point-in-time lookups.
+
+    Each good keeps two parallel ``array('d')`` columns, the times its prices
+    took effect (sorted) and the prices, i.e. 16 bytes per change. A lookup is a
+    binary search over one good's changes. Recording the same change twice (once
+    live, once while loading from the database) is harmless. All public methods
+    are thread-safe.
+
+    :ivar ready: Whether the history has been loaded from the database.
+    :vartype ready: bool
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty history.
+        """
+
+        self.ready: bool = False
+        self._times: dict[int, array] = {}
+        self._prices: dict[int, array] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def _record(self, good_id: int, valid_from: float, price: float):
+        times = self._times.get(good_id)
+        if times is None:
+            self._times[good_id] = array("d", (valid_from,))
+            self._prices[good_id] = array("d", (price,))
+            return
+        prices = self._prices[good_id]
+        if valid_from > times[-1]:
+            times.append(valid_from)
+            prices.append(price)
+            return
+        position = bisect_left(times, valid_from)
+        if times[position] == valid_from:
+            prices[position] = price
+        else:
+            times.insert(position, valid_from)
+            prices.insert(position, price)
+
+    def record(self, good_id: int, valid_from: Union[str, datetime], price: float):
+        """
+        Records that a good's price changed.
+
+        :param good_id: The ID of the good.
+        :type good_id: int
+        :param valid_from: When the price took effect.
+        :type valid_from: Union[str, datetime]
+        :param price: The new price.
+        :type price: float
+        """
+
+        with self._lock:
+            self._record(good_id, to_timestamp(valid_from), price)
+
+    def add_page(self, entries: Iterable[dict]):
+        """
+        Loads a page of rows from the ``inventory_price_history`` table.
+
+        :param entries: Rows containing ``good_id``, ``price`` and ``valid_from``.
+        :type entries: Iterable[dict]
+        """
+
+        with self._lock:
+            for entry in entries:
+                self._record(
+                    entry["good_id"], to_timestamp(entry["valid_from"]), entry["price"]
+                )
+
+    def price_at(
+        self, good_id: int, at: Union[str, datetime]
+    ) -> Optional[tuple[float, float]]:
+        """
+        Finds the price a good had at a given time.
+
+        :param good_id: The ID of the good.
+        :type good_id: int
+        :param at: The point in time.
+        :type at: Union[str, datetime]
+        :return: The price and the timestamp it took effect, or None if the good
+            had no recorded price at that time.
+        :rtype: Optional[tuple[float, float]]
+        """
+
+        timestamp = to_timestamp(at)
+        with self._lock:
+            times = self._times.get(good_id)
+            if times is None:
+                return None
+            position = bisect_right(times, timestamp) - 1
+            if position < 0:
+                return None
+            return self._prices[good_id][position], times[position]
@@ -0,0 +1,247 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Iterable, Optional
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+# Name terms count this many times towards a good's term frequencies
+NAME_BOOST = 2
+# Upper bound on index terms a single query token may expand to by prefix
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text: Optional[str]) -> list[str]:
+    """
+    Splits text into lowercase alphanumeric tokens.
+
+    :param text: The text to tokenize.
+    :type text: Optional[str]
+    :return: The tokens in their original order.
+    :rtype: list[str]
+    """
+
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over inventory names and descriptions, ranked with BM25.
+
+    Documents are keyed by good ID. Each term maps to the goods containing it and
+    the term frequency in each; name terms are weighted by ``NAME_BOOST``. The
+    vocabulary is also kept sorted so query tokens can be expanded to every term
+    they prefix. All public methods are thread-safe.
+
+    :param k1: BM25 term-frequency saturation.
+    :type k1: float
+    :param b: BM25 document-length normalisation.
+    :type b: float
+
+    :ivar ready: Whether the initial build from the database has completed.
+    :vartype ready: bool
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initializes an empty index.
+
+        :param k1: BM25 term-frequency saturation.
+        :type k1: float
+        :param b: BM25 document-length normalisation.
+        :type b: float
+        """
+
+        self.k1 = k1
+        self.b = b
+        self.ready: bool = False
+        self._postings: dict[str, dict[int, int]] = {}
+        self._doc_terms: dict[int, tuple[str, ...]] = {}
+        self._doc_lengths: dict[int, int] = {}
+        self._doc_names: dict[int, str] = {}
+        self._total_length: int = 0
+        self._terms: list[str] = []
+        self._terms_sorted: bool = True
+        self._building: bool = False
+        self._touched_during_build: set[int] = set()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def _remove(self, good_id: int):
+        terms = self._doc_terms.pop(good_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[good_id]
+            if not postings:
+                del self._postings[term]
+                if self._terms_sorted:
+                    self._terms.pop(bisect_left(self._terms, term))
+        self._total_length -= self._doc_lengths.pop(good_id)
+        del self._doc_names[good_id]
+
+    def _add(self, good_id: int, name: str, description: Optional[str]):
+        self._remove(good_id)
+        frequencies = Counter(tokenize(description))
+        for term in tokenize(name):
+            frequencies[term] += NAME_BOOST
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if self._terms_sorted:
+                    insort(self._terms, term)
+            postings[good_id] = frequency
+        length = sum(frequencies.values())
+        self._doc_terms[good_id] = tuple(frequencies)
+        self._doc_lengths[good_id] = length
+        self._doc_names[good_id] = name
+        self._total_length += length
+
+    def add(self, good: dict):
+        """
+        Indexes a good, replacing any previous version of it.
+
+        :param good: The good's row; must contain ``id`` and ``name``.
+        :type good: dict
+        """
+
+        with self._lock:
+            if self._building:
+                self._touched_during_build.add(good["id"])
+            self._add(good["id"], good["name"], good.get("description"))
+
+    def remove(self, good_id: int):
+        """
+        Removes a good from the index, if present.
+
+        :param good_id: The ID of the good to remove.
+        :type good_id: int
+        """
+
+        with self._lock:
+            if self._building:
+                self._touched_during_build.add(good_id)
+            self._remove(good_id)
+
+    def begin_build(self):
+        """
+        Starts a bulk build; vocabulary sorting is deferred until ``finish_build``.
+
+        Goods added or removed through ``add``/``remove`` while the build is running
+        take precedence over the (older) rows passed to ``add_page``.
+        """
+
+        with self._lock:
+            self.ready = False
+            self._building = True
+            self._terms_sorted = False
+            self._touched_during_build.clear()
+
+    def add_page(self, goods: Iterable[dict]):
+        """
+        Indexes a page of rows read during a bulk build.
+
+        :param goods: Rows containing ``id``, ``name`` and ``description``.
+        :type goods: Iterable[dict]
+        """
+
+        with self._lock:
+            for good in goods:
+                if good["id"] not in self._touched_during_build:
+                    self._add(good["id"], good["name"], good.get("description"))
+
+    def abort_build(self):
+        """
+        Abandons a bulk build, e.g. after a failed read.
+
+        The rows indexed so far are kept and the index goes back to incremental
+        updates, but it is not marked ready: it may be missing goods until a
+        build completes.
+        """
+
+        with self._lock:
+            self._terms = sorted(self._postings)
+            self._terms_sorted = True
+            self._building = False
+            self._touched_during_build.clear()
+
+    def finish_build(self):
+        """
+        Completes a bulk build and marks the index ready.
+        """
+
+        with self._lock:
+            self._terms = sorted(self._postings)
+            self._terms_sorted = True
+            self._building = False
+            self._touched_during_build.clear()
+            self.ready = True
+
+    def _expand(self, token: str, prefix: bool) -> list[str]:
+        if not prefix or not self._terms_sorted:
+            return [token] if token in self._postings else []
+        start = bisect_left(self._terms, token)
+        expanded = []
+        for term in self._terms[start : start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            expanded.append(term)
+        return expanded
+
+    def search(self, query: str, limit: int = 20, prefix: bool = True) -> list[dict]:
+        """
+        Ranks goods against a free-text query with BM25.
+
+        Every query token matches the terms it prefixes (when ``prefix`` is set),
+        so ``"lap"`` finds ``"laptop"``; an exact match scores higher than a
+        prefix match of the same term.
+
+        :param query: The search text.
+        :type query: str
+        :param limit: The maximum number of results.
+        :type limit: int
+        :param prefix: Whether query tokens also match longer terms they prefix.
+        :type prefix: bool
+        :return: Matches as ``{"id", "name", "score"}``, best first.
+        :rtype: list[dict]
+        """
+
+        with self._lock:
+            # Goods without any token (e.g. a name of punctuation) match nothing
+            if not self._total_length:
+                return []
+            doc_count = len(self._doc_lengths)
+            doc_lengths = self._doc_lengths
+            k1_plus_1 = self.k1 + 1
+            # BM25 length normalisation folded into two constants per query
+            base_norm = self.k1 * (1 - self.b)
+            length_norm = self.k1 * self.b * doc_count / self._total_length
+            scores: dict[int, float] = {}
+            for token in set(tokenize(query)):
+                for term in self._expand(token, prefix):
+                    postings = self._postings[term]
+                    idf = math.log(
+                        1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5)
+                    )
+                    if term != token:
+                        idf *= len(token) / len(term)
+                    weight = idf * k1_plus_1
+                    for good_id, frequency in postings.items():
+                        scores[good_id] = scores.get(
+                            good_id, 0.0
+                        ) + weight * frequency / (
+                            frequency + base_norm + length_norm * doc_lengths[good_id]
+                        )
+            ranked = heapq.nlargest(
+                limit, scores.items(), key=lambda item: (item[1], -item[0])
+            )
+            return [
+                {"id": good_id, "name": self._doc_names[good_id], "score": score}
+                for good_id, score in ranked
+            ]
@@ -1,16 +1,128 @@
+import asyncio
 import os
+from collections import Counter
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
 
-from app.database import InventoryTable
-from app.models import Good, GoodUpdate
+from app.bulk_import import (
+    IMPORT_BATCH_SIZE,
+    MAX_REPORTED_ERRORS,
+    ImportFormat,
+    iter_records,
+)
+from app.catalog import CatalogBuilder, CatalogSnapshot
+from app.catalog_query import query_catalog
+from app.database import AsyncInventoryTable
+from app.deduction_combiner import DeductionCombiner
+from app.events import StockEventBus
+from app.models import (
+    CatalogQuery,
+    Good,
+    GoodImport,
+    GoodUpdate,
+    StockAdjustment,
+    StockDeduction,
+)
+from app.price_history import PriceHistory
+from app.search import SearchIndex
+from app.stats import InventoryStats
 from dotenv import load_dotenv
+from loguru import logger
+from pydantic import ValidationError
 
 load_dotenv()
-db_inv: InventoryTable = InventoryTable(
-    url=os.getenv("SUPABASE_URL"), key=os.getenv("SUPABASE_KEY")
+stock_events: StockEventBus = StockEventBus()
+# The client is created by connect_database() from the application lifespan
+db_inv: AsyncInventoryTable = AsyncInventoryTable(
+    url=os.getenv("SUPABASE_URL"), key=os.getenv("SUPABASE_KEY"), events=stock_events
+)
+search_index: SearchIndex = SearchIndex()
+inventory_stats: InventoryStats = InventoryStats()
+price_history: PriceHistory = PriceHistory()
+# Columnar copy of the inventory table, replaced wholesale on each refresh
+catalog_snapshot: Optional[CatalogSnapshot] = None
+
+# Seconds a database probe result is reused by the health endpoints
+HEALTH_PROBE_TTL: float = float(os.getenv("INVENTORY_HEALTH_PROBE_TTL", "5"))
+# Stock adjustments applied per database statement by adjust_stock_bulk
+BULK_STOCK_CHUNK_SIZE: int = int(os.getenv("INVENTORY_BULK_STOCK_CHUNK_SIZE", "1000"))
+# Seconds between catalog snapshot refreshes; 0 disables the snapshot and its queries
+CATALOG_REFRESH_SECONDS: float = float(
+    os.getenv("INVENTORY_CATALOG_REFRESH_SECONDS", "0")
+)
+# Upper bound on stock adjustments accepted in one bulk request
+BULK_STOCK_MAX_ITEMS: int = int(os.getenv("INVENTORY_BULK_STOCK_MAX_ITEMS", "200000"))
+# Upper bound on goods checked in one batched availability request
+AVAILABILITY_MAX_IDS: int = int(os.getenv("INVENTORY_AVAILABILITY_MAX_IDS", "100"))
+# Upper bound on items deducted or restocked together by one checkout
+STOCK_BATCH_MAX_ITEMS: int = int(os.getenv("INVENTORY_STOCK_BATCH_MAX_ITEMS", "100"))
+# Milliseconds concurrent deductions of one good are gathered into a single
+# decrement; 0 disables combining and deducts each unit on its own
+DEDUCT_COMBINE_WINDOW_MS: float = float(
+    os.getenv("INVENTORY_DEDUCT_COMBINE_WINDOW_MS", "0")
+)
+
+
+async def _restock_good(good_id: int, quantity: int):
+    await db_inv.restock_batch_in_db([{"id": good_id, "quantity": quantity}])
+
+
+deduction_combiner: Optional[DeductionCombiner] = (
+    DeductionCombiner(
+        db_inv.deduct_stock_up_to_in_db,
+        DEDUCT_COMBINE_WINDOW_MS / 1000,
+        restock=_restock_good,
+    )
+    if DEDUCT_COMBINE_WINDOW_MS > 0
+    else None
 )
 
 
-def add_good(good: Good):
+async def connect_database():
+    """
+    Opens the inventory database client; called once at application startup.
+    """
+
+    await db_inv.connect()
+
+
+async def close_database():
+    """
+    Closes the inventory database client; called at application shutdown.
+    """
+
+    await db_inv.close()
+
+
+async def check_database():
+    """
+    Reports database connectivity from a cached lightweight probe.
+
+    :return: ``connected``, ``latency_ms`` and ``checked_at`` of the last probe,
+        plus ``error`` when it failed.
+    :rtype: dict
+    """
+
+    return await db_inv.check_connection(max_age=HEALTH_PROBE_TTL)
+
+
+def _record_price(row: dict):
+    """
+    Adds a written row's price to the in-memory price history.
+
+    The database stamps the matching history entry with the row's
+    ``updated_at``, so both agree on when the price took effect.
+
+    :param row: The inventory row returned by an insert or update.
+    :type row: dict
+    """
+
+    if "price" in row:
+        valid_from = row.get("updated_at") or datetime.now(timezone.utc)
+        price_history.record(row["id"], valid_from, row["price"])
+
+
+async def add_good(good: Good):
     """
     Adds a new inventory item to the database.
 
@@ -21,11 +133,349 @@ def add_good(good: Good):
     :raises Exception: If the database operation fails.
     """
 
-    db_inv.add_good_to_db(good)
+    added_rows = await db_inv.add_good_to_db(good)
+    for row in added_rows:
+        search_index.add(row)
+        inventory_stats.add(row)
+        _record_price(row)
     return {"message": "Good added successfully"}
 
 
-def update_good(good_id: int, good_update: GoodUpdate):
+def _format_validation_error(error: ValidationError) -> str:
+    """
+    Flattens a Pydantic validation error into a single readable line.
+
+    :param error: The validation error raised for an import row.
+    :type error: ValidationError
+    :return: The field locations and messages joined by semicolons.
+    :rtype: str
+    """
+
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+async def import_goods(
+    chunks: AsyncIterator[bytes],
+    fmt: ImportFormat,
+    batch_size: int = IMPORT_BATCH_SIZE,
+):
+    """
+    Streams a CSV or NDJSON upload into the inventory table.
+
+    Rows are validated as they arrive and written in batches of ``batch_size``,
+    so memory use is bounded by one batch regardless of the file size. Invalid
+    rows, and every row of a batch the database rejects, are reported with their
+    row number; at most ``MAX_REPORTED_ERRORS`` errors are listed.
+
+    A row with an ``id`` replaces that existing good; unknown IDs are refused,
+    as are goods with sharded stock, whose count is kept in their shards.
+
+    :param chunks: The raw body chunks of the upload.
+    :type chunks: AsyncIterator[bytes]
+    :param fmt: The upload format, ``"csv"`` or ``"ndjson"``.
+    :type fmt: ImportFormat
+    :param batch_size: The number of rows written per database statement.
+    :type batch_size: int
+    :return: Counts of processed, imported and failed rows, and the row errors.
+    :rtype: dict
+    """
+
+    report = {"processed": 0, "imported": 0, "failed": 0, "errors": []}
+
+    def record_error(row_number: int, message: str):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": message})
+
+    async def flush(batch: list[tuple[int, dict]]):
+        try:
+            ids = [good["id"] for _, good in batch if "id" in good]
+            shards = await db_inv.get_shards_in_db(ids) if ids else {}
+            accepted = []
+            for row_number, good in batch:
+                if "id" not in good:
+                    accepted.append((row_number, good))
+                elif good["id"] not in shards:
+                    record_error(row_number, f"Good {good['id']} not found")
+                elif shards[good["id"]]:
+                    record_error(
+                        row_number,
+                        f"Good {good['id']} has sharded stock; "
+                        "adjust it through the stock endpoints",
+                    )
+                else:
+                    accepted.append((row_number, good))
+            batch = accepted
+            if not batch:
+                return
+            written_rows = await db_inv.upsert_goods_to_db([good for _, good in batch])
+        except Exception as e:
+            logger.exception(e)
+            for row_number, _ in batch:
+                record_error(row_number, f"Batch rejected by database: {e}")
+            return
+        report["imported"] += len(written_rows)
+        for row in written_rows:
+            search_index.add(row)
+            inventory_stats.add(row)
+            _record_price(row)
+
+    batch: list[tuple[int, dict]] = []
+    async for row_number, record in iter_records(chunks, fmt):
+        report["processed"] += 1
+        if isinstance(record, ValueError):
+            record_error(row_number, str(record))
+            continue
+        try:
+            good = GoodImport.model_validate(record)
+        except ValidationError as e:
+            record_error(row_number, _format_validation_error(e))
+            continue
+        batch.append((row_number, good.model_dump(mode="json", exclude_none=True)))
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    report["errors_truncated"] = report["failed"] > len(report["errors"])
+    logger.info(
+        f"Imported {report['imported']}/{report['processed']} goods "
+        f"({report['failed']} failed)"
+    )
+    return report
+
+
+async def build_search_index(page_size: int = 1000):
+    """
+    Rebuilds the search index from the inventory table.
+
+    Intended to run once at startup as a background task. Goods added or updated
+    while the build is running are kept as indexed by those requests.
+
+    :param page_size: The number of rows read per database round trip.
+    :type page_size: int
+    """
+
+    search_index.begin_build()
+    try:
+        async for page in db_inv.iter_goods("id,name,description", page_size=page_size):
+            search_index.add_page(page)
+    except BaseException:
+        search_index.abort_build()
+        raise
+    search_index.finish_build()
+    logger.info(f"Search index built with {len(search_index)} goods")
+
+
+async def _resolve_sharded_counts(goods: list[dict]):
+    """
+    Replaces the held-at-zero ``count`` of sharded rows with their shard total,
+    read in one query for the whole page.
+
+    :param goods: Rows including ``id``, ``count`` and ``shards``; updated in place.
+    :type goods: list[dict]
+    """
+
+    sharded = [good for good in goods if good.get("shards")]
+    if not sharded:
+        return
+    counts = await db_inv.get_sharded_counts([good["id"] for good in sharded])
+    for good in sharded:
+        good["count"] = counts[good["id"]]
+
+
+async def refresh_catalog_snapshot(page_size: int = 5000) -> CatalogSnapshot:
+    """
+    Reads the inventory table in pages into a new columnar catalog snapshot.
+
+    The new snapshot replaces the previous one only once it is complete, so
+    readers always see a consistent copy.
+
+    :param page_size: The number of rows read per database round trip.
+    :type page_size: int
+    :return: The new snapshot.
+    :rtype: CatalogSnapshot
+    """
+
+    global catalog_snapshot
+    builder = CatalogBuilder()
+    async for page in db_inv.iter_goods(
+        "id,name,category,price,description,count,shards", page_size=page_size
+    ):
+        await _resolve_sharded_counts(page)
+        builder.add_page(page)
+    catalog_snapshot = builder.build()
+    logger.info(
+        f"Catalog snapshot of {len(catalog_snapshot)} goods "
+        f"({catalog_snapshot.nbytes / 2**20:.1f} MiB)"
+    )
+    return catalog_snapshot
+
+
+async def refresh_catalog_periodically(interval: float = CATALOG_REFRESH_SECONDS):
+    """
+    Keeps the catalog snapshot at most ``interval`` seconds old; runs until cancelled.
+
+    A failed refresh is logged and the previous snapshot kept.
+
+    :param interval: Seconds between refreshes.
+    :type interval: float
+    """
+
+    while True:
+        try:
+            await refresh_catalog_snapshot()
+        except Exception as e:
+            logger.exception(e)
+        await asyncio.sleep(interval)
+
+
+def query_goods(query: CatalogQuery):
+    """
+    Filters and sorts the whole catalog in memory, e.g. for promotions.
+
+    :param query: The filters, ordering and limit.
+    :type query: CatalogQuery
+    :return: The matching goods and when the snapshot they come from was taken.
+    :rtype: dict
+    :raises RuntimeError: If the catalog snapshot is disabled or has not been
+        loaded yet.
+    """
+
+    snapshot = catalog_snapshot
+    if snapshot is None:
+        if CATALOG_REFRESH_SECONDS <= 0:
+            raise RuntimeError(
+                "Catalog queries are disabled; set INVENTORY_CATALOG_REFRESH_SECONDS"
+            )
+        raise RuntimeError("Catalog snapshot is still being loaded")
+    return {
+        "snapshot_at": snapshot.created_at,
+        "goods": query_catalog(snapshot, query),
+    }
+
+
+async def build_inventory_stats(page_size: int = 1000):
+    """
+    Recomputes the inventory statistics from scratch.
+
+    Runs at startup and on demand to reconcile the incrementally maintained
+    totals with the database. The previous totals are served until it completes.
+
+    :param page_size: The number of rows read per database round trip.
+    :type page_size: int
+    :return: The rebuilt statistics.
+    :rtype: dict
+    :raises RuntimeError: If a rebuild is already in progress.
+    """
+
+    inventory_stats.begin_build()
+    try:
+        async for page in db_inv.iter_goods(
+            "id,category,count,price,shards", page_size=page_size
+        ):
+            await _resolve_sharded_counts(page)
+            inventory_stats.add_page(page)
+    except BaseException:
+        inventory_stats.abort_build()
+        raise
+    inventory_stats.finish_build()
+    logger.info(f"Inventory statistics built over {len(inventory_stats)} goods")
+    return inventory_stats.snapshot()
+
+
+def get_inventory_stats():
+    """
+    Reads the per-category totals and the low-stock list.
+
+    :return: Overall and per-category ``goods``, ``units`` and ``stock_value``,
+        and the goods below the low-stock threshold.
+    :rtype: dict
+    :raises RuntimeError: If the statistics have not finished their initial build.
+    """
+
+    if not inventory_stats.ready:
+        raise RuntimeError("Inventory statistics are still being built")
+    return inventory_stats.snapshot()
+
+
+async def build_price_history(page_size: int = 5000):
+    """
+    Loads the price history table into memory; runs once at startup.
+
+    Prices recorded by requests while it loads are merged, not overwritten.
+
+    :param page_size: The number of rows read per database round trip.
+    :type page_size: int
+    """
+
+    entries = 0
+    async for page in db_inv.iter_price_history(page_size=page_size):
+        price_history.add_page(page)
+        entries += len(page)
+    price_history.ready = True
+    logger.info(
+        f"Price history loaded: {entries} changes for {len(price_history)} goods"
+    )
+
+
+def get_price_at(good_id: int, at: Optional[datetime] = None):
+    """
+    Resolves the price an inventory item had at a point in time.
+
+    :param good_id: The ID of the item.
+    :type good_id: int
+    :param at: The point in time; now if omitted. Naive values are taken as UTC.
+    :type at: Optional[datetime]
+    :return: The ``price``, when it took effect (``valid_from``) and the
+        resolved time (``at``).
+    :rtype: dict
+    :raises RuntimeError: If the price history has not finished loading.
+    :raises ValueError: If the item had no recorded price at that time.
+    """
+
+    if not price_history.ready:
+        raise RuntimeError("Price history is still being loaded")
+    at = at or datetime.now(timezone.utc)
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    found = price_history.price_at(good_id, at)
+    if found is None:
+        raise ValueError(f"No price recorded for good {good_id} at {at.isoformat()}")
+    price, valid_from = found
+    return {
+        "id": good_id,
+        "price": price,
+        "valid_from": datetime.fromtimestamp(valid_from, timezone.utc).isoformat(),
+        "at": at.isoformat(),
+    }
+
+
+def search_goods(query: str, limit: int = 20, prefix: bool = True):
+    """
+    Searches goods by name and description.
+
+    :param query: The search text.
+    :type query: str
+    :param limit: The maximum number of results.
+    :type limit: int
+    :param prefix: Whether query tokens also match longer words they prefix.
+    :type prefix: bool
+    :return: Matching goods as ``{"id", "name", "score"}``, best first.
+    :rtype: list[dict]
+    :raises RuntimeError: If the index has not finished its initial build.
+    """
+
+    if not search_index.ready:
+        raise RuntimeError("Search index is still being built")
+    return search_index.search(query, limit=limit, prefix=prefix)
+
+
+async def update_good(good_id: int, good_update: GoodUpdate):
     """
     Updates an existing inventory item in the database.
 
@@ -33,42 +483,199 @@ def update_good(good_id: int, good_update: GoodUpdate):
     :type good_id: int
     :param good_update: The fields to update for the item.
     :type good_update: GoodUpdate
-    :return: A success message confirming the item was updated.
+    :return: A success message and the updated item.
     :rtype: dict
     :raises ValueError: If the item with the given ID does not exist.
+    :raises RuntimeError: If the item's stock cannot be changed as asked: the
+        result would be negative, or the stock is sharded.
     :raises Exception: If the database operation fails.
     """
 
-    existing_good = db_inv.get_good_from_db(good_id)
-    if not existing_good:
-        raise ValueError("Good not found")
+    updated_rows = await db_inv.update_good_in_db(good_id, good_update)
+    if not updated_rows:
+        if good_update.count is None and good_update.count_delta is None:
+            raise ValueError("Good not found")
+        # The update was refused or matched nothing; only the row can tell which
+        good = await db_inv.get_stock_state_from_db(good_id)
+        if good is None:
+            raise ValueError("Good not found")
+        if good.get("shards"):
+            raise RuntimeError(
+                f"The stock of good {good_id} is sharded; "
+                "adjust it with a count_delta through the stock endpoints"
+            )
+        raise RuntimeError(f"The stock of good {good_id} would drop below zero")
+    if good_update.name is not None or good_update.description is not None:
+        search_index.add(updated_rows[0])
+    inventory_stats.add(updated_rows[0])
+    if good_update.price is not None:
+        _record_price(updated_rows[0])
+    return {"message": "Good updated successfully", "good": updated_rows[0]}
 
-    # updated values
-    updated_good = {
-        "name": good_update.name or existing_good["name"],
-        "category": (
-            good_update.category.value
-            if good_update.category
-            else existing_good["category"]
-        ),
-        "price": (
-            good_update.price
-            if good_update.price is not None
-            else existing_good["price"]
-        ),
-        "description": good_update.description or existing_good["description"],
-        "count": (
-            good_update.count
-            if good_update.count is not None
-            else existing_good["count"]
-        ),
-    }
 
-    db_inv.update_good_in_db(good_id, updated_good)
-    return {"message": "Good updated successfully"}
+async def adjust_stock_bulk(
+    adjustments: list[StockAdjustment], chunk_size: int = BULK_STOCK_CHUNK_SIZE
+):
+    """
+    Applies many absolute or relative stock changes in chunked single statements.
+
+    Each chunk of ``chunk_size`` items is one database statement and transaction,
+    so 100k adjustments cost 100 round trips instead of 200k. Items are reported
+    individually: one that cannot be applied does not hold back the rest of its
+    chunk, and a chunk the database rejects marks only its own items as
+    ``error``.
+
+    :param adjustments: The changes to apply; each ID may appear once.
+    :type adjustments: list[StockAdjustment]
+    :param chunk_size: The number of items applied per database statement.
+    :type chunk_size: int
+    :return: The numbers of applied and failed items, and
+        ``{"id", "status", "count"}`` for every item in request order.
+    :rtype: dict
+    :raises ValueError: If the request is too large or repeats an ID.
+    """
+
+    if len(adjustments) > BULK_STOCK_MAX_ITEMS:
+        raise ValueError(
+            f"At most {BULK_STOCK_MAX_ITEMS} adjustments are accepted per request"
+        )
+    id_counts = Counter(adjustment.id for adjustment in adjustments)
+    duplicates = sorted(good_id for good_id, seen in id_counts.items() if seen > 1)
+    if duplicates:
+        raise ValueError(f"Each good may be adjusted once; repeated: {duplicates[:20]}")
+
+    results = []
+    for start in range(0, len(adjustments), chunk_size):
+        chunk = [
+            adjustment.model_dump(exclude_none=True)
+            for adjustment in adjustments[start : start + chunk_size]
+        ]
+        try:
+            outcomes = await db_inv.bulk_adjust_stock_in_db(chunk)
+        except Exception as e:
+            logger.exception(e)
+            outcomes = [
+                {"id": item["id"], "status": "error", "count": None, "error": str(e)}
+                for item in chunk
+            ]
+        results.extend(outcomes)
+        for outcome in outcomes:
+            if outcome["status"] == "applied":
+                inventory_stats.set_count(outcome["id"], outcome["count"])
+
+    applied = sum(result["status"] == "applied" for result in results)
+    logger.info(f"Applied {applied}/{len(results)} bulk stock adjustments")
+    return {"applied": applied, "failed": len(results) - applied, "results": results}
+
 
+def _check_stock_batch(items: list[StockDeduction]) -> list[dict]:
+    """
+    Validates the items of a batch deduction or restock.
+
+    :param items: The items.
+    :type items: list[StockDeduction]
+    :return: The items as ``{"id", "quantity"}`` dictionaries.
+    :rtype: list[dict]
+    :raises ValueError: If there are no items, too many, or an ID repeats.
+    """
 
-def get_good(good_id: int):
+    if not items:
+        raise ValueError("No items provided")
+    if len(items) > STOCK_BATCH_MAX_ITEMS:
+        raise ValueError(
+            f"At most {STOCK_BATCH_MAX_ITEMS} items are accepted per request"
+        )
+    id_counts = Counter(item.id for item in items)
+    duplicates = sorted(good_id for good_id, seen in id_counts.items() if seen > 1)
+    if duplicates:
+        raise ValueError(f"Each good may appear once; repeated: {duplicates}")
+    return [item.model_dump() for item in items]
+
+
+async def deduct_stock_batch(items: list[StockDeduction]):
+    """
+    Deducts the items of a checkout together: all of them, or none.
+
+    :param items: The goods and quantities to deduct; each ID may appear once.
+    :type items: list[StockDeduction]
+    :return: ``{"id", "status", "count"}`` for every item, all ``applied``.
+    :rtype: dict
+    :raises ValueError: If the items are invalid, or any good is missing or
+        short of stock, in which case nothing was deducted.
+    """
+
+    outcomes = await db_inv.deduct_stock_batch_in_db(_check_stock_batch(items))
+    refused = [outcome for outcome in outcomes if outcome["status"] != "applied"]
+    if refused or not outcomes:
+        not_found = [o["id"] for o in refused if o["status"] == "not_found"]
+        short = [o["id"] for o in refused if o["status"] == "insufficient_stock"]
+        reasons = []
+        if not_found:
+            reasons.append(f"not found: {not_found}")
+        if short:
+            reasons.append(f"insufficient stock: {short}")
+        raise ValueError(f"No stock was deducted; {'; '.join(reasons) or 'refused'}")
+    for outcome in outcomes:
+        inventory_stats.set_count(outcome["id"], outcome["count"])
+    return {"results": outcomes}
+
+
+async def restock_batch(items: list[StockDeduction]):
+    """
+    Returns the units of a checkout that could not be completed to stock.
+
+    :param items: The goods and quantities to add back; each ID may appear once.
+    :type items: list[StockDeduction]
+    :return: ``{"id", "status", "count"}`` for every item.
+    :rtype: dict
+    :raises ValueError: If the items are invalid.
+    """
+
+    outcomes = await db_inv.restock_batch_in_db(_check_stock_batch(items))
+    for outcome in outcomes:
+        if outcome["status"] == "applied":
+            inventory_stats.set_count(outcome["id"], outcome["count"])
+    return {"results": outcomes}
+
+
+async def set_stock_sharding(good_id: int, shards: int):
+    """
+    Enables or disables sharded stock counters for an inventory item.
+
+    :param good_id: The ID of the item.
+    :type good_id: int
+    :param shards: The number of sub-counters, or 0 to fold them back together.
+    :type shards: int
+    :return: A success message and the updated item.
+    :rtype: dict
+    :raises ValueError: If the item does not exist or is already in the requested mode.
+    """
+
+    if shards:
+        updated_rows = await db_inv.enable_sharding_in_db(good_id, shards)
+    else:
+        updated_rows = await db_inv.disable_sharding_in_db(good_id)
+    if not updated_rows:
+        state = "sharded" if shards else "not sharded"
+        raise ValueError(f"Good not found or its stock is already {state}")
+    inventory_stats.add(updated_rows[0])
+    return {"message": "Stock sharding updated", "good": updated_rows[0]}
+
+
+def stream_stock_events(good_ids: Optional[frozenset[int]] = None):
+    """
+    Subscribes to stock and price changes as a Server-Sent Events stream.
+
+    :param good_ids: The goods to follow, or None for every good.
+    :type good_ids: Optional[frozenset[int]]
+    :return: An async iterator over SSE frames; it unsubscribes when closed.
+    :rtype: AsyncIterator[str]
+    """
+
+    return stock_events.stream(stock_events.subscribe(good_ids))
+
+
+async def get_good(good_id: int):
     """
     Retrieves an inventory item by its ID.
 
@@ -79,26 +686,87 @@ def get_good(good_id: int):
     :raises ValueError: If the item with the given ID does not exist.
     """
 
-    good = db_inv.get_good_from_db(good_id)
+    good = await db_inv.get_good_from_db(good_id)
     if not good:
         raise ValueError("Good not found")
     return good  # Supabase already returns a dictionary
 
 
-def deduct_good(good_id: int):
+async def get_availability(good_id: int) -> dict:
+    """
+    Retrieves just what a sale needs to know about an inventory item.
+
+    :param good_id: The ID of the item.
+    :type good_id: int
+    :return: The item's ``count``, ``price``, ``version`` and ``price_version``.
+    :rtype: dict
+    :raises ValueError: If the item does not exist.
+    """
+
+    goods = await db_inv.get_availability_from_db([good_id])
+    if not goods:
+        raise ValueError("Good not found")
+    good = goods[0]
+    return {
+        "count": good["count"],
+        "price": good["price"],
+        "version": good["version"],
+        "price_version": good["price_version"],
+    }
+
+
+async def get_availability_batch(good_ids: list[int]) -> dict:
+    """
+    Retrieves the stock, price and versions of several inventory items at once.
+
+    :param good_ids: The IDs of the items; duplicates are ignored.
+    :type good_ids: list[int]
+    :return: ``goods`` as ``{"id", "count", "price", "version", "price_version"}``
+        in request order, and the ``missing`` IDs that do not exist.
+    :rtype: dict
+    :raises ValueError: If more than ``AVAILABILITY_MAX_IDS`` IDs are given.
+    """
+
+    good_ids = list(dict.fromkeys(good_ids))
+    if len(good_ids) > AVAILABILITY_MAX_IDS:
+        raise ValueError(
+            f"At most {AVAILABILITY_MAX_IDS} goods can be checked per request"
+        )
+    found = {
+        good["id"]: good for good in await db_inv.get_availability_from_db(good_ids)
+    }
+    return {
+        "goods": [found[good_id] for good_id in good_ids if good_id in found],
+        "missing": [good_id for good_id in good_ids if good_id not in found],
+    }
+
+
+async def deduct_good(good_id: int, price_version: Optional[int] = None):
     """
     Deducts one unit from the stock of an inventory item.
 
+    With ``INVENTORY_DEDUCT_COMBINE_WINDOW_MS`` set, concurrent deductions of
+    the same item are merged into one decrement by ``deduction_combiner``.
+    Deductions conditional on a ``price_version`` are applied on their own.
+
     :param good_id: The ID of the item to deduct stock from.
     :type good_id: int
+    :param price_version: Only deduct while the price is at this version, i.e.
+        the price the caller charged is still current. Optional.
+    :type price_version: Optional[int]
     :return: A success message confirming the stock was deducted.
     :rtype: dict
     :raises ValueError: If the stock is already zero or the item does not exist.
+    :raises RuntimeError: If the price is no longer at ``price_version``.
     :raises Exception: If the database operation fails.
     """
 
     try:
-        db_inv.deduct_good_from_db(good_id)
+        if deduction_combiner is not None and price_version is None:
+            await deduction_combiner.deduct(good_id)
+        else:
+            await db_inv.deduct_good_from_db(good_id, price_version)
     except ValueError as e:
         raise ValueError(str(e))
+    inventory_stats.adjust_count(good_id, -1)
     return {"message": "Stock deducted successfully"}
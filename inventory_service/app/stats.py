@@ -0,0 +1,301 @@
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, NamedTuple, Optional
+
+# Goods whose stock is below this count are listed as low on stock
+LOW_STOCK_THRESHOLD: int = int(os.getenv("INVENTORY_LOW_STOCK_THRESHOLD", "10"))
+
+
+class GoodFigures(NamedTuple):
+    """
+    The fields of a good that contribute to the aggregates.
+
+    :param category: The good's category.
+    :type category: str
+    :param count: The units in stock; for sharded goods, the sum of the shards.
+    :type count: int
+    :param price_cents: The unit price in cents, so totals never drift.
+    :type price_cents: int
+    """
+
+    category: str
+    count: int
+    price_cents: int
+
+
+class CategoryTotals:
+    """
+    Running totals for one category.
+
+    :ivar goods: The number of goods.
+    :vartype goods: int
+    :ivar units: The units in stock across those goods.
+    :vartype units: int
+    :ivar value_cents: The stock value (units times price) in cents.
+    :vartype value_cents: int
+    """
+
+    __slots__ = ("goods", "units", "value_cents")
+
+    def __init__(self):
+        self.goods: int = 0
+        self.units: int = 0
+        self.value_cents: int = 0
+
+    def apply(self, figures: GoodFigures, sign: int):
+        self.goods += sign
+        self.units += sign * figures.count
+        self.value_cents += sign * figures.count * figures.price_cents
+
+    def as_dict(self) -> dict:
+        return {
+            "goods": self.goods,
+            "units": self.units,
+            "stock_value": self.value_cents / 100,
+        }
+
+
+def _figures(good: dict, previous: Optional[GoodFigures]) -> Optional[GoodFigures]:
+    """
+    Merges a (possibly partial) inventory row over a good's previous figures.
+
+    The stored ``count`` of a sharded good is held at 0, so it is ignored in
+    favour of the previously known total.
+
+    :param good: The row; any of ``category``, ``count``, ``price`` and ``shards``.
+    :type good: dict
+    :param previous: The figures before the change, if the good is known.
+    :type previous: Optional[GoodFigures]
+    :return: The new figures, or None if the row lacks the category or the stock
+        of a good not seen before.
+    :rtype: Optional[GoodFigures]
+    """
+
+    category = good.get("category", previous.category if previous else None)
+    if category is None:
+        return None
+    if "count" in good and not good.get("shards"):
+        count = good["count"]
+    elif previous is not None:
+        count = previous.count
+    else:
+        return None
+    if "price" in good:
+        price_cents = round(good["price"] * 100)
+    else:
+        price_cents = previous.price_cents if previous else 0
+    return GoodFigures(category, count, price_cents)
+
+
+class InventoryStats:
+    """
+    Per-category totals and the low-stock set, kept current incrementally.
+
+    Every add, update and deduction adjusts the totals by the difference it makes,
+    so reading them costs the same however large the inventory is. A rebuild
+    (``begin_build``/``add_page``/``finish_build``) recomputes everything from
+    the database to reconcile drift while the previous figures stay readable;
+    changes made during the rebuild are carried over. All public methods are
+    thread-safe.
+
+    :param low_stock_threshold: Goods with fewer units than this are low on stock.
+    :type low_stock_threshold: int
+
+    :ivar ready: Whether the totals have been built from the database.
+    :vartype ready: bool
+    """
+
+    def __init__(self, low_stock_threshold: int = LOW_STOCK_THRESHOLD):
+        """
+        Initializes empty totals.
+
+        :param low_stock_threshold: Goods with fewer units than this are low on stock.
+        :type low_stock_threshold: int
+        """
+
+        self.low_stock_threshold = low_stock_threshold
+        self.ready: bool = False
+        self.built_at: Optional[str] = None
+        self._goods: dict[int, GoodFigures] = {}
+        self._categories: dict[str, CategoryTotals] = {}
+        self._low_stock: set[int] = set()
+        self._building: bool = False
+        self._staged: dict[int, GoodFigures] = {}
+        self._touched_during_build: set[int] = set()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._goods)
+
+    @property
+    def building(self) -> bool:
+        """
+        Whether a rebuild is in progress.
+        """
+
+        return self._building
+
+    def _set(self, good_id: int, figures: GoodFigures):
+        previous = self._goods.get(good_id)
+        if previous is not None:
+            self._categories[previous.category].apply(previous, -1)
+            self._low_stock.discard(good_id)
+        self._goods[good_id] = figures
+        totals = self._categories.get(figures.category)
+        if totals is None:
+            totals = self._categories[figures.category] = CategoryTotals()
+        totals.apply(figures, 1)
+        if figures.count < self.low_stock_threshold:
+            self._low_stock.add(good_id)
+        if self._building:
+            self._touched_during_build.add(good_id)
+
+    def add(self, good: dict):
+        """
+        Records a new or changed good from its inventory row.
+
+        Partial rows are merged over what is already known about the good.
+
+        :param good: The row; must contain ``id``.
+        :type good: dict
+        """
+
+        with self._lock:
+            previous = self._goods.get(good["id"])
+            figures = _figures(good, previous)
+            if figures is not None:
+                self._set(good["id"], figures)
+
+    def set_count(self, good_id: int, count: int):
+        """
+        Records a good's new stock count.
+
+        :param good_id: The ID of the good.
+        :type good_id: int
+        :param count: The units now in stock.
+        :type count: int
+        """
+
+        with self._lock:
+            previous = self._goods.get(good_id)
+            if previous is not None:
+                self._set(good_id, previous._replace(count=count))
+
+    def adjust_count(self, good_id: int, delta: int):
+        """
+        Records a relative change to a good's stock.
+
+        :param good_id: The ID of the good.
+        :type good_id: int
+        :param delta: The change in units, e.g. ``-1`` for a sale.
+        :type delta: int
+        """
+
+        with self._lock:
+            previous = self._goods.get(good_id)
+            if previous is not None:
+                self._set(good_id, previous._replace(count=previous.count + delta))
+
+    def begin_build(self):
+        """
+        Starts recomputing the totals from scratch; current totals remain readable.
+
+        :raises RuntimeError: If a rebuild is already in progress.
+        """
+
+        with self._lock:
+            if self._building:
+                raise RuntimeError("Inventory statistics are already being rebuilt")
+            self._building = True
+            self._staged = {}
+            self._touched_during_build.clear()
+
+    def add_page(self, goods: Iterable[dict]):
+        """
+        Stages a page of rows read during a rebuild.
+
+        :param goods: Rows containing ``id``, ``category``, ``count`` and ``price``,
+            with ``count`` already resolved to the shard total for sharded goods.
+        :type goods: Iterable[dict]
+        """
+
+        staged = self._staged
+        for good in goods:
+            staged[good["id"]] = GoodFigures(
+                good["category"], good["count"], round(good["price"] * 100)
+            )
+
+    def abort_build(self):
+        """
+        Abandons a rebuild, keeping the current totals.
+        """
+
+        with self._lock:
+            self._building = False
+            self._staged = {}
+            self._touched_during_build.clear()
+
+    def finish_build(self):
+        """
+        Replaces the totals with the rebuilt ones and marks them ready.
+
+        Goods changed while the rebuild was running keep their live figures,
+        which are newer than the rows the rebuild read.
+        """
+
+        with self._lock:
+            goods = self._staged
+            for good_id in self._touched_during_build:
+                goods[good_id] = self._goods[good_id]
+
+            categories: dict[str, CategoryTotals] = {}
+            low_stock = set()
+            for good_id, figures in goods.items():
+                totals = categories.get(figures.category)
+                if totals is None:
+                    totals = categories[figures.category] = CategoryTotals()
+                totals.apply(figures, 1)
+                if figures.count < self.low_stock_threshold:
+                    low_stock.add(good_id)
+
+            self._goods = goods
+            self._categories = categories
+            self._low_stock = low_stock
+            self._staged = {}
+            self._touched_during_build.clear()
+            self._building = False
+            self.built_at = datetime.now(timezone.utc).isoformat()
+            self.ready = True
+
+    def snapshot(self) -> dict:
+        """
+        Reads the current totals.
+
+        :return: Overall and per-category ``goods``, ``units`` and ``stock_value``,
+            and the goods below the low-stock threshold as ``{"id", "count"}``.
+        :rtype: dict
+        """
+
+        with self._lock:
+            populated = [
+                (category, totals)
+                for category, totals in sorted(self._categories.items())
+                if totals.goods
+            ]
+            categories = {category: totals.as_dict() for category, totals in populated}
+            value_cents = sum(totals.value_cents for _, totals in populated)
+            low_stock = [
+                {"id": good_id, "count": self._goods[good_id].count}
+                for good_id in sorted(self._low_stock)
+            ]
+            built_at = self.built_at
+        return {
+            "goods": sum(totals["goods"] for totals in categories.values()),
+            "units": sum(totals["units"] for totals in categories.values()),
+            "stock_value": value_cents / 100,
+            "categories": categories,
+            "low_stock_threshold": self.low_stock_threshold,
+            "low_stock": low_stock,
+            "built_at": built_at,
+        }
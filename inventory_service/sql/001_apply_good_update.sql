@@ -0,0 +1,29 @@
+-- Partial, single-statement update of an inventory row.
+--
+-- Only the keys present in p_fields are written; every other column keeps its
+-- stored value. p_count_delta is added to the *current* count inside the same
+-- UPDATE, and the row is left untouched if that would take the count below
+-- zero, so a concurrent deduction can never be clobbered by a stale read.
+--
+-- Called through PostgREST as: client.rpc("apply_good_update", {...}).
+-- Zero returned rows means the good does not exist or the delta was refused.
+create or replace function apply_good_update(
+    p_good_id bigint,
+    p_fields jsonb default '{}'::jsonb,
+    p_count_delta integer default null
+)
+returns setof inventory
+language sql
+as $$
+    update inventory
+    set name        = coalesce(p_fields ->> 'name', name),
+        category    = coalesce(p_fields ->> 'category', category),
+        price       = coalesce((p_fields ->> 'price')::double precision, price),
+        description = coalesce(p_fields ->> 'description', description),
+        count       = coalesce((p_fields ->> 'count')::integer, count)
+                      + coalesce(p_count_delta, 0)
+    where id = p_good_id
+      and coalesce((p_fields ->> 'count')::integer, count)
+          + coalesce(p_count_delta, 0) >= 0
+    returning *;
+$$;
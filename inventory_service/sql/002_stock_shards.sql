@@ -0,0 +1,129 @@
+-- Opt-in sharded stock counters for very hot goods.
+--
+-- While a good is sharded (inventory.shards > 0) its stock lives in
+-- inventory_shards, split across `shards` sub-counters, and inventory.count is
+-- held at 0. Concurrent deductions pick a random shard, so they contend on N
+-- rows instead of one; the available stock is the sum of the shards.
+
+alter table inventory add column if not exists shards integer not null default 0;
+
+create table if not exists inventory_shards (
+    good_id bigint not null references inventory (id) on delete cascade,
+    shard integer not null,
+    count integer not null check (count >= 0),
+    primary key (good_id, shard)
+);
+
+-- Splits a good's current stock evenly across p_shards sub-counters.
+create or replace function enable_stock_sharding(p_good_id bigint, p_shards integer)
+returns setof inventory
+language plpgsql
+as $$
+declare
+    v_count integer;
+begin
+    if p_shards < 1 then
+        raise exception 'p_shards must be at least 1';
+    end if;
+
+    select count into v_count
+    from inventory
+    where id = p_good_id and shards = 0
+    for update;
+    if not found then
+        return;
+    end if;
+
+    insert into inventory_shards (good_id, shard, count)
+    select p_good_id, s, v_count / p_shards + (case when s < v_count % p_shards then 1 else 0 end)
+    from generate_series(0, p_shards - 1) as s;
+
+    return query
+    update inventory set shards = p_shards, count = 0
+    where id = p_good_id
+    returning *;
+end;
+$$;
+
+-- Folds the shards of a good back into inventory.count.
+create or replace function disable_stock_sharding(p_good_id bigint)
+returns setof inventory
+language plpgsql
+as $$
+declare
+    v_count integer;
+begin
+    perform 1 from inventory where id = p_good_id and shards > 0 for update;
+    if not found then
+        return;
+    end if;
+
+    with removed as (
+        delete from inventory_shards where good_id = p_good_id returning count
+    )
+    select coalesce(sum(count), 0) into v_count from removed;
+
+    return query
+    update inventory set shards = 0, count = v_count
+    where id = p_good_id
+    returning *;
+end;
+$$;
+
+-- Takes p_amount units from shard p_shard, falling back to the fullest shard
+-- that can cover it. Returns the updated shard, or nothing if no single shard
+-- holds enough stock.
+create or replace function decrement_stock_shard(
+    p_good_id bigint,
+    p_shard integer,
+    p_amount integer default 1
+)
+returns setof inventory_shards
+language plpgsql
+as $$
+begin
+    return query
+    update inventory_shards set count = count - p_amount
+    where good_id = p_good_id and shard = p_shard and count >= p_amount
+    returning *;
+    if found then
+        return;
+    end if;
+
+    return query
+    update inventory_shards set count = count - p_amount
+    where (good_id, shard) = (
+        select good_id, shard from inventory_shards
+        where good_id = p_good_id and count >= p_amount
+        order by count desc
+        limit 1
+        for update
+    )
+    and count >= p_amount
+    returning *;
+end;
+$$;
+
+-- Count edits cannot target a sharded good: its stock is not in
+-- inventory.count. Disable sharding first, then edit the count.
+create or replace function apply_good_update(
+    p_good_id bigint,
+    p_fields jsonb default '{}'::jsonb,
+    p_count_delta integer default null
+)
+returns setof inventory
+language sql
+as $$
+    update inventory
+    set name        = coalesce(p_fields ->> 'name', name),
+        category    = coalesce(p_fields ->> 'category', category),
+        price       = coalesce((p_fields ->> 'price')::double precision, price),
+        description = coalesce(p_fields ->> 'description', description),
+        count       = coalesce((p_fields ->> 'count')::integer, count)
+                      + coalesce(p_count_delta, 0)
+    where id = p_good_id
+      and coalesce((p_fields ->> 'count')::integer, count)
+          + coalesce(p_count_delta, 0) >= 0
+      and (shards = 0 or (p_fields ->> 'count' is null and p_count_delta is null))
+    returning *;
+$$;
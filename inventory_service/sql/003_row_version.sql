@@ -0,0 +1,27 @@
+-- Row versioning for HTTP conditional requests.
+--
+-- Every UPDATE that changes a row bumps inventory.version and stamps
+-- updated_at. The API derives ETag and Last-Modified from these columns.
+-- Sharded goods keep their stock in inventory_shards, which does not touch
+-- the parent row, so the API also folds the summed count into their ETag.
+
+alter table inventory add column if not exists version bigint not null default 1;
+alter table inventory add column if not exists updated_at timestamptz not null default now();
+
+create or replace function bump_inventory_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if row(new.*) is distinct from row(old.*) then
+        new.version := old.version + 1;
+        new.updated_at := now();
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists inventory_bump_version on inventory;
+create trigger inventory_bump_version
+before update on inventory
+for each row execute function bump_inventory_version();
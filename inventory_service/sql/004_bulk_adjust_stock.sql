@@ -0,0 +1,43 @@
+-- Applies many stock adjustments in one statement.
+--
+-- p_adjustments is a JSON array of {"id", "delta"} or {"id", "absolute"}
+-- objects with distinct ids. Every eligible row is updated by a single UPDATE
+-- joined against the array, inside the transaction PostgREST opens for the
+-- call. Like apply_good_update, a delta is applied to the *current* count and
+-- refused if it would take the count below zero; sharded goods are skipped.
+--
+-- Returns one row per requested id with its outcome: 'applied', 'not_found',
+-- 'sharded' or 'insufficient_stock', and the resulting (or unchanged) count.
+--
+-- Called through PostgREST as: client.rpc("bulk_adjust_stock", {...}).
+create or replace function bulk_adjust_stock(p_adjustments jsonb)
+returns table (id bigint, status text, count integer)
+language sql
+as $$
+    with requested as (
+        select r.id, r.delta, r.absolute
+        from jsonb_to_recordset(p_adjustments)
+             as r(id bigint, delta integer, absolute integer)
+    ),
+    updated as (
+        update inventory i
+        set count = coalesce(r.absolute, i.count + r.delta)
+        from requested r
+        where i.id = r.id
+          and i.shards = 0
+          and coalesce(r.absolute, i.count + r.delta) >= 0
+        returning i.id, i.count
+    )
+    -- The outer read of inventory sees the rows as they were before the update
+    select r.id,
+           case
+               when u.id is not null then 'applied'
+               when i.id is null then 'not_found'
+               when i.shards > 0 then 'sharded'
+               else 'insufficient_stock'
+           end,
+           coalesce(u.count, i.count)
+    from requested r
+    left join updated u on u.id = r.id
+    left join inventory i on i.id = r.id;
+$$;
@@ -0,0 +1,48 @@
+-- Append-only price history for point-in-time price lookups.
+--
+-- A row is appended whenever a good is inserted or its price actually
+-- changes, stamped with the inventory row's updated_at (set by the
+-- inventory_bump_version trigger from 003_row_version.sql), so the API can
+-- record the same instant in its in-memory index without a second query.
+-- Each entry is valid from valid_from until the good's next entry.
+
+create table if not exists inventory_price_history (
+    id bigint generated always as identity primary key,
+    good_id bigint not null references inventory (id) on delete cascade,
+    price double precision not null,
+    valid_from timestamptz not null
+);
+
+create index if not exists inventory_price_history_good_time
+    on inventory_price_history (good_id, valid_from);
+
+create or replace function record_inventory_price()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into inventory_price_history (good_id, price, valid_from)
+    values (new.id, new.price, new.updated_at);
+    return null;
+end;
+$$;
+
+drop trigger if exists inventory_price_inserted on inventory;
+create trigger inventory_price_inserted
+after insert on inventory
+for each row execute function record_inventory_price();
+
+drop trigger if exists inventory_price_changed on inventory;
+create trigger inventory_price_changed
+after update of price on inventory
+for each row
+when (new.price is distinct from old.price)
+execute function record_inventory_price();
+
+-- Goods that predate this migration start their history at their last update
+insert into inventory_price_history (good_id, price, valid_from)
+select i.id, i.price, i.updated_at
+from inventory i
+where not exists (
+    select 1 from inventory_price_history h where h.good_id = i.id
+);
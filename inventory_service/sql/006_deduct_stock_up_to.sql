@@ -0,0 +1,50 @@
+-- Deducts up to p_amount units of a good in one statement, for combined deductions.
+--
+-- The row is locked, and as many of the requested units as are in stock are
+-- taken: min(count, p_amount), possibly zero. This lets the service merge a
+-- burst of single-unit deductions into one decrement and tell each waiter
+-- whether its unit was among those granted.
+--
+-- Returns one row with the units deducted, the resulting count, the row's
+-- shards and version. Sharded goods are left untouched (deducted = 0, shards
+-- > 0) so the caller can fall back to per-shard deductions. Zero returned
+-- rows means the good does not exist.
+--
+-- Called through PostgREST as: client.rpc("deduct_stock_up_to", {...}).
+create or replace function deduct_stock_up_to(p_good_id bigint, p_amount integer)
+returns table (deducted integer, count integer, shards integer, version bigint)
+language plpgsql
+as $$
+declare
+    v_row inventory%rowtype;
+    v_take integer;
+begin
+    if p_amount < 1 then
+        raise exception 'p_amount must be at least 1';
+    end if;
+
+    select * into v_row
+    from inventory
+    where inventory.id = p_good_id
+    for update;
+    if not found then
+        return;
+    end if;
+
+    if v_row.shards > 0 then
+        return query select 0, v_row.count, v_row.shards, v_row.version;
+        return;
+    end if;
+
+    v_take := least(greatest(v_row.count, 0), p_amount);
+    if v_take > 0 then
+        update inventory
+        set count = inventory.count - v_take
+        where inventory.id = p_good_id
+        returning inventory.count, inventory.version
+        into v_row.count, v_row.version;
+    end if;
+
+    return query select v_take, v_row.count, 0, v_row.version;
+end;
+$$;
@@ -0,0 +1,155 @@
+-- All-or-nothing stock movements for multi-item checkouts.
+--
+-- p_items is a JSON array of {"id", "quantity"} objects with distinct ids and
+-- positive quantities. deduct_stock_batch locks every row (in id order, so
+-- concurrent checkouts cannot deadlock), checks that each good exists and has
+-- `quantity` units available, and only then deducts them all. If any item
+-- fails, nothing is changed. Sharded goods are checked against the sum of their
+-- shards and drained fullest shard first.
+--
+-- Returns one row per item: 'applied' with the new count, or, when the batch
+-- was refused, 'not_found', 'insufficient_stock' or 'not_applied' (the item was
+-- fine but another one failed) with the unchanged count.
+--
+-- restock_batch adds the quantities back, e.g. to undo a checkout that could
+-- not be completed; returns 'applied' or 'not_found' per item.
+--
+-- Called through PostgREST as: client.rpc("deduct_stock_batch", {...}).
+create or replace function deduct_stock_batch(p_items jsonb)
+returns table (id bigint, status text, count integer)
+language plpgsql
+as $$
+declare
+    v_item record;
+    v_shard record;
+    v_available integer;
+    v_shards integer;
+    v_remaining integer;
+    v_take integer;
+    v_failed boolean := false;
+    v_checked jsonb := '[]'::jsonb;
+begin
+    for v_item in
+        select r.id, r.quantity
+        from jsonb_to_recordset(p_items) as r(id bigint, quantity integer)
+        order by r.id
+    loop
+        select inventory.count, inventory.shards into v_available, v_shards
+        from inventory
+        where inventory.id = v_item.id
+        for update;
+
+        if not found then
+            v_failed := true;
+            v_checked := v_checked || jsonb_build_object(
+                'id', v_item.id, 'status', 'not_found', 'count', null
+            );
+            continue;
+        end if;
+
+        if v_shards > 0 then
+            perform 1 from inventory_shards s where s.good_id = v_item.id for update;
+            select coalesce(sum(s.count), 0) into v_available
+            from inventory_shards s
+            where s.good_id = v_item.id;
+        end if;
+
+        if v_available < v_item.quantity then
+            v_failed := true;
+            v_checked := v_checked || jsonb_build_object(
+                'id', v_item.id, 'status', 'insufficient_stock', 'count', v_available
+            );
+        else
+            v_checked := v_checked || jsonb_build_object(
+                'id', v_item.id, 'status', 'ok', 'count', v_available,
+                'quantity', v_item.quantity, 'shards', v_shards
+            );
+        end if;
+    end loop;
+
+    if v_failed then
+        return query
+        select (c ->> 'id')::bigint,
+               case when c ->> 'status' = 'ok' then 'not_applied' else c ->> 'status' end,
+               (c ->> 'count')::integer
+        from jsonb_array_elements(v_checked) as c;
+        return;
+    end if;
+
+    for v_item in
+        select (c ->> 'id')::bigint as id,
+               (c ->> 'quantity')::integer as quantity,
+               (c ->> 'count')::integer as available,
+               (c ->> 'shards')::integer as shards
+        from jsonb_array_elements(v_checked) as c
+    loop
+        if v_item.shards > 0 then
+            v_remaining := v_item.quantity;
+            for v_shard in
+                select s.shard, s.count
+                from inventory_shards s
+                where s.good_id = v_item.id and s.count > 0
+                order by s.count desc
+            loop
+                exit when v_remaining = 0;
+                v_take := least(v_shard.count, v_remaining);
+                update inventory_shards s
+                set count = s.count - v_take
+                where s.good_id = v_item.id and s.shard = v_shard.shard;
+                v_remaining := v_remaining - v_take;
+            end loop;
+        else
+            update inventory
+            set count = inventory.count - v_item.quantity
+            where inventory.id = v_item.id;
+        end if;
+
+        id := v_item.id;
+        status := 'applied';
+        count := v_item.available - v_item.quantity;
+        return next;
+    end loop;
+end;
+$$;
+
+create or replace function restock_batch(p_items jsonb)
+returns table (id bigint, status text, count integer)
+language plpgsql
+as $$
+declare
+    v_item record;
+    v_shards integer;
+begin
+    for v_item in
+        select r.id, r.quantity
+        from jsonb_to_recordset(p_items) as r(id bigint, quantity integer)
+        order by r.id
+    loop
+        select inventory.shards into v_shards
+        from inventory
+        where inventory.id = v_item.id
+        for update;
+
+        id := v_item.id;
+        if not found then
+            status := 'not_found';
+            count := null;
+        elsif v_shards > 0 then
+            update inventory_shards s
+            set count = s.count + v_item.quantity
+            where s.good_id = v_item.id and s.shard = 0;
+            select coalesce(sum(s.count), 0) into count
+            from inventory_shards s
+            where s.good_id = v_item.id;
+            status := 'applied';
+        else
+            update inventory
+            set count = inventory.count + v_item.quantity
+            where inventory.id = v_item.id
+            returning inventory.count into count;
+            status := 'applied';
+        end if;
+        return next;
+    end loop;
+end;
+$$;
@@ -0,0 +1,27 @@
+-- Price versioning for clients that cache prices.
+--
+-- inventory.version (003_row_version.sql) moves on every update, stock
+-- deductions included, so it cannot tell a client whether a price it cached
+-- is still current. price_version only moves when the price actually changes.
+-- The availability endpoints return it, and a deduction made with
+-- ?price_version=N is refused with 409 once the price has moved on, so a
+-- purchase is never charged at a stale price.
+
+alter table inventory add column if not exists price_version bigint not null default 1;
+
+create or replace function bump_inventory_price_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.price_version := old.price_version + 1;
+    return new;
+end;
+$$;
+
+drop trigger if exists inventory_bump_price_version on inventory;
+create trigger inventory_bump_price_version
+before update of price on inventory
+for each row
+when (new.price is distinct from old.price)
+execute function bump_inventory_price_version();
@@ -1,14 +1,36 @@
 import asyncio
 import cProfile
+from functools import wraps
 from pstats import Stats
 
 from app.models import Good, GoodUpdate
-from app.service import add_good, deduct_good, get_good, update_good
+from app.service import (
+    add_good,
+    close_database,
+    connect_database,
+    deduct_good,
+    get_good,
+    update_good,
+)
 from line_profiler import LineProfiler
 from memory_profiler import profile
 
 
+def with_database(func):
+    # Each asyncio.run() starts a fresh loop, so the client is opened per run
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        await connect_database()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            await close_database()
+
+    return wrapper
+
+
 # Profiling add_good
+@with_database
 async def add_good_profile():
     test_good = Good(
         name="Test Item",
@@ -17,23 +39,26 @@ async def add_good_profile():
         description="A test item for profiling.",
         count=10,
     )
-    return add_good(test_good)
+    return await add_good(test_good)
 
 
 # Profiling update_good
+@with_database
 async def update_good_profile():
     test_good_update = GoodUpdate(name="Updated Item", count=20)
-    return update_good(1, test_good_update)  # Assuming ID 1 exists
+    return await update_good(1, test_good_update)  # Assuming ID 1 exists
 
 
 # Profiling get_good
+@with_database
 async def get_good_profile():
-    return get_good(1)  # Assuming ID 1 exists
+    return await get_good(1)  # Assuming ID 1 exists
 
 
 # Profiling deduct_good
+@with_database
 async def deduct_good_profile():
-    return deduct_good(1)  # Assuming ID 1 exists
+    return await deduct_good(1)  # Assuming ID 1 exists
 
 
 # Function for cProfile
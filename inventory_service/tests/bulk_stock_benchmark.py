@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import random
+import time
+
+from app.models import GoodUpdate, StockAdjustment
+from app.service import adjust_stock_bulk, close_database, connect_database, db_inv
+
+
+async def create_benchmark_goods(count: int, chunk_size: int = 1000) -> list[int]:
+    goods = [
+        {
+            "name": f"Bulk Benchmark Item {index}",
+            "category": "electronics",
+            "price": 1.0,
+            "description": "Temporary item created by tests/bulk_stock_benchmark.py",
+            "count": 100,
+        }
+        for index in range(count)
+    ]
+    good_ids = []
+    for start in range(0, count, chunk_size):
+        rows = await db_inv.upsert_goods_to_db(goods[start : start + chunk_size])
+        good_ids.extend(row["id"] for row in rows)
+    return good_ids
+
+
+async def delete_goods(good_ids: list[int], chunk_size: int = 1000):
+    for start in range(0, len(good_ids), chunk_size):
+        await db_inv.client.table("inventory").delete().in_(
+            "id", good_ids[start : start + chunk_size]
+        ).execute()
+
+
+async def per_item_updates(good_ids: list[int], concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def update(good_id: int):
+        async with semaphore:
+            await db_inv.update_good_in_db(
+                good_id, GoodUpdate(count=random.randint(0, 200))
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(update(good_id) for good_id in good_ids))
+    return time.perf_counter() - started
+
+
+async def bulk_updates(good_ids: list[int], chunk_size: int) -> tuple[float, dict]:
+    adjustments = [
+        (
+            StockAdjustment(id=good_id, absolute=random.randint(0, 200))
+            if index % 2
+            else StockAdjustment(id=good_id, delta=random.randint(-50, 50))
+        )
+        for index, good_id in enumerate(good_ids)
+    ]
+    started = time.perf_counter()
+    report = await adjust_stock_bulk(adjustments, chunk_size=chunk_size)
+    return time.perf_counter() - started, report
+
+
+async def benchmark(adjustments: int, baseline: int, concurrency: int, chunk: int):
+    await connect_database()
+    good_ids = []
+    try:
+        good_ids = await create_benchmark_goods(adjustments)
+
+        sample = good_ids[:baseline]
+        elapsed = await per_item_updates(sample, concurrency)
+        rate = len(sample) / elapsed
+        print(
+            f"per-item PUT : {rate:10.1f} adjustments/s "
+            f"({len(sample)} in {elapsed:.2f}s, ~{adjustments / rate:.0f}s "
+            f"projected for {adjustments})"
+        )
+
+        elapsed, report = await bulk_updates(good_ids, chunk)
+        print(
+            f"bulk ({chunk:5d}) : {adjustments / elapsed:10.1f} adjustments/s "
+            f"({report['applied']}/{adjustments} applied in {elapsed:.2f}s)"
+        )
+    finally:
+        await delete_goods(good_ids)
+        await close_database()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-item vs bulk stock adjustment throughput"
+    )
+    parser.add_argument("--adjustments", type=int, default=100_000)
+    parser.add_argument("--baseline", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(
+        benchmark(args.adjustments, args.baseline, args.concurrency, args.chunk_size)
+    )
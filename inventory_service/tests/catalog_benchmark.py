@@ -0,0 +1,89 @@
+import argparse
+import random
+import string
+import tempfile
+import time
+import tracemalloc
+
+from app.catalog import CATEGORIES, CatalogBuilder, CatalogSnapshot
+from app.models import Good
+
+WORDS = ["".join(random.choices(string.ascii_lowercase, k=7)) for _ in range(5000)]
+
+
+def synthetic_pages(goods: int, page_size: int):
+    for start in range(0, goods, page_size):
+        yield [
+            {
+                "id": good_id,
+                "name": " ".join(random.choices(WORDS, k=3)),
+                "category": random.choice(CATEGORIES),
+                "price": round(random.uniform(1, 1000), 2),
+                "description": " ".join(random.choices(WORDS, k=6)),
+                "count": random.randint(0, 100),
+            }
+            for good_id in range(start + 1, min(start + page_size, goods) + 1)
+        ]
+
+
+def models_bytes_per_good(sample: int) -> float:
+    rows = [row for page in synthetic_pages(sample, 1000) for row in page]
+    tracemalloc.start()
+    models = [Good(**row) for row in rows]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del models
+    return size / sample
+
+
+def benchmark(goods: int, page_size: int):
+    pages = list(synthetic_pages(goods, page_size))
+
+    started = time.perf_counter()
+    builder = CatalogBuilder()
+    for page in pages:
+        builder.add_page(page)
+    snapshot = builder.build()
+    build_seconds = time.perf_counter() - started
+    del pages
+
+    per_model = models_bytes_per_good(min(goods, 50_000))
+    print(f"goods              : {len(snapshot):,}")
+    print(f"build from pages   : {build_seconds:.2f}s")
+    print(
+        f"columnar snapshot  : {snapshot.nbytes / 2**20:8.1f} MiB "
+        f"({snapshot.nbytes / len(snapshot):.0f} B/good)"
+    )
+    print(
+        f"list[Good] (est.)  : {per_model * goods / 2**20:8.1f} MiB "
+        f"({per_model:.0f} B/good)"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        snapshot.save(directory)
+        print(f"save               : {time.perf_counter() - started:.2f}s")
+
+        for mmap in (False, True):
+            started = time.perf_counter()
+            loaded = CatalogSnapshot.load(directory, mmap=mmap)
+            elapsed = time.perf_counter() - started
+            print(f"load (mmap={mmap!s:5}) : {elapsed * 1000:8.1f} ms")
+
+        started = time.perf_counter()
+        for good_id in random.sample(range(1, goods + 1), 10_000):
+            loaded.get(good_id)
+        elapsed = time.perf_counter() - started
+        print(f"get by id (mmap)   : {elapsed / 10_000 * 1e6:8.1f} us")
+        del loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Memory and load time of the columnar catalog snapshot"
+    )
+    parser.add_argument("--goods", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    benchmark(args.goods, args.page_size)
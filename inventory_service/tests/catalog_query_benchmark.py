@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import os
+import time
+
+from app.catalog import CatalogBuilder
+from app.catalog_query import query_catalog
+from app.models import CatalogQuery
+from dotenv import load_dotenv
+from tests.catalog_benchmark import synthetic_pages
+
+PROMOTION = CatalogQuery(
+    category="electronics", max_price=200, min_count=6, sort_by="price", limit=50
+)
+
+
+def python_loop(rows: list[dict], query: CatalogQuery) -> list[dict]:
+    matches = [
+        row
+        for row in rows
+        if row["category"] == query.category
+        and row["price"] <= query.max_price
+        and row["count"] >= query.min_count
+    ]
+    matches.sort(key=lambda row: (row["price"], row["id"]))
+    return matches[: query.limit]
+
+
+def timed(label: str, runs: int, func) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        func()
+    per_query = (time.perf_counter() - started) / runs
+    print(f"{label:<22}: {per_query * 1000:9.3f} ms/query ({1 / per_query:9.1f}/s)")
+    return per_query
+
+
+async def postgrest_query(runs: int):
+    from app.database import AsyncInventoryTable
+
+    load_dotenv()
+    db = AsyncInventoryTable(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    await db.connect()
+    try:
+        started = time.perf_counter()
+        for _ in range(runs):
+            await (
+                db.client.table("inventory")
+                .select("id,name,category,price,description,count")
+                .eq("category", PROMOTION.category.value)
+                .lte("price", PROMOTION.max_price)
+                .gte("count", PROMOTION.min_count)
+                .order("price")
+                .order("id")
+                .limit(PROMOTION.limit)
+                .execute()
+            )
+        per_query = (time.perf_counter() - started) / runs
+        print(
+            f"{'PostgREST':<22}: {per_query * 1000:9.3f} ms/query "
+            f"({1 / per_query:9.1f}/s)"
+        )
+    finally:
+        await db.close()
+
+
+def benchmark(goods: int, runs: int, postgrest: bool):
+    rows = [row for page in synthetic_pages(goods, 5000) for row in page]
+    builder = CatalogBuilder()
+    builder.add_page(rows)
+    snapshot = builder.build()
+
+    expected = [row["id"] for row in python_loop(rows, PROMOTION)]
+    assert [row["id"] for row in query_catalog(snapshot, PROMOTION)] == expected
+
+    print(f"goods: {goods:,}; query: {PROMOTION.model_dump(exclude_none=True)}")
+    timed("NumPy snapshot", runs, lambda: query_catalog(snapshot, PROMOTION))
+    timed(
+        "Python loop over dicts",
+        max(1, runs // 50),
+        lambda: python_loop(rows, PROMOTION),
+    )
+    if postgrest:
+        asyncio.run(postgrest_query(runs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Vectorized catalog queries vs Python loops and PostgREST"
+    )
+    parser.add_argument("--goods", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument(
+        "--postgrest",
+        action="store_true",
+        help="also time the equivalent PostgREST query (needs SUPABASE_URL/KEY)",
+    )
+    args = parser.parse_args()
+
+    benchmark(args.goods, args.runs, args.postgrest)
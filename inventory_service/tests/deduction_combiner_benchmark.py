@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from app.deduction_combiner import DeductionCombiner
+from dotenv import load_dotenv
+
+
+class SimulatedRow:
+    """
+    One inventory row behind a network round trip and a row lock.
+
+    ``lock_ms`` models how long each decrement holds the row lock (update plus
+    commit), which is what serializes a flash sale on one good.
+    """
+
+    def __init__(self, stock: int, latency_ms: float, lock_ms: float):
+        self.stock = stock
+        self.latency = latency_ms / 1000
+        self.lock_hold = lock_ms / 1000
+        self.lock = asyncio.Lock()
+        self.statements = 0
+
+    async def deduct_up_to(self, good_id: int, amount: int) -> int:
+        await asyncio.sleep(self.latency / 2)
+        async with self.lock:
+            await asyncio.sleep(self.lock_hold)
+            taken = min(self.stock, amount)
+            self.stock -= taken
+            self.statements += 1
+        await asyncio.sleep(self.latency / 2)
+        return taken
+
+
+async def burst(deduct, buyers: int, rate: float) -> tuple[float, list[float], int]:
+    latencies = []
+    sold = 0
+
+    async def buy(arrival: float):
+        nonlocal sold
+        await asyncio.sleep(arrival)
+        started = time.perf_counter()
+        try:
+            await deduct(1)
+            sold += 1
+        except ValueError:
+            pass
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(buy(index / rate) for index in range(buyers)))
+    return time.perf_counter() - started, latencies, sold
+
+
+def report(label: str, elapsed: float, latencies: list[float], sold: int, calls: int):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(
+        f"{label:<14}: {len(latencies) / elapsed:9.0f} deductions/s  "
+        f"p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  "
+        f"{sold} sold in {calls} statements"
+    )
+
+
+async def simulated(
+    buyers: int, rate: float, stock: int, latency: float, lock: float, windows
+):
+    print(
+        f"simulated: {buyers} buyers arriving at {rate:g}/s, {stock} in stock, "
+        f"{latency} ms round trip, {lock} ms row lock per statement"
+    )
+    row = SimulatedRow(stock, latency, lock)
+    elapsed, latencies, sold = await burst(
+        lambda good_id: single_unit(row, good_id), buyers, rate
+    )
+    report("uncombined", elapsed, latencies, sold, row.statements)
+    for window in windows:
+        row = SimulatedRow(stock, latency, lock)
+        combiner = DeductionCombiner(row.deduct_up_to, window / 1000)
+        elapsed, latencies, sold = await burst(combiner.deduct, buyers, rate)
+        report(f"window {window:g} ms", elapsed, latencies, sold, row.statements)
+
+
+async def single_unit(row: SimulatedRow, good_id: int):
+    if not await row.deduct_up_to(good_id, 1):
+        raise ValueError("Product count less than 0")
+
+
+async def live(buyers: int, rate: float, stock: int, windows):
+    from app.database import AsyncInventoryTable
+
+    load_dotenv()
+    db = AsyncInventoryTable(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    await db.connect()
+    good = {
+        "name": "Deduction Combiner Benchmark Item",
+        "category": "electronics",
+        "price": 1.0,
+        "description": "Temporary item created by tests/deduction_combiner_benchmark.py",
+        "count": stock,
+    }
+    (row,) = await db.upsert_goods_to_db([good])
+    try:
+        print(f"live: {buyers} buyers arriving at {rate:g}/s on good {row['id']}")
+        await db.update_good_in_db(row["id"], _count(stock))
+        elapsed, latencies, sold = await burst(
+            lambda good_id: _single_live(db, row["id"]), buyers, rate
+        )
+        report("uncombined", elapsed, latencies, sold, buyers)
+        for window in windows:
+            await db.update_good_in_db(row["id"], _count(stock))
+            calls = 0
+
+            async def deduct_up_to(good_id: int, amount: int) -> int:
+                nonlocal calls
+                calls += 1
+                return await db.deduct_stock_up_to_in_db(good_id, amount)
+
+            combiner = DeductionCombiner(deduct_up_to, window / 1000)
+            elapsed, latencies, sold = await burst(
+                lambda good_id: combiner.deduct(row["id"]), buyers, rate
+            )
+            report(f"window {window:g} ms", elapsed, latencies, sold, calls)
+    finally:
+        await db.client.table("inventory").delete().eq("id", row["id"]).execute()
+        await db.close()
+
+
+def _count(count: int):
+    from app.models import GoodUpdate
+
+    return GoodUpdate(count=count)
+
+
+async def _single_live(db, good_id: int):
+    await db.deduct_good_from_db(good_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Throughput and latency of combined vs single-unit deductions"
+    )
+    parser.add_argument("--buyers", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=5000, help="arrivals/s")
+    parser.add_argument("--stock", type=int, default=1500)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--lock-ms", type=float, default=1.0)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0.5, 1, 2, 5, 10])
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="run against the database instead (needs SUPABASE_URL/KEY)",
+    )
+    args = parser.parse_args()
+
+    if args.live:
+        asyncio.run(live(args.buyers, args.rate, args.stock, args.windows))
+    else:
+        asyncio.run(
+            simulated(
+                args.buyers,
+                args.rate,
+                args.stock,
+                args.latency_ms,
+                args.lock_ms,
+                args.windows,
+            )
+        )
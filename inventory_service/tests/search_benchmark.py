@@ -0,0 +1,78 @@
+import argparse
+import random
+import statistics
+import time
+
+import psutil
+from app.search import SearchIndex
+
+WORDS = [
+    "laptop", "phone", "cable", "charger", "wireless", "gaming", "stand", "case",
+    "shirt", "jacket", "scarf", "wool", "cotton", "denim", "winter", "summer",
+    "ring", "necklace", "watch", "leather", "silver", "gold", "bracelet", "strap",
+    "coffee", "tea", "chocolate", "organic", "snack", "honey", "pasta", "sauce",
+    "fast", "light", "durable", "premium", "classic", "compact", "portable", "soft",
+]  # fmt: skip
+QUERIES = ["lap40x", "lap40x cha43x", "wool scarf", "gold", "lap1", "org", "lap"]
+
+
+def generate_goods(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    # A long tail of model/brand words next to a few very common ones, so both
+    # short and very long posting lists are exercised
+    rare_words = [f"{WORDS[i % len(WORDS)][:3]}{i}x" for i in range(5000)]
+    for good_id in range(1, n + 1):
+        name = " ".join(rng.choices(WORDS, k=1) + rng.choices(rare_words, k=2))
+        description = " ".join(rng.choices(WORDS, k=2) + rng.choices(rare_words, k=6))
+        yield {"id": good_id, "name": name, "description": description}
+
+
+def benchmark_build(n: int, page_size: int = 1000) -> SearchIndex:
+    index = SearchIndex()
+    rss_before = psutil.Process().memory_info().rss
+    started = time.perf_counter()
+    index.begin_build()
+    page = []
+    for good in generate_goods(n):
+        page.append(good)
+        if len(page) == page_size:
+            index.add_page(page)
+            page = []
+    index.add_page(page)
+    index.finish_build()
+    elapsed = time.perf_counter() - started
+    rss_after = psutil.Process().memory_info().rss
+    print(f"Built index of {len(index):,} goods in {elapsed:.2f}s")
+    print(f"Resident memory growth: {(rss_after - rss_before) / 2**20:.1f} MiB")
+    return index
+
+
+def benchmark_queries(index: SearchIndex, repeat: int = 20):
+    for query in QUERIES:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results = index.search(query, limit=20)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(
+            f"{query!r:>20}: median {statistics.median(timings):8.2f} ms, "
+            f"p99 {p99:8.2f} ms, {len(results)} results"
+        )
+
+    started = time.perf_counter()
+    for good in generate_goods(1000, seed=7):
+        index.add({**good, "id": good["id"] + len(index)})
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"Incremental add: {elapsed / 1000:.3f} ms per good")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search index benchmark")
+    parser.add_argument("--goods", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    search_index = benchmark_build(args.goods)
+    benchmark_queries(search_index, args.repeat)
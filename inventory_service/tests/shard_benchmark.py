@@ -0,0 +1,72 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.database import InventoryTable
+from app.models import Good, GoodUpdate
+from dotenv import load_dotenv
+
+
+def create_benchmark_good(db: InventoryTable, stock: int) -> int:
+    good = Good(
+        name="Shard Benchmark Item",
+        category="electronics",
+        price=1.0,
+        description="Temporary item created by tests/shard_benchmark.py",
+        count=stock,
+    )
+    return db.add_good_to_db(good)[0]["id"]
+
+
+def run_deductions(db: InventoryTable, good_id: int, workers: int, deductions: int):
+    def deduct(_):
+        try:
+            db.deduct_good_from_db(good_id)
+            return True
+        except Exception:
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        succeeded = sum(pool.map(deduct, range(deductions)))
+    elapsed = time.perf_counter() - started
+    return succeeded, elapsed
+
+
+def benchmark(db: InventoryTable, workers: int, deductions: int, shards: int):
+    good_id = create_benchmark_good(db, stock=deductions)
+    try:
+        succeeded, elapsed = run_deductions(db, good_id, workers, deductions)
+        remaining = db.get_good_from_db(good_id)["count"]
+        print(
+            f"single row   : {succeeded / elapsed:8.1f} deductions/s "
+            f"({succeeded}/{deductions} ok, {remaining} left)"
+        )
+
+        db.update_good_in_db(good_id, GoodUpdate(count=deductions))
+        db.enable_sharding_in_db(good_id, shards)
+        succeeded, elapsed = run_deductions(db, good_id, workers, deductions)
+        remaining = db.get_good_from_db(good_id)["count"]
+        print(
+            f"{shards:2d} shards    : {succeeded / elapsed:8.1f} deductions/s "
+            f"({succeeded}/{deductions} ok, {remaining} left)"
+        )
+    finally:
+        db.client.table("inventory").delete().eq("id", good_id).execute()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Single-row vs sharded stock decrement throughput"
+    )
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--deductions", type=int, default=2000)
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    load_dotenv()
+    inventory = InventoryTable(
+        url=os.getenv("SUPABASE_URL"), key=os.getenv("SUPABASE_KEY")
+    )
+    benchmark(inventory, args.workers, args.deductions, args.shards)
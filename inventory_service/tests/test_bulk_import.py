@@ -0,0 +1,68 @@
+import pytest
+from app.bulk_import import detect_format, iter_lines, iter_records
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_across_chunk_boundaries():
+    # "é" is split across two chunks and a line ends mid-chunk
+    body = "first\r\nsecond é\nthird".encode()
+    split = body.index("é".encode()) + 1
+    lines = await collect(iter_lines(stream(body[:split], body[split:])))
+    assert lines == ["first", "second é", "third"]
+
+
+@pytest.mark.asyncio
+async def test_iter_records_csv():
+    body = (
+        b"name,category,price,description,count\n"
+        b'Laptop,electronics,999.99,"Fast, light",10\n'
+        b'Scarf,clothes,19.5,"Warm\nand soft",3\n'
+        b"Broken,food\n"
+    )
+    records = await collect(iter_records(stream(body), "csv"))
+    assert records[0] == (
+        1,
+        {
+            "name": "Laptop",
+            "category": "electronics",
+            "price": "999.99",
+            "description": "Fast, light",
+            "count": "10",
+        },
+    )
+    assert records[1][0] == 2
+    assert records[1][1]["description"] == "Warm\nand soft"
+    assert records[2][0] == 3
+    assert isinstance(records[2][1], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_iter_records_csv_drops_empty_cells():
+    body = b"id,name\n,Laptop\n"
+    records = await collect(iter_records(stream(body), "csv"))
+    assert records == [(1, {"name": "Laptop"})]
+
+
+@pytest.mark.asyncio
+async def test_iter_records_ndjson():
+    body = b'{"name": "Laptop"}\n\nnot json\n[1, 2]\n'
+    records = await collect(iter_records(stream(body), "ndjson"))
+    assert records[0] == (1, {"name": "Laptop"})
+    assert isinstance(records[1][1], ValueError)
+    assert str(records[2][1]) == "Expected a JSON object"
+
+
+def test_detect_format():
+    assert detect_format("text/csv; charset=utf-8") == "csv"
+    assert detect_format("application/x-ndjson") == "ndjson"
+    assert detect_format("application/json") is None
+    assert detect_format(None) is None
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from app.catalog import CatalogBuilder, CatalogSnapshot
+
+
+@pytest.fixture
+def goods():
+    return [
+        {
+            "id": 3,
+            "name": "Wool Scarf",
+            "category": "clothes",
+            "price": 19.5,
+            "description": "Warm",
+            "count": 4,
+        },
+        {
+            "id": 1,
+            "name": "Café Crème",
+            "category": "food",
+            "price": 3.0,
+            "description": None,
+            "count": 120,
+        },
+        {
+            "id": 2,
+            "name": "Gaming Laptop",
+            "category": "electronics",
+            "price": 1499.99,
+            "description": "Fast, RGB",
+            "count": 7,
+        },
+    ]
+
+
+def test_builder_packs_columns(goods):
+    builder = CatalogBuilder()
+    builder.add_page(goods[:1])
+    builder.add_page(goods[1:])
+    snapshot = builder.build()
+
+    assert len(snapshot) == 3
+    # Rows that arrive out of order are sorted by ID
+    assert snapshot.ids.tolist() == [1, 2, 3]
+    assert snapshot.counts.dtype == np.int32
+    assert snapshot.name_offsets.dtype == np.uint32
+    assert snapshot.get(1) == {**goods[1], "description": ""}
+    assert snapshot.get(3) == goods[0]
+    assert snapshot.get(4) is None
+    assert snapshot.nbytes < 200
+
+
+def test_builder_rejects_unknown_category(goods):
+    with pytest.raises(KeyError):
+        CatalogBuilder().add_page([{**goods[0], "category": "toys"}])
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load(goods, tmp_path, mmap):
+    builder = CatalogBuilder()
+    builder.add_page(sorted(goods, key=lambda good: good["id"]))
+    snapshot = builder.build()
+    snapshot.save(tmp_path / "catalog")
+
+    loaded = CatalogSnapshot.load(tmp_path / "catalog", mmap=mmap)
+    assert isinstance(loaded.prices, np.memmap) == mmap
+    assert loaded.created_at == snapshot.created_at
+    assert [loaded.row(position) for position in range(3)] == [
+        snapshot.row(position) for position in range(3)
+    ]
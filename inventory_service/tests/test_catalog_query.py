@@ -0,0 +1,78 @@
+import pytest
+from app.catalog import CatalogBuilder
+from app.catalog_query import query_catalog
+from app.models import CatalogQuery
+
+
+@pytest.fixture
+def snapshot():
+    goods = [
+        (1, "electronics", 150.0, 9),
+        (2, "electronics", 99.0, 3),
+        (3, "electronics", 199.0, 6),
+        (4, "electronics", 250.0, 50),
+        (5, "food", 5.0, 80),
+        (6, "electronics", 150.0, 20),
+    ]
+    builder = CatalogBuilder()
+    builder.add_page(
+        {
+            "id": good_id,
+            "name": f"Good {good_id}",
+            "category": category,
+            "price": price,
+            "description": "",
+            "count": count,
+        }
+        for good_id, category, price, count in goods
+    )
+    return builder.build()
+
+
+def ids(goods: list[dict]) -> list[int]:
+    return [good["id"] for good in goods]
+
+
+def test_promotion_query(snapshot):
+    query = CatalogQuery(
+        category="electronics", max_price=200, min_count=6, sort_by="price"
+    )
+    # Equal prices keep ID order
+    assert ids(query_catalog(snapshot, query)) == [1, 6, 3]
+
+
+def test_limit_and_descending(snapshot):
+    query = CatalogQuery(sort_by="count", descending=True, limit=2)
+    assert ids(query_catalog(snapshot, query)) == [5, 4]
+    query = CatalogQuery(sort_by="price", limit=2)
+    assert ids(query_catalog(snapshot, query)) == [5, 2]
+
+
+def test_no_matches(snapshot):
+    assert query_catalog(snapshot, CatalogQuery(min_price=1000)) == []
+
+
+def test_descending_bounds_on_sort_column(snapshot):
+    query = CatalogQuery(
+        category="electronics", min_price=100, max_price=200, descending=True
+    )
+    # Equal prices still keep ID order
+    assert ids(query_catalog(snapshot, query)) == [3, 1, 6]
+
+
+def test_scan_spans_blocks(monkeypatch):
+    monkeypatch.setattr("app.catalog_query.FIRST_BLOCK_SIZE", 2)
+    builder = CatalogBuilder()
+    builder.add_page(
+        {
+            "id": good_id,
+            "name": "",
+            "category": "food",
+            "price": float(good_id),
+            "description": "",
+            "count": good_id % 3,
+        }
+        for good_id in range(1, 41)
+    )
+    query = CatalogQuery(min_count=2, limit=5)
+    assert ids(query_catalog(builder.build(), query)) == [2, 5, 8, 11, 14]
@@ -1,7 +1,7 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from app.database import InventoryTable
+from app.database import AsyncInventoryTable, InventoryTable
 from app.models import Good, GoodUpdate
 from supabase import Client
 
@@ -66,21 +66,128 @@ def test_add_good_to_db_failure(inventory_table, good_data):
     assert str(exc_info.value) == "Failed to add good: Insert failed"
 
 
-def test_update_good_in_db_failure(inventory_table, updated_good_data):
+def test_upsert_goods_to_db_splits_by_id(inventory_table, good_data):
+    inv_table, mock_client = inventory_table
+    new_good = good_data.model_dump()
+    existing_good = {**good_data.model_dump(), "id": 7}
+    table = mock_client.table.return_value
+    table.upsert.return_value.execute.return_value = MagicMock(data=[existing_good])
+    table.insert.return_value.execute.return_value = MagicMock(
+        data=[{**new_good, "id": 8}]
+    )
+
+    result = inv_table.upsert_goods_to_db([new_good, existing_good])
+    assert result == [existing_good, {**new_good, "id": 8}]
+    table.upsert.assert_called_once_with([existing_good], on_conflict="id")
+    table.insert.assert_called_once_with([new_good])
+
+
+def test_iter_goods_keyset_pages(inventory_table):
+    inv_table, mock_client = inventory_table
+    query = mock_client.table.return_value.select.return_value.gt.return_value
+    query.order.return_value.limit.return_value.execute.side_effect = [
+        MagicMock(data=[{"id": 1}, {"id": 2}]),
+        MagicMock(data=[{"id": 5}]),
+    ]
+
+    pages = list(inv_table.iter_goods("id,name", page_size=2))
+    assert pages == [[{"id": 1}, {"id": 2}], [{"id": 5}]]
+    gt_calls = mock_client.table.return_value.select.return_value.gt.call_args_list
+    assert [call.args for call in gt_calls] == [("id", 0), ("id", 2)]
+
+
+def test_update_good_in_db_sends_only_set_fields(inventory_table, updated_good_data):
     inv_table, mock_client = inventory_table
     good_id = 1
-    # Mock the update response with an error
     mock_response = MagicMock()
-    mock_response.data = None
-    mock_response.error = MagicMock()
-    mock_response.error.message = "Update failed"
-    mock_client.table.return_value.update.return_value.eq.return_value.execute.return_value = (
-        mock_response
+    mock_response.data = [{"id": good_id, "price": 89.99, "count": 15}]
+    update_query = mock_client.table.return_value.update.return_value
+    update_query.eq.return_value.eq.return_value.execute.return_value = mock_response
+
+    result = inv_table.update_good_in_db(good_id, updated_good_data)
+    assert result == [{"id": good_id, "price": 89.99, "count": 15}]
+    mock_client.table.return_value.update.assert_called_once_with(
+        {"price": 89.99, "count": 15}
     )
+    update_query.eq.assert_called_with("id", good_id)
+    # Absolute counts must not overwrite sharded stock
+    update_query.eq.return_value.eq.assert_called_with("shards", 0)
+    mock_client.table.return_value.select.assert_not_called()
 
-    with pytest.raises(Exception) as exc_info:
-        inv_table.update_good_in_db(good_id, updated_good_data)
-    assert str(exc_info.value) == "Failed to update good: Update failed"
+
+def test_update_good_in_db_count_delta_uses_rpc(inventory_table):
+    inv_table, mock_client = inventory_table
+    good_id = 1
+    mock_response = MagicMock()
+    mock_response.data = [{"id": good_id, "count": 7}]
+    mock_client.rpc.return_value.execute.return_value = mock_response
+
+    result = inv_table.update_good_in_db(
+        good_id, GoodUpdate(name="Renamed", count_delta=-3)
+    )
+    assert result == [{"id": good_id, "count": 7}]
+    mock_client.rpc.assert_called_once_with(
+        "apply_good_update",
+        {"p_good_id": good_id, "p_fields": {"name": "Renamed"}, "p_count_delta": -3},
+    )
+    mock_client.table.return_value.update.assert_not_called()
+
+
+def test_update_good_in_db_publishes_stock_changes(inventory_table):
+    inv_table, mock_client = inventory_table
+    inv_table.events = MagicMock()
+    mock_response = MagicMock()
+    mock_response.data = [{"id": 1, "name": "Renamed", "count": 7, "version": 3}]
+    mock_client.rpc.return_value.execute.return_value = mock_response
+
+    inv_table.update_good_in_db(1, GoodUpdate(count_delta=-3))
+    inv_table.events.publish.assert_called_once_with(
+        {"id": 1, "count": 7, "version": 3}
+    )
+
+    inv_table.events.reset_mock()
+    update_query = mock_client.table.return_value.update.return_value
+    update_query.eq.return_value.execute.return_value = mock_response
+    # Renames do not concern stock subscribers
+    inv_table.update_good_in_db(1, GoodUpdate(name="Renamed"))
+    inv_table.events.publish.assert_not_called()
+
+
+def test_update_good_in_db_leaves_sharded_count_out_of_events(inventory_table):
+    inv_table, mock_client = inventory_table
+    inv_table.events = MagicMock()
+    mock_response = MagicMock()
+    mock_response.data = [
+        {"id": 1, "count": 0, "shards": 4, "price": 9.5, "version": 3}
+    ]
+    update_query = mock_client.table.return_value.update.return_value
+    update_query.eq.return_value.execute.return_value = mock_response
+
+    inv_table.update_good_in_db(1, GoodUpdate(price=9.5))
+    # The stored count of a sharded good is not its stock
+    inv_table.events.publish.assert_called_once_with(
+        {"id": 1, "price": 9.5, "version": 3}
+    )
+
+
+def test_update_good_in_db_no_rows(inventory_table, updated_good_data):
+    inv_table, mock_client = inventory_table
+    good_id = 1
+    # Zero affected rows means the good does not exist
+    mock_response = MagicMock()
+    mock_response.data = []
+    update_query = mock_client.table.return_value.update.return_value
+    update_query.eq.return_value.eq.return_value.execute.return_value = mock_response
+
+    assert inv_table.update_good_in_db(good_id, updated_good_data) == []
+
+
+def test_update_good_in_db_no_fields(inventory_table):
+    inv_table, mock_client = inventory_table
+
+    with pytest.raises(ValueError, match="No fields provided to update."):
+        inv_table.update_good_in_db(1, GoodUpdate())
+    mock_client.table.return_value.update.assert_not_called()
 
 
 def test_get_good_from_db_success(inventory_table, good_data):
@@ -196,3 +303,358 @@ def test_deduct_good_from_db_failure(inventory_table, good_data):
     with pytest.raises(Exception) as exc_info:
         inv_table.deduct_good_from_db(good_id)
     assert str(exc_info.value) == "Failed to deduct inventory: Update failed"
+
+
+def test_get_good_from_db_sharded_sums_shards(inventory_table, good_data):
+    inv_table, mock_client = inventory_table
+    good_id = 1
+    good_row = {**good_data.model_dump(), "count": 0, "shards": 2}
+    mock_client.table.return_value.select.return_value.eq.return_value.execute.side_effect = [
+        MagicMock(data=[good_row]),
+        MagicMock(data=[{"count": 4}, {"count": 5}]),
+    ]
+
+    result = inv_table.get_good_from_db(good_id)
+    assert result["count"] == 9
+    mock_client.table.assert_called_with("inventory_shards")
+
+
+def test_enable_sharding_in_db(inventory_table):
+    inv_table, mock_client = inventory_table
+    mock_client.rpc.return_value.execute.return_value = MagicMock(
+        data=[{"id": 1, "shards": 4, "count": 0}]
+    )
+
+    result = inv_table.enable_sharding_in_db(1, 4)
+    assert result == [{"id": 1, "shards": 4, "count": 0}]
+    mock_client.rpc.assert_called_once_with(
+        "enable_stock_sharding", {"p_good_id": 1, "p_shards": 4}
+    )
+
+
+def test_deduct_good_from_db_sharded(inventory_table, good_data):
+    inv_table, mock_client = inventory_table
+    good_id = 1
+    mock_client.table.return_value.select.return_value.eq.return_value.execute.return_value = MagicMock(
+        data=[{**good_data.model_dump(), "shards": 4}]
+    )
+    mock_client.rpc.return_value.execute.return_value = MagicMock(
+        data=[{"good_id": good_id, "shard": 2, "count": 3}]
+    )
+
+    with patch("app.database.random.randrange", return_value=2):
+        result = inv_table.deduct_good_from_db(good_id)
+    assert result == [{"good_id": good_id, "shard": 2, "count": 3}]
+    mock_client.rpc.assert_called_once_with(
+        "decrement_stock_shard", {"p_good_id": good_id, "p_shard": 2, "p_amount": 1}
+    )
+    mock_client.table.return_value.update.assert_not_called()
+
+
+def test_deduct_sharded_good_from_db_out_of_stock(inventory_table):
+    inv_table, mock_client = inventory_table
+    mock_client.rpc.return_value.execute.return_value = MagicMock(data=[])
+
+    with pytest.raises(ValueError, match="Product count less than 0"):
+        inv_table.deduct_sharded_good_from_db(1, shards=4)
+
+
+def test_check_connection_probe_is_cached(inventory_table):
+    inv_table, mock_client = inventory_table
+    execute = (
+        mock_client.table.return_value.select.return_value.limit.return_value.execute
+    )
+
+    first = inv_table.check_connection(max_age=60)
+    second = inv_table.check_connection(max_age=60)
+    assert first is second
+    assert first["connected"] is True
+    assert "latency_ms" in first and "checked_at" in first
+    execute.assert_called_once()
+    mock_client.table.return_value.select.assert_called_with("id")
+
+
+def test_check_connection_failure_and_expiry(inventory_table):
+    inv_table, mock_client = inventory_table
+    execute = (
+        mock_client.table.return_value.select.return_value.limit.return_value.execute
+    )
+    execute.side_effect = [Exception("connection refused"), MagicMock()]
+
+    failed = inv_table.check_connection(max_age=0)
+    assert failed["connected"] is False
+    assert failed["error"] == "connection refused"
+    assert inv_table.check_connection(max_age=0)["connected"] is True
+    assert execute.call_count == 2
+
+
+@pytest.fixture
+def async_inventory_table():
+    mock_client = MagicMock()
+    mock_client.postgrest.aclose = AsyncMock()
+    with patch("app.database.acreate_client", AsyncMock(return_value=mock_client)):
+        yield AsyncInventoryTable(
+            url="http://test-url.com", key="test-key"
+        ), mock_client
+
+
+@pytest.mark.asyncio
+async def test_async_table_connects_lazily(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+
+    with pytest.raises(RuntimeError, match="not connected"):
+        inv_table.client
+    await inv_table.connect()
+    assert inv_table.client is mock_client
+    await inv_table.close()
+    mock_client.postgrest.aclose.assert_awaited_once()
+    with pytest.raises(RuntimeError, match="not connected"):
+        inv_table.client
+
+
+@pytest.mark.asyncio
+async def test_async_update_good_in_db_count_delta_uses_rpc(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    inv_table.events = MagicMock()
+    mock_client.rpc.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{"id": 1, "count": 7}])
+    )
+
+    result = await inv_table.update_good_in_db(1, GoodUpdate(count_delta=-3))
+    assert result == [{"id": 1, "count": 7}]
+    mock_client.rpc.assert_called_once_with(
+        "apply_good_update", {"p_good_id": 1, "p_fields": {}, "p_count_delta": -3}
+    )
+    inv_table.events.publish.assert_called_once_with({"id": 1, "count": 7})
+
+
+@pytest.mark.asyncio
+async def test_async_deduct_good_from_db_is_one_locked_decrement(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    mock_client.rpc.return_value.execute = AsyncMock(
+        return_value=MagicMock(
+            data=[{"deducted": 1, "count": 4, "shards": 0, "version": 3}]
+        )
+    )
+
+    await inv_table.deduct_good_from_db(1)
+
+    mock_client.rpc.assert_called_once_with(
+        "deduct_stock_up_to", {"p_good_id": 1, "p_amount": 1}
+    )
+    mock_client.table.return_value.select.assert_not_called()
+    mock_client.table.return_value.update.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_deduct_good_from_db_insufficient_stock(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    mock_client.rpc.return_value.execute = AsyncMock(
+        return_value=MagicMock(
+            data=[{"deducted": 0, "count": 0, "shards": 0, "version": 3}]
+        )
+    )
+
+    with pytest.raises(ValueError, match="Product count less than 0"):
+        await inv_table.deduct_good_from_db(1)
+    mock_client.table.return_value.update.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_deduct_good_from_db_checks_price_version(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    select_query = mock_client.table.return_value.select.return_value
+    select_query.eq.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{"id": 1, "count": 3, "price_version": 2}])
+    )
+
+    with pytest.raises(RuntimeError, match="The price of good 1 has changed"):
+        await inv_table.deduct_good_from_db(1, price_version=1)
+    mock_client.table.return_value.update.assert_not_called()
+
+
+def conditional_update(mock_client, *results):
+    update_query = mock_client.table.return_value.update.return_value
+    guarded = update_query.eq.return_value.eq.return_value.eq.return_value
+    guarded.execute = AsyncMock(side_effect=[MagicMock(data=data) for data in results])
+    return update_query
+
+
+def reads(mock_client, *rows):
+    select_query = mock_client.table.return_value.select.return_value
+    select_query.eq.return_value.execute = AsyncMock(
+        side_effect=[MagicMock(data=data) for data in rows]
+    )
+
+
+@pytest.mark.asyncio
+async def test_async_deduct_good_from_db_guards_count_and_price(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    reads(
+        mock_client,
+        [{"id": 1, "count": 3, "price_version": 2}],
+        [{"id": 1, "count": 2, "price_version": 2}],
+    )
+    update_query = conditional_update(mock_client, [], [{"id": 1, "count": 1}])
+
+    # A concurrent buyer took a unit between the first read and its update
+    await inv_table.deduct_good_from_db(1, price_version=2)
+
+    guarded = update_query.eq.return_value.eq.return_value
+    guarded.eq.assert_called_with("price_version", 2)
+    assert update_query.eq.return_value.eq.call_args_list[-1].args == ("count", 2)
+
+
+@pytest.mark.asyncio
+async def test_async_deduct_good_from_db_tells_conflicts_apart(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+
+    # The price moved between the read and the update
+    reads(
+        mock_client,
+        [{"id": 1, "count": 3, "price_version": 2}],
+        [{"id": 1, "count": 3, "price_version": 3}],
+    )
+    conditional_update(mock_client, [])
+    with pytest.raises(RuntimeError, match="The price of good 1 has changed"):
+        await inv_table.deduct_good_from_db(1, price_version=2)
+
+    # The last unit went to a concurrent buyer
+    reads(
+        mock_client,
+        [{"id": 1, "count": 1, "price_version": 2}],
+        [{"id": 1, "count": 0, "price_version": 2}],
+    )
+    conditional_update(mock_client, [])
+    with pytest.raises(ValueError, match="Product count less than 0"):
+        await inv_table.deduct_good_from_db(1, price_version=2)
+
+    # The good was deleted
+    reads(mock_client, [{"id": 1, "count": 1, "price_version": 2}], [])
+    conditional_update(mock_client, [])
+    with pytest.raises(Exception, match="good 1 not found"):
+        await inv_table.deduct_good_from_db(1, price_version=2)
+
+
+@pytest.mark.asyncio
+async def test_async_get_availability_from_db_sums_shards(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    rows = [
+        {"id": 1, "count": 5, "price": 2.0, "version": 3, "price_version": 2},
+        {"id": 2, "count": 0, "price": 4.0, "version": 1, "shards": 2},
+    ]
+    select_query = mock_client.table.return_value.select.return_value
+    select_query.in_.return_value.execute = AsyncMock(return_value=MagicMock(data=rows))
+    select_query.eq.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{"count": 6}, {"count": 1}])
+    )
+
+    goods = await inv_table.get_availability_from_db([1, 2])
+
+    select_query.in_.assert_called_once_with("id", [1, 2])
+    assert goods == [
+        {"id": 1, "count": 5, "price": 2.0, "version": 3, "price_version": 2},
+        {"id": 2, "count": 7, "price": 4.0, "version": 1, "price_version": None},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_async_get_sharded_counts_is_one_query(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    shards = [
+        {"good_id": 2, "count": 6},
+        {"good_id": 5, "count": 1},
+        {"good_id": 2, "count": 1},
+    ]
+    select_query = mock_client.table.return_value.select.return_value
+    select_query.in_.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=shards)
+    )
+
+    assert await inv_table.get_sharded_counts([2, 5, 9]) == {2: 7, 5: 1, 9: 0}
+    select_query.in_.assert_called_once_with("good_id", [2, 5, 9])
+    assert await inv_table.get_sharded_counts([]) == {}
+
+
+@pytest.mark.asyncio
+async def test_async_deduct_stock_up_to_in_db(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    inv_table.events = MagicMock()
+    mock_client.rpc.return_value.execute = AsyncMock(
+        return_value=MagicMock(
+            data=[{"deducted": 2, "count": 0, "shards": 0, "version": 9}]
+        )
+    )
+
+    assert await inv_table.deduct_stock_up_to_in_db(1, 5) == 2
+
+    mock_client.rpc.assert_called_once_with(
+        "deduct_stock_up_to", {"p_good_id": 1, "p_amount": 5}
+    )
+    inv_table.events.publish.assert_called_once_with(
+        {"id": 1, "count": 0, "version": 9}
+    )
+
+
+@pytest.mark.asyncio
+async def test_async_deduct_stock_up_to_in_db_sharded(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    mock_client.rpc.return_value.execute = AsyncMock(
+        return_value=MagicMock(
+            data=[{"deducted": 0, "count": 0, "shards": 4, "version": 2}]
+        )
+    )
+    inv_table.deduct_sharded_good_from_db = AsyncMock(
+        side_effect=[[{"count": 1}], ValueError("Product count less than 0"), []]
+    )
+
+    assert await inv_table.deduct_stock_up_to_in_db(1, 3) == 2
+    inv_table.deduct_sharded_good_from_db.assert_awaited_with(1, 4)
+
+
+@pytest.mark.asyncio
+async def test_async_deduct_stock_batch_in_db(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    inv_table.events = MagicMock()
+    outcomes = [{"id": 1, "status": "applied", "count": 3}]
+    mock_client.rpc.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=outcomes)
+    )
+    items = [{"id": 1, "quantity": 2}]
+
+    assert await inv_table.deduct_stock_batch_in_db(items) == outcomes
+    mock_client.rpc.assert_called_once_with("deduct_stock_batch", {"p_items": items})
+    inv_table.events.publish.assert_called_once_with({"id": 1, "count": 3})
+
+
+@pytest.mark.asyncio
+async def test_async_bulk_adjust_stock_in_db(async_inventory_table):
+    inv_table, mock_client = async_inventory_table
+    await inv_table.connect()
+    inv_table.events = MagicMock()
+    outcomes = [
+        {"id": 1, "status": "applied", "count": 8},
+        {"id": 2, "status": "insufficient_stock", "count": 0},
+    ]
+    mock_client.rpc.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=outcomes)
+    )
+    adjustments = [{"id": 1, "delta": -2}, {"id": 2, "delta": -1}]
+
+    assert await inv_table.bulk_adjust_stock_in_db(adjustments) == outcomes
+    mock_client.rpc.assert_called_once_with(
+        "bulk_adjust_stock", {"p_adjustments": adjustments}
+    )
+    # Only rows that actually changed are published
+    inv_table.events.publish.assert_called_once_with({"id": 1, "count": 8})
@@ -0,0 +1,125 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from app.deduction_combiner import DeductionCombiner
+
+
+@pytest.mark.asyncio
+async def test_concurrent_deductions_share_one_call():
+    deduct_up_to = AsyncMock(return_value=3)
+    combiner = DeductionCombiner(deduct_up_to, window=0.01)
+
+    await asyncio.gather(*(combiner.deduct(1) for _ in range(3)))
+
+    deduct_up_to.assert_awaited_once_with(1, 3)
+
+
+@pytest.mark.asyncio
+async def test_waiters_past_the_stock_fail_in_arrival_order():
+    combiner = DeductionCombiner(AsyncMock(return_value=2), window=0.01)
+
+    results = await asyncio.gather(
+        *(combiner.deduct(1) for _ in range(4)), return_exceptions=True
+    )
+
+    assert results[:2] == [None, None]
+    assert all(isinstance(result, ValueError) for result in results[2:])
+
+
+@pytest.mark.asyncio
+async def test_goods_are_batched_separately():
+    deduct_up_to = AsyncMock(side_effect=lambda good_id, amount: amount)
+    combiner = DeductionCombiner(deduct_up_to, window=0.01)
+
+    await asyncio.gather(combiner.deduct(1), combiner.deduct(2), combiner.deduct(1))
+
+    calls = sorted(call.args for call in deduct_up_to.await_args_list)
+    assert calls == [(1, 2), (2, 1)]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_before_the_window():
+    deduct_up_to = AsyncMock(side_effect=lambda good_id, amount: amount)
+    combiner = DeductionCombiner(deduct_up_to, window=60, max_batch=2)
+
+    await asyncio.wait_for(
+        asyncio.gather(combiner.deduct(1), combiner.deduct(1)), timeout=1
+    )
+
+    deduct_up_to.assert_awaited_once_with(1, 2)
+
+
+@pytest.mark.asyncio
+async def test_failure_reaches_every_waiter():
+    combiner = DeductionCombiner(
+        AsyncMock(side_effect=Exception("Database unavailable")), window=0.01
+    )
+
+    results = await asyncio.gather(
+        combiner.deduct(1), combiner.deduct(1), return_exceptions=True
+    )
+
+    assert [str(result) for result in results] == ["Database unavailable"] * 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiters_are_not_deducted():
+    deduct_up_to = AsyncMock(side_effect=lambda good_id, amount: amount)
+    combiner = DeductionCombiner(deduct_up_to, window=0.02)
+
+    cancelled = asyncio.create_task(combiner.deduct(1))
+    kept = asyncio.create_task(combiner.deduct(1))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await kept
+
+    deduct_up_to.assert_awaited_once_with(1, 1)
+
+
+@pytest.mark.asyncio
+async def test_waiters_cancelled_in_flight_give_their_units_back():
+    called = asyncio.Event()
+    release = asyncio.Event()
+
+    async def deduct_up_to(good_id, amount):
+        called.set()
+        await release.wait()
+        return amount
+
+    restock = AsyncMock()
+    combiner = DeductionCombiner(deduct_up_to, window=0.01, restock=restock)
+
+    cancelled = asyncio.create_task(combiner.deduct(1))
+    kept = asyncio.create_task(combiner.deduct(1))
+    await called.wait()
+    cancelled.cancel()
+    release.set()
+    await kept
+
+    await asyncio.gather(*combiner._flushes)
+    restock.assert_awaited_once_with(1, 1)
+
+
+@pytest.mark.asyncio
+async def test_granted_units_go_to_waiters_still_waiting():
+    called = asyncio.Event()
+    release = asyncio.Event()
+
+    async def deduct_up_to(good_id, amount):
+        called.set()
+        await release.wait()
+        return 1
+
+    restock = AsyncMock()
+    combiner = DeductionCombiner(deduct_up_to, window=0.01, restock=restock)
+
+    cancelled = asyncio.create_task(combiner.deduct(1))
+    kept = asyncio.create_task(combiner.deduct(1))
+    await called.wait()
+    cancelled.cancel()
+    release.set()
+    await kept
+
+    await asyncio.gather(*combiner._flushes)
+    restock.assert_not_awaited()
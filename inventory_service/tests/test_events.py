@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from app.events import StockEventBus
+
+
+@pytest.mark.asyncio
+async def test_publish_filters_by_good():
+    bus = StockEventBus()
+    laptops = bus.subscribe(frozenset({1}))
+    everything = bus.subscribe()
+
+    bus.publish({"id": 1, "count": 4})
+    bus.publish({"id": 2, "count": 9})
+    await asyncio.sleep(0)
+
+    assert laptops.queue.qsize() == 1
+    assert everything.queue.qsize() == 2
+    assert await laptops.queue.get() == {"id": 1, "count": 4}
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_cut_off():
+    bus = StockEventBus(queue_size=2)
+    subscription = bus.subscribe()
+
+    for count in range(5):
+        bus.publish({"id": 1, "count": count})
+    await asyncio.sleep(0)
+
+    assert subscription.dropped
+    frames = [frame async for frame in bus.stream(subscription, keepalive=1)]
+    assert frames == ["retry: 3000\n\n", "event: overflow\ndata: {}\n\n"]
+    assert len(bus) == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_formats_events_and_keepalives():
+    bus = StockEventBus()
+    subscription = bus.subscribe()
+    stream = bus.stream(subscription, keepalive=0.01)
+
+    assert await anext(stream) == "retry: 3000\n\n"
+    assert await anext(stream) == ": keepalive\n\n"
+    bus.publish({"id": 1, "count": 4})
+    assert await anext(stream) == 'event: stock\ndata: {"id": 1, "count": 4}\n\n'
+
+    await stream.aclose()
+    assert len(bus) == 0
+
+
+@pytest.mark.asyncio
+async def test_publish_from_another_thread():
+    bus = StockEventBus()
+    subscription = bus.subscribe()
+
+    await asyncio.to_thread(bus.publish, {"id": 3, "price": 10.0})
+    assert await asyncio.wait_for(subscription.queue.get(), 1) == {
+        "id": 3,
+        "price": 10.0,
+    }
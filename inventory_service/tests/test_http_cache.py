@@ -0,0 +1,68 @@
+from app.http_cache import (
+    cache_control,
+    is_not_modified,
+    make_etag,
+    parse_fields,
+    validator_headers,
+)
+
+GOOD = {
+    "id": 1,
+    "name": "Laptop",
+    "count": 3,
+    "version": 7,
+    "updated_at": "2024-12-01T10:00:00.123456+00:00",
+}
+
+
+def test_make_etag():
+    assert make_etag(GOOD) == '"1-7"'
+    assert make_etag({**GOOD, "shards": 4}) == '"1-7-3"'
+    assert make_etag({"id": 1}) is None
+
+
+def test_cache_control_uses_most_volatile_field():
+    assert cache_control(["name", "description"]) == "public, max-age=300"
+    assert cache_control(["name", "count"]) == "public, max-age=5"
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields("name, description") == ["name", "description"]
+    try:
+        parse_fields("name,secret")
+        assert False, "expected ValueError"
+    except ValueError as e:
+        assert "secret" in str(e)
+
+
+def test_validator_headers():
+    headers = validator_headers(GOOD, GOOD.keys())
+    assert headers["ETag"] == '"1-7"'
+    assert headers["Last-Modified"] == "Sun, 01 Dec 2024 10:00:00 GMT"
+    assert headers["Cache-Control"] == "public, max-age=5"
+
+
+def test_is_not_modified_etag():
+    assert is_not_modified(GOOD, '"1-6", "1-7"', None)
+    assert is_not_modified(GOOD, 'W/"1-7"', None)
+    assert is_not_modified(GOOD, "*", None)
+    assert not is_not_modified(GOOD, '"1-6"', None)
+
+
+def test_is_not_modified_etag_takes_precedence():
+    assert not is_not_modified(GOOD, '"1-6"', "Sun, 01 Dec 2024 10:00:00 GMT")
+
+
+def test_is_not_modified_since():
+    assert is_not_modified(GOOD, None, "Sun, 01 Dec 2024 10:00:00 GMT")
+    assert not is_not_modified(GOOD, None, "Sun, 01 Dec 2024 09:59:59 GMT")
+    assert not is_not_modified(GOOD, None, "not a date")
+
+
+def test_sharded_goods_are_only_validated_by_etag():
+    sharded = {**GOOD, "shards": 4}
+    assert "Last-Modified" not in validator_headers(sharded, sharded.keys())
+    # A shard deduction leaves updated_at as it was
+    assert not is_not_modified(sharded, None, "Sun, 01 Dec 2024 10:00:00 GMT")
+    assert is_not_modified(sharded, '"1-7-3"', None)
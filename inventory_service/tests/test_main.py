@@ -1,6 +1,7 @@
 from unittest.mock import MagicMock, patch
 
 import pytest
+from app import main
 from app.main import app  # Assuming your FastAPI app is defined in main.py
 from app.models import Good, GoodUpdate
 from fastapi.testclient import TestClient
@@ -25,15 +26,81 @@ def good_update_data():
 
 
 def test_health_check_success():
-    # Mock `get_purchases` to simulate successful database connection
-    with patch("app.main.get_good", return_value=[{"id": 1}, {"id": 2}]):
+    probe = {"connected": True, "latency_ms": 1.5, "checked_at": "2024-12-01T10:00:00"}
+    with patch("app.main.check_database", return_value=probe):
         response = client.get("/health")
         assert response.status_code == 200
-        assert response.json() == {
-            "status": "OK",
-            "db_status": "connected",
-            "sample_item_check": [{"id": 1}, {"id": 2}],
-        }
+        assert response.json() == {"status": "OK", "db_status": "connected", **probe}
+
+
+def test_health_check_failure():
+    probe = {"connected": False, "error": "timeout", "latency_ms": 5000.0}
+    with patch("app.main.check_database", return_value=probe):
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ERROR"
+        assert response.json()["db_status"] == "disconnected"
+
+
+def test_liveness_check_does_not_probe_database():
+    with patch("app.main.check_database") as mock_check_database:
+        response = client.get("/health/live")
+        assert response.status_code == 200
+        assert response.json() == {"status": "OK"}
+        mock_check_database.assert_not_called()
+
+
+def test_readiness_check():
+    with patch("app.main.check_database", return_value={"connected": True}):
+        assert client.get("/health/ready").status_code == 200
+    with patch("app.main.check_database", return_value={"connected": False}):
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "ERROR"
+
+
+@pytest.mark.asyncio
+async def test_warm_up_retries_failed_builds(monkeypatch):
+    monkeypatch.setattr(main, "WARM_UP_RETRY_SECONDS", 0)
+    with patch(
+        "app.main.build_search_index", side_effect=[Exception("Down"), None]
+    ) as mock_build, patch("app.main.build_inventory_stats"), patch(
+        "app.main.build_price_history"
+    ):
+        await main._warm_up()
+    assert mock_build.await_count == 2
+
+
+def test_lifespan_connects_and_closes_database():
+    with patch("app.main.CATALOG_REFRESH_SECONDS", 60), patch(
+        "app.main.connect_database"
+    ) as mock_connect, patch("app.main.close_database") as mock_close, patch(
+        "app.main.build_search_index"
+    ) as mock_build, patch(
+        "app.main.build_inventory_stats"
+    ) as mock_build_stats, patch(
+        "app.main.build_price_history"
+    ) as mock_build_prices, patch(
+        "app.main.refresh_catalog_periodically"
+    ) as mock_refresh_catalog:
+        with TestClient(app) as lifespan_client:
+            mock_connect.assert_awaited_once()
+            mock_close.assert_not_awaited()
+            assert lifespan_client.get("/health/live").status_code == 200
+        mock_close.assert_awaited_once()
+        mock_build.assert_called_once()
+        mock_build_stats.assert_called_once()
+        mock_build_prices.assert_called_once()
+        mock_refresh_catalog.assert_called_once()
+
+
+def test_lifespan_skips_catalog_refresh_by_default():
+    with patch("app.main.connect_database"), patch("app.main.close_database"), patch(
+        "app.main._warm_up"
+    ), patch("app.main.refresh_catalog_periodically") as mock_refresh_catalog:
+        with TestClient(app):
+            pass
+        mock_refresh_catalog.assert_not_called()
 
 
 def test_add_good_endpoint_success(good_data):
@@ -56,6 +123,122 @@ def test_add_good_endpoint_failure(good_data):
         mock_add_good.assert_called_once()
 
 
+def test_import_goods_endpoint_success():
+    report = {"processed": 1, "imported": 1, "failed": 0, "errors": []}
+    body = "name,category,price,description,count\nLaptop,electronics,10,Fast,1\n"
+    with patch("app.main.import_goods") as mock_import_goods:
+        mock_import_goods.return_value = report
+
+        response = client.post(
+            "/api/v1/inventory/import?batch_size=100",
+            content=body,
+            headers={"Content-Type": "text/csv"},
+        )
+        assert response.status_code == 200
+        assert response.json() == report
+        _, fmt, batch_size = mock_import_goods.call_args.args
+        assert (fmt, batch_size) == ("csv", 100)
+
+
+def test_import_goods_endpoint_unsupported_format():
+    with patch("app.main.import_goods") as mock_import_goods:
+        response = client.post(
+            "/api/v1/inventory/import",
+            content="{}",
+            headers={"Content-Type": "application/json"},
+        )
+        assert response.status_code == 415
+        mock_import_goods.assert_not_called()
+
+
+def test_search_goods_endpoint_success():
+    results = [{"id": 1, "name": "Gaming Laptop", "score": 1.5}]
+    with patch("app.main.search_goods") as mock_search_goods:
+        mock_search_goods.return_value = results
+
+        response = client.get("/api/v1/inventory/search?q=lap&limit=5")
+        assert response.status_code == 200
+        assert response.json() == results
+        mock_search_goods.assert_called_once_with("lap", limit=5, prefix=True)
+
+
+def test_search_goods_endpoint_not_ready():
+    with patch("app.main.search_goods") as mock_search_goods:
+        mock_search_goods.side_effect = RuntimeError(
+            "Search index is still being built"
+        )
+
+        response = client.get("/api/v1/inventory/search?q=lap")
+        assert response.status_code == 503
+
+
+def test_get_inventory_stats_endpoint():
+    stats = {"goods": 2, "units": 7, "stock_value": 14.0, "low_stock": []}
+    with patch("app.main.get_inventory_stats", return_value=stats):
+        response = client.get("/api/v1/inventory/stats")
+        assert response.status_code == 200
+        assert response.json() == stats
+
+    with patch("app.main.get_inventory_stats") as mock_get_inventory_stats:
+        mock_get_inventory_stats.side_effect = RuntimeError("still being built")
+        assert client.get("/api/v1/inventory/stats").status_code == 503
+
+
+def test_rebuild_inventory_stats_endpoint():
+    with patch("app.main.build_inventory_stats") as mock_build_inventory_stats:
+        mock_build_inventory_stats.return_value = {"goods": 2}
+        response = client.post("/api/v1/inventory/stats/rebuild")
+        assert response.status_code == 200
+        assert response.json() == {"goods": 2}
+
+        mock_build_inventory_stats.side_effect = RuntimeError("already being rebuilt")
+        response = client.post("/api/v1/inventory/stats/rebuild")
+        assert response.status_code == 409
+
+
+def test_query_goods_endpoint():
+    result = {"snapshot_at": "2024-12-01T10:00:00+00:00", "goods": [{"id": 3}]}
+    with patch("app.main.query_goods", return_value=result) as mock_query_goods:
+        response = client.get(
+            "/api/v1/inventory/catalog/query"
+            "?category=electronics&max_price=200&min_count=6&limit=5"
+        )
+        assert response.status_code == 200
+        assert response.json() == result
+        query = mock_query_goods.call_args.args[0]
+        assert (query.category, query.max_price, query.min_count) == (
+            "electronics",
+            200,
+            6,
+        )
+        assert (query.sort_by, query.limit) == ("price", 5)
+
+        mock_query_goods.side_effect = RuntimeError("still being loaded")
+        assert client.get("/api/v1/inventory/catalog/query").status_code == 503
+        assert client.get("/api/v1/inventory/catalog/query?limit=0").status_code == 422
+
+
+def test_stream_stock_events_endpoint():
+    async def frames():
+        yield "retry: 3000\n\n"
+        yield 'event: stock\ndata: {"id": 1, "count": 4}\n\n'
+
+    with patch("app.main.stream_stock_events", return_value=frames()) as mock_stream:
+        response = client.get("/api/v1/inventory/stream?ids=1,2")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.headers["cache-control"] == "no-cache"
+        assert 'data: {"id": 1, "count": 4}' in response.text
+        mock_stream.assert_called_once_with(frozenset({1, 2}))
+
+
+def test_stream_stock_events_endpoint_invalid_ids():
+    with patch("app.main.stream_stock_events") as mock_stream:
+        response = client.get("/api/v1/inventory/stream?ids=1,abc")
+        assert response.status_code == 400
+        mock_stream.assert_not_called()
+
+
 def test_update_good_endpoint_success(good_update_data):
     good_id = 1
     updated_good = {"id": good_id, **good_update_data}
@@ -87,6 +270,143 @@ def test_update_good_endpoint_not_found(good_update_data):
         )
 
 
+def test_update_good_endpoint_refused_stock_change():
+    with patch("app.main.update_good") as mock_update_good:
+        mock_update_good.side_effect = RuntimeError(
+            "The stock of good 1 would drop below zero"
+        )
+
+        response = client.put("/api/v1/inventory/update/1", json={"count_delta": -5})
+        assert response.status_code == 409
+        assert response.json() == {
+            "detail": "The stock of good 1 would drop below zero"
+        }
+
+
+def test_adjust_stock_bulk_endpoint():
+    report = {
+        "applied": 1,
+        "failed": 1,
+        "results": [
+            {"id": 1, "status": "applied", "count": 8},
+            {"id": 2, "status": "not_found", "count": None},
+        ],
+    }
+    with patch("app.main.adjust_stock_bulk", return_value=report) as mock_bulk:
+        response = client.post(
+            "/api/v1/inventory/stock/bulk",
+            json=[{"id": 1, "delta": -2}, {"id": 2, "absolute": 5}],
+        )
+        assert response.status_code == 200
+        assert response.json() == report
+        assert [adjustment.id for adjustment in mock_bulk.call_args.args[0]] == [1, 2]
+
+
+def test_adjust_stock_bulk_endpoint_invalid():
+    with patch("app.main.adjust_stock_bulk") as mock_bulk:
+        response = client.post("/api/v1/inventory/stock/bulk", json=[{"id": 1}])
+        assert response.status_code == 422
+
+        mock_bulk.side_effect = ValueError("Each good may be adjusted once")
+        response = client.post(
+            "/api/v1/inventory/stock/bulk",
+            json=[{"id": 1, "delta": 1}, {"id": 1, "delta": 2}],
+        )
+        assert response.status_code == 400
+
+
+def test_set_stock_sharding_endpoint():
+    with patch("app.main.set_stock_sharding") as mock_set_stock_sharding:
+        mock_set_stock_sharding.return_value = {"message": "Stock sharding updated"}
+
+        response = client.put("/api/v1/inventory/sharding/1", json={"shards": 8})
+        assert response.status_code == 200
+        mock_set_stock_sharding.assert_called_once_with(1, 8)
+
+
+def test_set_stock_sharding_endpoint_invalid():
+    response = client.put("/api/v1/inventory/sharding/1", json={"shards": -1})
+    assert response.status_code == 422
+
+
+def test_get_price_endpoint():
+    price = {
+        "id": 1,
+        "price": 9.5,
+        "valid_from": "2024-01-01T00:00:00+00:00",
+        "at": "2024-02-01T00:00:00+00:00",
+    }
+    with patch("app.main.get_price_at", return_value=price) as mock_get_price_at:
+        response = client.get("/api/v1/inventory/1/price?at=2024-02-01T00:00:00Z")
+        assert response.status_code == 200
+        assert response.json() == price
+        good_id, at = mock_get_price_at.call_args.args
+        assert good_id == 1
+        assert at.isoformat() == "2024-02-01T00:00:00+00:00"
+
+        mock_get_price_at.side_effect = ValueError("No price recorded")
+        assert client.get("/api/v1/inventory/1/price").status_code == 404
+
+
+def test_get_availability_endpoint():
+    availability = {"count": 4, "price": 9.5, "version": 2}
+    with patch("app.main.get_availability", return_value=availability) as mock_get:
+        response = client.get("/api/v1/inventory/1/availability")
+        assert response.status_code == 200
+        assert response.json() == availability
+        mock_get.assert_called_once_with(1)
+
+    with patch("app.main.get_availability", side_effect=ValueError("Good not found")):
+        response = client.get("/api/v1/inventory/1/availability")
+        assert response.status_code == 404
+
+
+def test_get_availability_batch_endpoint():
+    result = {
+        "goods": [{"id": 1, "count": 4, "price": 9.5, "version": 2}],
+        "missing": [2],
+    }
+    with patch("app.main.get_availability_batch", return_value=result) as mock_get:
+        response = client.get("/api/v1/inventory/availability?ids=1,2")
+        assert response.status_code == 200
+        assert response.json() == result
+        mock_get.assert_called_once_with([1, 2])
+
+    response = client.get("/api/v1/inventory/availability?ids=1,x")
+    assert response.status_code == 400
+
+
+def test_deduct_stock_batch_endpoint():
+    result = {"results": [{"id": 1, "status": "applied", "count": 3}]}
+    with patch("app.main.deduct_stock_batch", return_value=result) as mock_deduct:
+        response = client.post(
+            "/api/v1/inventory/stock/deduct", json=[{"id": 1, "quantity": 2}]
+        )
+        assert response.status_code == 200
+        assert response.json() == result
+        assert mock_deduct.call_args.args[0][0].quantity == 2
+
+    with patch(
+        "app.main.deduct_stock_batch",
+        side_effect=ValueError("No stock was deducted; insufficient stock: [1]"),
+    ):
+        response = client.post("/api/v1/inventory/stock/deduct", json=[{"id": 1}])
+        assert response.status_code == 400
+
+    response = client.post(
+        "/api/v1/inventory/stock/deduct", json=[{"id": 1, "quantity": 0}]
+    )
+    assert response.status_code == 422
+
+
+def test_restock_batch_endpoint():
+    result = {"results": [{"id": 1, "status": "applied", "count": 5}]}
+    with patch("app.main.restock_batch", return_value=result):
+        response = client.post("/api/v1/inventory/stock/restock", json=[{"id": 1}])
+        assert response.status_code == 200
+        assert response.json() == result
+
+
 def test_get_good_endpoint_success(good_data):
     good_id = 1
     with patch("app.main.get_good") as mock_get_good:
@@ -98,6 +418,45 @@ def test_get_good_endpoint_success(good_data):
         mock_get_good.assert_called_once_with(good_id)
 
 
+def test_get_good_endpoint_validators(good_data):
+    good = {
+        "id": 1,
+        **good_data,
+        "version": 3,
+        "updated_at": "2024-12-01T10:00:00+00:00",
+    }
+    with patch("app.main.get_good", return_value=good):
+        response = client.get("/api/v1/inventory/1")
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"1-3"'
+        assert response.headers["last-modified"] == "Sun, 01 Dec 2024 10:00:00 GMT"
+        assert response.headers["cache-control"] == "public, max-age=5"
+
+        response = client.get("/api/v1/inventory/1", headers={"If-None-Match": '"1-3"'})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == '"1-3"'
+
+
+def test_get_good_endpoint_static_fields(good_data):
+    good = {"id": 1, **good_data, "version": 3}
+    with patch("app.main.get_good", return_value=good):
+        response = client.get("/api/v1/inventory/1?fields=name,description")
+        assert response.status_code == 200
+        assert response.json() == {
+            "name": good_data["name"],
+            "description": good_data["description"],
+        }
+        assert response.headers["cache-control"] == "public, max-age=300"
+
+
+def test_get_good_endpoint_unknown_field():
+    with patch("app.main.get_good") as mock_get_good:
+        response = client.get("/api/v1/inventory/1?fields=secret")
+        assert response.status_code == 400
+        mock_get_good.assert_not_called()
+
+
 def test_get_good_endpoint_not_found():
     good_id = 1
     with patch("app.main.get_good") as mock_get_good:
@@ -120,7 +479,7 @@ def test_deduct_good_endpoint_success():
         response = client.put(f"/api/v1/inventory/deduct/{good_id}")
         assert response.status_code == 200
         assert response.json() == {"id": good_id, "message": "Deducted successfully"}
-        mock_deduct_good.assert_called_once_with(good_id)
+        mock_deduct_good.assert_called_once_with(good_id, None)
 
 
 def test_deduct_good_endpoint_insufficient_stock():
@@ -131,4 +490,14 @@ def test_deduct_good_endpoint_insufficient_stock():
         response = client.put(f"/api/v1/inventory/deduct/{good_id}")
         assert response.status_code == 400
         assert response.json() == {"detail": "Insufficient stock"}
-        mock_deduct_good.assert_called_once_with(good_id)
+        mock_deduct_good.assert_called_once_with(good_id, None)
+
+
+def test_deduct_good_endpoint_price_changed():
+    with patch("app.main.deduct_good") as mock_deduct_good:
+        mock_deduct_good.side_effect = RuntimeError("The price of good 1 has changed")
+
+        response = client.put("/api/v1/inventory/deduct/1?price_version=3")
+        assert response.status_code == 409
+        assert response.json() == {"detail": "The price of good 1 has changed"}
+        mock_deduct_good.assert_called_once_with(1, 3)
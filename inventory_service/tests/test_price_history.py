@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+from app.price_history import PriceHistory, to_timestamp
+
+
+def test_to_timestamp():
+    assert to_timestamp("1970-01-01T00:01:00+00:00") == 60.0
+    # Naive values are taken as UTC
+    assert to_timestamp(datetime(1970, 1, 1, 0, 2)) == 120.0
+
+
+def test_price_at_resolves_point_in_time():
+    history = PriceHistory()
+    history.record(1, "2024-01-01T00:00:00+00:00", 10.0)
+    history.record(1, "2024-03-01T00:00:00+00:00", 12.5)
+
+    assert history.price_at(1, "2023-12-31T23:59:59+00:00") is None
+    assert history.price_at(1, "2024-02-15T00:00:00+00:00")[0] == 10.0
+    # A price applies from the instant it took effect
+    assert history.price_at(1, "2024-03-01T00:00:00+00:00")[0] == 12.5
+    assert history.price_at(1, datetime(2030, 1, 1, tzinfo=timezone.utc)) == (
+        12.5,
+        to_timestamp("2024-03-01T00:00:00+00:00"),
+    )
+    assert history.price_at(2, "2024-02-15T00:00:00+00:00") is None
+
+
+def test_loading_merges_with_live_records():
+    history = PriceHistory()
+    history.record(1, "2024-03-01T00:00:00+00:00", 12.5)
+    history.add_page(
+        [
+            {"good_id": 1, "price": 10.0, "valid_from": "2024-01-01T00:00:00+00:00"},
+            {"good_id": 1, "price": 12.5, "valid_from": "2024-03-01T00:00:00+00:00"},
+        ]
+    )
+
+    assert len(history._times[1]) == 2
+    assert history.price_at(1, "2024-02-01T00:00:00+00:00")[0] == 10.0
+    assert history.price_at(1, "2024-04-01T00:00:00+00:00")[0] == 12.5
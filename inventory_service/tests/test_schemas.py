@@ -1,5 +1,5 @@
 import pytest
-from app.models import Category, Good, GoodUpdate
+from app.models import Category, Good, GoodUpdate, StockAdjustment
 from pydantic import ValidationError
 
 
@@ -104,6 +104,29 @@ def test_good_update_no_fields():
     assert update.model_dump(exclude_unset=True) == {}
 
 
+def test_good_update_count_delta():
+    update = GoodUpdate(count_delta=-3)
+    assert update.model_dump(exclude_unset=True) == {"count_delta": -3}
+
+
+def test_good_update_count_and_delta_conflict():
+    with pytest.raises(ValidationError):
+        GoodUpdate(count=5, count_delta=-1)  # Absolute and relative together
+
+
+def test_stock_adjustment_requires_exactly_one_change():
+    assert StockAdjustment(id=1, delta=-2).model_dump(exclude_none=True) == {
+        "id": 1,
+        "delta": -2,
+    }
+    with pytest.raises(ValidationError):
+        StockAdjustment(id=1)
+    with pytest.raises(ValidationError):
+        StockAdjustment(id=1, delta=1, absolute=5)
+    with pytest.raises(ValidationError):
+        StockAdjustment(id=1, absolute=-1)
+
+
 def test_category_enum():
     assert Category.FOOD == "food"
     assert Category.CLOTHES == "clothes"
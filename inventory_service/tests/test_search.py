@@ -0,0 +1,84 @@
+import pytest
+from app.search import SearchIndex, tokenize
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.begin_build()
+    index.add_page(
+        [
+            {"id": 1, "name": "Gaming Laptop", "description": "Fast laptop, RGB"},
+            {"id": 2, "name": "Laptop Sleeve", "description": "Fits 15 inch"},
+            {"id": 3, "name": "Wool Scarf", "description": "Warm winter scarf"},
+        ]
+    )
+    index.finish_build()
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Fast, 15-inch Laptop!") == ["fast", "15", "inch", "laptop"]
+    assert tokenize(None) == []
+
+
+def test_search_ranks_by_bm25(index):
+    results = index.search("laptop")
+    assert [result["id"] for result in results] == [1, 2]
+    assert results[0]["name"] == "Gaming Laptop"
+    assert results[0]["score"] > results[1]["score"] > 0
+
+
+def test_search_prefix_matching(index):
+    assert [result["id"] for result in index.search("lap")] == [1, 2]
+    assert index.search("lap", prefix=False) == []
+
+
+def test_search_limit(index):
+    assert len(index.search("laptop scarf", limit=2)) == 2
+
+
+def test_add_replaces_previous_version(index):
+    index.add({"id": 3, "name": "Laptop Stand", "description": "Aluminium"})
+    assert index.search("scarf") == []
+    assert 3 in [result["id"] for result in index.search("laptop")]
+    assert len(index) == 3
+
+
+def test_remove(index):
+    index.remove(1)
+    assert [result["id"] for result in index.search("gaming")] == []
+    assert [result["id"] for result in index.search("laptop")] == [2]
+
+
+def test_search_goods_without_tokens():
+    index = SearchIndex()
+    index.add({"id": 1, "name": "!!!", "description": None})
+    assert index.search("a") == []
+
+
+def test_updates_during_build_take_precedence():
+    index = SearchIndex()
+    index.begin_build()
+    index.add({"id": 1, "name": "New Name", "description": ""})
+    index.add_page([{"id": 1, "name": "Old Name", "description": ""}])
+    index.finish_build()
+    assert index.ready
+    assert index.search("old") == []
+    assert [result["id"] for result in index.search("new")] == [1]
+
+
+def test_aborted_build_returns_to_incremental_updates():
+    index = SearchIndex()
+    index.begin_build()
+    index.add_page([{"id": 1, "name": "Gaming Laptop", "description": ""}])
+    index.abort_build()
+    index.add({"id": 2, "name": "Gaming Mouse", "description": ""})
+
+    assert not index.ready
+    assert [result["id"] for result in index.search("gam")] == [1, 2]
+
+    index.begin_build()
+    index.add_page([{"id": 3, "name": "Wool Scarf", "description": ""}])
+    index.finish_build()
+    assert index.ready
@@ -1,8 +1,34 @@
-from unittest.mock import MagicMock, patch
+import json
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from app.models import Good, GoodUpdate
-from app.service import add_good, deduct_good, get_good, update_good
+from app import service
+from app.models import CatalogQuery, Good, GoodUpdate, StockAdjustment, StockDeduction
+from app.price_history import PriceHistory
+from app.search import SearchIndex
+from app.service import (
+    add_good,
+    adjust_stock_bulk,
+    build_inventory_stats,
+    build_price_history,
+    build_search_index,
+    deduct_good,
+    deduct_stock_batch,
+    get_availability,
+    get_availability_batch,
+    get_good,
+    get_inventory_stats,
+    get_price_at,
+    import_goods,
+    query_goods,
+    refresh_catalog_snapshot,
+    restock_batch,
+    search_goods,
+    set_stock_sharding,
+    update_good,
+)
+from app.stats import InventoryStats
 
 
 @pytest.fixture
@@ -24,95 +50,561 @@ def updated_good_data():
     }
 
 
-def test_add_good_success(good_data):
+@pytest.mark.asyncio
+async def test_add_good_success(good_data):
     with patch("app.service.db_inv.add_good_to_db") as mock_add_good_to_db:
-        mock_add_good_to_db.return_value = None
+        mock_add_good_to_db.return_value = [{**good_data, "id": 1}]
 
-        result = add_good(Good(**good_data))
+        result = await add_good(Good(**good_data))
         assert result == {"message": "Good added successfully"}
         mock_add_good_to_db.assert_called_once_with(Good(**good_data))
 
 
-def test_add_good_failure(good_data):
+@pytest.mark.asyncio
+async def test_add_good_failure(good_data):
     with patch("app.service.db_inv.add_good_to_db") as mock_add_good_to_db:
         mock_add_good_to_db.side_effect = Exception("Database error")
 
         with pytest.raises(Exception, match="Database error"):
-            add_good(Good(**good_data))
+            await add_good(Good(**good_data))
         mock_add_good_to_db.assert_called_once_with(Good(**good_data))
 
 
-def test_update_good_success(good_data, updated_good_data):
+async def ndjson_stream(*lines: str):
+    for line in lines:
+        yield f"{line}\n".encode()
+
+
+@pytest.mark.asyncio
+async def test_import_goods_batches_and_reports_errors(good_data):
+    rows = [json.dumps(good_data)] * 5 + ['{"name": "No price"}']
+
+    with patch("app.service.db_inv.upsert_goods_to_db") as mock_upsert:
+        mock_upsert.side_effect = lambda goods: [
+            {**good, "id": index} for index, good in enumerate(goods, 1)
+        ]
+
+        report = await import_goods(ndjson_stream(*rows), "ndjson", batch_size=2)
+        assert report["processed"] == 6
+        assert report["imported"] == 5
+        assert report["failed"] == 1
+        assert report["errors"][0]["row"] == 6
+        assert "price" in report["errors"][0]["error"]
+        assert report["errors_truncated"] is False
+        # 5 valid rows in batches of 2
+        assert [len(call.args[0]) for call in mock_upsert.call_args_list] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_import_goods_rejected_batch(good_data):
+    rows = [json.dumps(good_data)] * 3
+
+    with patch("app.service.db_inv.upsert_goods_to_db") as mock_upsert:
+        mock_upsert.side_effect = [
+            Exception("duplicate key"),
+            [{**good_data, "id": 3}],
+        ]
+
+        report = await import_goods(ndjson_stream(*rows), "ndjson", batch_size=2)
+        assert report["imported"] == 1
+        assert report["failed"] == 2
+        assert [error["row"] for error in report["errors"]] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_import_goods_only_replaces_existing_unsharded_goods(good_data):
+    rows = [
+        json.dumps({**good_data, "id": 1}),
+        json.dumps({**good_data, "id": 2}),
+        json.dumps({**good_data, "id": 99}),
+        json.dumps(good_data),
+    ]
+
+    with patch("app.service.db_inv.get_shards_in_db") as mock_get_shards, patch(
+        "app.service.db_inv.upsert_goods_to_db"
+    ) as mock_upsert:
+        mock_get_shards.return_value = {1: 0, 2: 4}
+        mock_upsert.side_effect = lambda goods: [
+            {**good, "id": good.get("id", 100)} for good in goods
+        ]
+
+        report = await import_goods(ndjson_stream(*rows), "ndjson")
+        mock_get_shards.assert_awaited_once_with([1, 2, 99])
+        # Only the existing unsharded good and the new one are written
+        assert [good.get("id") for good in mock_upsert.call_args.args[0]] == [1, None]
+        assert report["imported"] == 2
+        assert report["failed"] == 2
+        assert report["errors"][0]["row"] == 2
+        assert "sharded stock" in report["errors"][0]["error"]
+        assert report["errors"][1] == {"row": 3, "error": "Good 99 not found"}
+
+
+async def async_pages(pages):
+    for page in pages:
+        yield page
+
+
+@pytest.mark.asyncio
+async def test_build_search_index_and_search():
+    pages = [
+        [{"id": 1, "name": "Gaming Laptop", "description": "Fast"}],
+        [{"id": 2, "name": "Wool Scarf", "description": "Warm"}],
+    ]
+    with patch("app.service.search_index", SearchIndex()), patch(
+        "app.service.db_inv.iter_goods"
+    ) as mock_iter_goods:
+        mock_iter_goods.return_value = async_pages(pages)
+
+        with pytest.raises(RuntimeError, match="still being built"):
+            search_goods("laptop")
+        await build_search_index(page_size=1)
+        mock_iter_goods.assert_called_once_with("id,name,description", page_size=1)
+        assert [result["id"] for result in search_goods("lap")] == [1]
+
+
+@pytest.mark.asyncio
+async def test_failed_search_index_build_is_aborted():
+    async def failing_pages():
+        yield [{"id": 1, "name": "Gaming Laptop", "description": "Fast"}]
+        raise Exception("Connection reset")
+
+    index = SearchIndex()
+    with patch("app.service.search_index", index), patch(
+        "app.service.db_inv.iter_goods", return_value=failing_pages()
+    ):
+        with pytest.raises(Exception, match="Connection reset"):
+            await build_search_index()
+
+        # A later build can run and complete
+        with patch("app.service.db_inv.iter_goods", return_value=async_pages([])):
+            await build_search_index()
+    assert index.ready
+
+
+@pytest.mark.asyncio
+async def test_build_inventory_stats_resolves_sharded_counts():
+    pages = [
+        [
+            {"id": 1, "category": "food", "count": 3, "price": 2.0, "shards": 0},
+            {"id": 2, "category": "food", "count": 0, "price": 1.0, "shards": 4},
+        ]
+    ]
+    with patch("app.service.inventory_stats", InventoryStats(5)), patch(
+        "app.service.db_inv.iter_goods"
+    ) as mock_iter_goods, patch(
+        "app.service.db_inv.get_sharded_counts", return_value={2: 50}
+    ) as mock_sharded_counts:
+        mock_iter_goods.return_value = async_pages(pages)
+
+        with pytest.raises(RuntimeError, match="still being built"):
+            get_inventory_stats()
+        snapshot = await build_inventory_stats()
+        mock_sharded_counts.assert_awaited_once_with([2])
+        assert snapshot["categories"]["food"] == {
+            "goods": 2,
+            "units": 53,
+            "stock_value": 56.0,
+        }
+        assert get_inventory_stats()["low_stock"] == [{"id": 1, "count": 3}]
+
+
+@pytest.mark.asyncio
+async def test_refresh_catalog_snapshot():
+    pages = [
+        [
+            {
+                "id": 1,
+                "name": "Tea",
+                "category": "food",
+                "price": 2.0,
+                "description": "Green",
+                "count": 0,
+                "shards": 2,
+            }
+        ]
+    ]
+    with patch("app.service.catalog_snapshot", None), patch(
+        "app.service.db_inv.iter_goods"
+    ) as mock_iter_goods, patch(
+        "app.service.db_inv.get_sharded_counts", return_value={1: 9}
+    ):
+        mock_iter_goods.return_value = async_pages(pages)
+
+        snapshot = await refresh_catalog_snapshot()
+        assert snapshot.get(1)["count"] == 9
+        assert service.catalog_snapshot is snapshot
+        result = query_goods(CatalogQuery(min_count=5))
+        assert result["snapshot_at"] == snapshot.created_at
+        assert [good["id"] for good in result["goods"]] == [1]
+
+    with patch("app.service.catalog_snapshot", None), patch(
+        "app.service.CATALOG_REFRESH_SECONDS", 60
+    ):
+        with pytest.raises(RuntimeError, match="still being loaded"):
+            query_goods(CatalogQuery())
+    with patch("app.service.catalog_snapshot", None), patch(
+        "app.service.CATALOG_REFRESH_SECONDS", 0
+    ):
+        with pytest.raises(RuntimeError, match="Catalog queries are disabled"):
+            query_goods(CatalogQuery())
+
+
+@pytest.mark.asyncio
+async def test_deduct_good_updates_stats():
+    stats = InventoryStats(5)
+    stats.add({"id": 1, "category": "food", "count": 6, "price": 1.0})
+    with patch("app.service.inventory_stats", stats), patch(
+        "app.service.db_inv.deduct_good_from_db"
+    ):
+        await deduct_good(1)
+        assert stats.snapshot()["units"] == 5
+        await deduct_good(1)
+        assert stats.snapshot()["low_stock"] == [{"id": 1, "count": 4}]
+
+
+@pytest.mark.asyncio
+async def test_build_price_history_and_get_price_at():
+    pages = [
+        [
+            {
+                "id": 1,
+                "good_id": 7,
+                "price": 5.0,
+                "valid_from": "2024-01-01T00:00:00+00:00",
+            }
+        ],
+        [
+            {
+                "id": 2,
+                "good_id": 7,
+                "price": 6.0,
+                "valid_from": "2024-06-01T00:00:00+00:00",
+            }
+        ],
+    ]
+    with patch("app.service.price_history", PriceHistory()), patch(
+        "app.service.db_inv.iter_price_history"
+    ) as mock_iter_price_history:
+        mock_iter_price_history.return_value = async_pages(pages)
+
+        with pytest.raises(RuntimeError, match="still being loaded"):
+            get_price_at(7)
+        await build_price_history()
+
+        assert get_price_at(7, datetime(2024, 3, 1)) == {
+            "id": 7,
+            "price": 5.0,
+            "valid_from": "2024-01-01T00:00:00+00:00",
+            "at": "2024-03-01T00:00:00+00:00",
+        }
+        assert get_price_at(7)["price"] == 6.0
+        with pytest.raises(ValueError, match="No price recorded"):
+            get_price_at(7, datetime(2023, 1, 1, tzinfo=timezone.utc))
+
+
+@pytest.mark.asyncio
+async def test_update_good_records_price_change():
+    history = PriceHistory()
+    row = {
+        "id": 1,
+        "category": "food",
+        "count": 3,
+        "price": 4.5,
+        "updated_at": "2024-06-01T12:00:00+00:00",
+    }
+    with patch("app.service.price_history", history), patch(
+        "app.service.db_inv.update_good_in_db", return_value=[row]
+    ):
+        await update_good(1, GoodUpdate(price=4.5))
+        assert history.price_at(1, "2024-06-01T12:00:00+00:00")[0] == 4.5
+
+
+@pytest.mark.asyncio
+async def test_update_good_success(good_data, updated_good_data):
     good_id = 1
-    existing_good = {**good_data, "id": good_id}
-    updated_good = {**good_data, **updated_good_data}
+    updated_good = {**good_data, **updated_good_data, "id": good_id}
 
     with patch("app.service.db_inv.get_good_from_db") as mock_get_good_from_db, patch(
         "app.service.db_inv.update_good_in_db"
     ) as mock_update_good_in_db:
-        mock_get_good_from_db.return_value = existing_good
-        mock_update_good_in_db.return_value = None
+        mock_update_good_in_db.return_value = [updated_good]
 
-        result = update_good(good_id, GoodUpdate(**updated_good_data))
-        assert result == {"message": "Good updated successfully"}
-        mock_get_good_from_db.assert_called_once_with(good_id)
-        mock_update_good_in_db.assert_called_once_with(good_id, updated_good)
+        result = await update_good(good_id, GoodUpdate(**updated_good_data))
+        assert result == {"message": "Good updated successfully", "good": updated_good}
+        mock_get_good_from_db.assert_not_called()
+        mock_update_good_in_db.assert_called_once_with(
+            good_id, GoodUpdate(**updated_good_data)
+        )
 
 
-def test_update_good_not_found(updated_good_data):
+@pytest.mark.asyncio
+async def test_update_good_not_found(updated_good_data):
     good_id = 1
 
-    with patch("app.service.db_inv.get_good_from_db") as mock_get_good_from_db, patch(
-        "app.service.db_inv.update_good_in_db"
-    ) as mock_update_good_in_db:
-        mock_get_good_from_db.return_value = None
+    with patch("app.service.db_inv.update_good_in_db") as mock_update_good_in_db, patch(
+        "app.service.db_inv.get_stock_state_from_db", return_value=None
+    ):
+        mock_update_good_in_db.return_value = []
 
         with pytest.raises(ValueError, match="Good not found"):
-            update_good(good_id, GoodUpdate(**updated_good_data))
-        mock_get_good_from_db.assert_called_once_with(good_id)
-        mock_update_good_in_db.assert_not_called()
+            await update_good(good_id, GoodUpdate(**updated_good_data))
+        mock_update_good_in_db.assert_called_once_with(
+            good_id, GoodUpdate(**updated_good_data)
+        )
 
 
-def test_get_good_success(good_data):
+@pytest.mark.asyncio
+async def test_update_good_count_delta_refused():
+    good_id = 1
+
+    with patch("app.service.db_inv.update_good_in_db") as mock_update_good_in_db, patch(
+        "app.service.db_inv.get_stock_state_from_db"
+    ) as mock_get_stock_state:
+        mock_update_good_in_db.return_value = []
+        mock_get_stock_state.return_value = {"id": good_id, "count": 3, "shards": 0}
+
+        with pytest.raises(RuntimeError, match="would drop below zero"):
+            await update_good(good_id, GoodUpdate(count_delta=-5))
+
+        mock_get_stock_state.return_value = {"id": good_id, "count": 0, "shards": 4}
+        with pytest.raises(RuntimeError, match="is sharded"):
+            await update_good(good_id, GoodUpdate(count=5))
+
+        mock_get_stock_state.return_value = None
+        with pytest.raises(ValueError, match="Good not found"):
+            await update_good(good_id, GoodUpdate(count_delta=-5))
+
+
+@pytest.mark.asyncio
+async def test_adjust_stock_bulk_chunks_and_reports_outcomes():
+    adjustments = [
+        StockAdjustment(id=1, delta=-2),
+        StockAdjustment(id=2, absolute=40),
+        StockAdjustment(id=3, delta=-99),
+    ]
+
+    async def apply_chunk(chunk):
+        if chunk[0]["id"] == 3:
+            raise Exception("Database error")
+        return [{"id": item["id"], "status": "applied", "count": 5} for item in chunk]
+
+    with patch("app.service.db_inv.bulk_adjust_stock_in_db") as mock_bulk:
+        mock_bulk.side_effect = apply_chunk
+
+        report = await adjust_stock_bulk(adjustments, chunk_size=2)
+        assert report["applied"] == 2
+        assert report["failed"] == 1
+        assert [result["status"] for result in report["results"]] == [
+            "applied",
+            "applied",
+            "error",
+        ]
+        assert mock_bulk.await_args_list[0].args[0] == [
+            {"id": 1, "delta": -2},
+            {"id": 2, "absolute": 40},
+        ]
+
+
+@pytest.mark.asyncio
+async def test_adjust_stock_bulk_rejects_repeated_ids():
+    with patch("app.service.db_inv.bulk_adjust_stock_in_db") as mock_bulk:
+        with pytest.raises(ValueError, match="repeated: \\[1\\]"):
+            await adjust_stock_bulk(
+                [StockAdjustment(id=1, delta=1), StockAdjustment(id=1, absolute=3)]
+            )
+        mock_bulk.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_set_stock_sharding_enable():
+    with patch("app.service.db_inv.enable_sharding_in_db") as mock_enable:
+        mock_enable.return_value = [{"id": 1, "shards": 4}]
+
+        result = await set_stock_sharding(1, 4)
+        assert result == {
+            "message": "Stock sharding updated",
+            "good": {"id": 1, "shards": 4},
+        }
+        mock_enable.assert_called_once_with(1, 4)
+
+
+@pytest.mark.asyncio
+async def test_set_stock_sharding_disable_not_sharded():
+    with patch("app.service.db_inv.disable_sharding_in_db") as mock_disable:
+        mock_disable.return_value = []
+
+        with pytest.raises(ValueError, match="already not sharded"):
+            await set_stock_sharding(1, 0)
+        mock_disable.assert_called_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_get_good_success(good_data):
     good_id = 1
     good_data_with_id = {**good_data, "id": good_id}
 
     with patch("app.service.db_inv.get_good_from_db") as mock_get_good_from_db:
         mock_get_good_from_db.return_value = good_data_with_id
 
-        result = get_good(good_id)
+        result = await get_good(good_id)
         assert result == good_data_with_id
         mock_get_good_from_db.assert_called_once_with(good_id)
 
 
-def test_get_good_not_found():
+@pytest.mark.asyncio
+async def test_get_good_not_found():
     good_id = 1
 
     with patch("app.service.db_inv.get_good_from_db") as mock_get_good_from_db:
         mock_get_good_from_db.return_value = None
 
         with pytest.raises(ValueError, match="Good not found"):
-            get_good(good_id)
+            await get_good(good_id)
         mock_get_good_from_db.assert_called_once_with(good_id)
 
 
-def test_deduct_good_success():
+@pytest.mark.asyncio
+async def test_get_availability():
+    row = {"id": 1, "count": 4, "price": 9.5, "version": 2, "price_version": 1}
+    with patch("app.service.db_inv.get_availability_from_db", return_value=[row]):
+        assert await get_availability(1) == {
+            "count": 4,
+            "price": 9.5,
+            "version": 2,
+            "price_version": 1,
+        }
+
+    with patch("app.service.db_inv.get_availability_from_db", return_value=[]):
+        with pytest.raises(ValueError, match="Good not found"):
+            await get_availability(1)
+
+
+@pytest.mark.asyncio
+async def test_get_availability_batch_keeps_request_order():
+    rows = [
+        {"id": 1, "count": 4, "price": 9.5, "version": 2},
+        {"id": 3, "count": 0, "price": 1.0, "version": 7},
+    ]
+    with patch(
+        "app.service.db_inv.get_availability_from_db", return_value=rows
+    ) as mock_get:
+        result = await get_availability_batch([3, 2, 1, 3])
+        mock_get.assert_called_once_with([3, 2, 1])
+    assert [good["id"] for good in result["goods"]] == [3, 1]
+    assert result["missing"] == [2]
+
+
+@pytest.mark.asyncio
+async def test_get_availability_batch_rejects_too_many_ids(monkeypatch):
+    monkeypatch.setattr(service, "AVAILABILITY_MAX_IDS", 2)
+    with patch("app.service.db_inv.get_availability_from_db") as mock_get:
+        with pytest.raises(ValueError, match="At most 2 goods"):
+            await get_availability_batch([1, 2, 3])
+        mock_get.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_deduct_stock_batch_updates_stats(monkeypatch):
+    stats = MagicMock()
+    monkeypatch.setattr(service, "inventory_stats", stats)
+    outcomes = [
+        {"id": 1, "status": "applied", "count": 3},
+        {"id": 2, "status": "applied", "count": 0},
+    ]
+    items = [StockDeduction(id=1, quantity=2), StockDeduction(id=2)]
+    with patch(
+        "app.service.db_inv.deduct_stock_batch_in_db", return_value=outcomes
+    ) as mock_deduct:
+        assert await deduct_stock_batch(items) == {"results": outcomes}
+        mock_deduct.assert_awaited_once_with(
+            [{"id": 1, "quantity": 2}, {"id": 2, "quantity": 1}]
+        )
+    stats.set_count.assert_any_call(1, 3)
+    stats.set_count.assert_any_call(2, 0)
+
+
+@pytest.mark.asyncio
+async def test_deduct_stock_batch_refused_names_failing_goods(monkeypatch):
+    stats = MagicMock()
+    monkeypatch.setattr(service, "inventory_stats", stats)
+    outcomes = [
+        {"id": 1, "status": "not_applied", "count": 5},
+        {"id": 2, "status": "insufficient_stock", "count": 0},
+        {"id": 3, "status": "not_found", "count": None},
+    ]
+    items = [StockDeduction(id=good_id) for good_id in (1, 2, 3)]
+    with patch("app.service.db_inv.deduct_stock_batch_in_db", return_value=outcomes):
+        with pytest.raises(
+            ValueError, match=r"not found: \[3\]; insufficient stock: \[2\]"
+        ):
+            await deduct_stock_batch(items)
+    stats.set_count.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_stock_batch_rejects_repeated_goods():
+    items = [StockDeduction(id=1), StockDeduction(id=1)]
+    with patch("app.service.db_inv.deduct_stock_batch_in_db") as mock_deduct:
+        with pytest.raises(ValueError, match="repeated: \\[1\\]"):
+            await deduct_stock_batch(items)
+        mock_deduct.assert_not_called()
+    with pytest.raises(ValueError, match="No items provided"):
+        await restock_batch([])
+
+
+@pytest.mark.asyncio
+async def test_restock_batch():
+    outcomes = [{"id": 1, "status": "applied", "count": 7}]
+    with patch(
+        "app.service.db_inv.restock_batch_in_db", return_value=outcomes
+    ) as mock_restock:
+        assert await restock_batch([StockDeduction(id=1, quantity=2)]) == {
+            "results": outcomes
+        }
+        mock_restock.assert_awaited_once_with([{"id": 1, "quantity": 2}])
+
+
+@pytest.mark.asyncio
+async def test_deduct_good_success():
     good_id = 1
 
     with patch("app.service.db_inv.deduct_good_from_db") as mock_deduct_good_from_db:
         mock_deduct_good_from_db.return_value = None
 
-        result = deduct_good(good_id)
+        result = await deduct_good(good_id)
         assert result == {"message": "Stock deducted successfully"}
-        mock_deduct_good_from_db.assert_called_once_with(good_id)
+        mock_deduct_good_from_db.assert_called_once_with(good_id, None)
+
+
+@pytest.mark.asyncio
+async def test_deduct_good_through_combiner(monkeypatch):
+    combiner = MagicMock(deduct=AsyncMock())
+    monkeypatch.setattr(service, "deduction_combiner", combiner)
+    with patch("app.service.db_inv.deduct_good_from_db") as mock_deduct_good_from_db:
+        assert await deduct_good(1) == {"message": "Stock deducted successfully"}
+        mock_deduct_good_from_db.assert_not_called()
+    combiner.deduct.assert_awaited_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_deduct_good_at_price_version_skips_combiner(monkeypatch):
+    combiner = MagicMock(deduct=AsyncMock())
+    monkeypatch.setattr(service, "deduction_combiner", combiner)
+    with patch("app.service.db_inv.deduct_good_from_db") as mock_deduct_good_from_db:
+        assert await deduct_good(1, price_version=4) == {
+            "message": "Stock deducted successfully"
+        }
+        mock_deduct_good_from_db.assert_called_once_with(1, 4)
+    combiner.deduct.assert_not_called()
 
 
-def test_deduct_good_insufficient_stock():
+@pytest.mark.asyncio
+async def test_deduct_good_insufficient_stock():
     good_id = 1
 
     with patch("app.service.db_inv.deduct_good_from_db") as mock_deduct_good_from_db:
         mock_deduct_good_from_db.side_effect = ValueError("Insufficient stock")
 
         with pytest.raises(ValueError, match="Insufficient stock"):
-            deduct_good(good_id)
-        mock_deduct_good_from_db.assert_called_once_with(good_id)
+            await deduct_good(good_id)
+        mock_deduct_good_from_db.assert_called_once_with(good_id, None)
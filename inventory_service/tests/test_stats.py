@@ -0,0 +1,78 @@
+import pytest
+from app.stats import InventoryStats
+
+
+@pytest.fixture
+def stats():
+    stats = InventoryStats(low_stock_threshold=5)
+    stats.begin_build()
+    stats.add_page(
+        [
+            {"id": 1, "category": "electronics", "count": 10, "price": 2.5},
+            {"id": 2, "category": "electronics", "count": 2, "price": 100.0},
+            {"id": 3, "category": "food", "count": 40, "price": 0.1},
+        ]
+    )
+    stats.finish_build()
+    return stats
+
+
+def test_snapshot_totals(stats):
+    snapshot = stats.snapshot()
+    assert stats.ready
+    assert snapshot["goods"] == 3
+    assert snapshot["units"] == 52
+    assert snapshot["stock_value"] == 229.0
+    assert snapshot["categories"]["electronics"] == {
+        "goods": 2,
+        "units": 12,
+        "stock_value": 225.0,
+    }
+    assert snapshot["low_stock"] == [{"id": 2, "count": 2}]
+
+
+def test_incremental_changes(stats):
+    stats.adjust_count(1, -6)
+    stats.set_count(2, 8)
+    stats.add({"id": 3, "category": "clothes", "price": 0.2})
+    stats.add({"id": 4, "category": "food", "count": 0, "price": 3.0})
+
+    snapshot = stats.snapshot()
+    assert snapshot["categories"] == {
+        "clothes": {"goods": 1, "units": 40, "stock_value": 8.0},
+        "electronics": {"goods": 2, "units": 12, "stock_value": 810.0},
+        "food": {"goods": 1, "units": 0, "stock_value": 0.0},
+    }
+    assert snapshot["low_stock"] == [{"id": 1, "count": 4}, {"id": 4, "count": 0}]
+
+
+def test_sharded_rows_keep_known_total(stats):
+    # Sharding moves the stock out of inventory.count
+    stats.add({"id": 1, "category": "electronics", "count": 0, "shards": 4})
+    assert stats.snapshot()["categories"]["electronics"]["units"] == 12
+
+    stats.add({"id": 9, "category": "food", "count": 0, "shards": 4, "price": 1.0})
+    assert len(stats) == 3
+
+
+def test_rebuild_keeps_changes_made_meanwhile(stats):
+    stats.begin_build()
+    with pytest.raises(RuntimeError, match="already being rebuilt"):
+        stats.begin_build()
+    stats.add_page([{"id": 1, "category": "electronics", "count": 10, "price": 2.5}])
+    stats.adjust_count(1, -9)
+    # The previous totals stay readable until the rebuild completes
+    assert stats.snapshot()["goods"] == 3
+    stats.finish_build()
+
+    snapshot = stats.snapshot()
+    assert snapshot["goods"] == 1
+    assert snapshot["low_stock"] == [{"id": 1, "count": 1}]
+
+
+def test_abort_build(stats):
+    stats.begin_build()
+    stats.add_page([{"id": 7, "category": "food", "count": 1, "price": 1.0}])
+    stats.abort_build()
+    assert stats.snapshot()["goods"] == 3
+    assert not stats.building
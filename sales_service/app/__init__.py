@@ -0,0 +1,4 @@
+from dotenv import load_dotenv
+
+# Loaded before any app module is imported, as they read their settings on import
+load_dotenv()
@@ -0,0 +1,433 @@
+import asyncio
+import os
+import random
+import time
+from typing import Optional, Sequence, Union
+
+import httpx
+from app.resilience import CircuitBreaker, RetryBudget, remaining
+from loguru import logger
+
+# Connection pool of each downstream client
+HTTP_MAX_CONNECTIONS: int = int(os.getenv("SALES_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(
+    os.getenv("SALES_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+)
+# Seconds an idle pooled connection is kept open for reuse
+HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("SALES_HTTP_KEEPALIVE_EXPIRY", "30"))
+# Negotiate HTTP/2 where the downstream supports it (over TLS, via ALPN)
+HTTP2: bool = os.getenv("SALES_HTTP2", "true").lower() in ("1", "true", "yes")
+# Seconds a single downstream call may take, capped by the caller's deadline
+HTTP_TIMEOUT: float = float(os.getenv("SALES_HTTP_TIMEOUT", "2"))
+# Retries of a failed idempotent call, and the jittered backoff between them
+RETRY_ATTEMPTS: int = int(os.getenv("SALES_RETRY_ATTEMPTS", "2"))
+RETRY_BACKOFF: float = float(os.getenv("SALES_RETRY_BACKOFF", "0.05"))
+RETRY_BACKOFF_MAX: float = float(os.getenv("SALES_RETRY_BACKOFF_MAX", "1"))
+# Consecutive failures (connection errors or 5xx) after which a replica is ejected
+EJECT_AFTER_FAILURES: int = int(os.getenv("SALES_EJECT_AFTER_FAILURES", "3"))
+# Seconds an ejected replica receives no requests (unless every replica is ejected)
+EJECT_SECONDS: float = float(os.getenv("SALES_EJECT_SECONDS", "10"))
+
+
+# Methods that are safe to send twice
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Responses worth retrying on another replica
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+
+def parse_urls(urls: Union[str, Sequence[str]]) -> list[str]:
+    """
+    Normalizes a comma-separated string or list of base URLs.
+
+    :param urls: The URLs, e.g. ``"http://inventory-1:8003,http://inventory-2:8003"``.
+    :type urls: Union[str, Sequence[str]]
+    :return: The non-empty URLs without trailing slashes.
+    :rtype: list[str]
+    """
+
+    if isinstance(urls, str):
+        urls = urls.split(",")
+    return [url.strip().rstrip("/") for url in urls if url.strip()]
+
+
+class Replica:
+    """
+    One instance of a downstream service, with its load and health.
+
+    :param base_url: The URL that request paths are relative to.
+    :type base_url: str
+
+    :ivar outstanding: The requests currently in flight.
+    :vartype outstanding: int
+    :ivar failures: The consecutive failed requests.
+    :vartype failures: int
+    :ivar ejected_until: The ``time.monotonic()`` until which it is ejected.
+    :vartype ejected_until: float
+    """
+
+    __slots__ = (
+        "base_url",
+        "outstanding",
+        "failures",
+        "ejected_until",
+        "requests",
+        "errors",
+        "ejections",
+        "latency_total",
+    )
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.outstanding: int = 0
+        self.failures: int = 0
+        self.ejected_until: float = 0.0
+        self.requests: int = 0
+        self.errors: int = 0
+        self.ejections: int = 0
+        self.latency_total: float = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def record(self, latency: float, failed: bool, eject_after: int, eject_for: float):
+        self.requests += 1
+        self.latency_total += latency
+        if not failed:
+            self.failures = 0
+            return
+        self.errors += 1
+        self.failures += 1
+        if self.failures >= eject_after:
+            self.failures = 0
+            self.ejections += 1
+            self.ejected_until = time.monotonic() + eject_for
+            logger.warning(f"Ejecting {self.base_url} for {eject_for:g}s")
+
+    def metrics(self) -> dict:
+        return {
+            "url": self.base_url,
+            "healthy": self.healthy(time.monotonic()),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "mean_latency_ms": (
+                round(self.latency_total / self.requests * 1000, 3)
+                if self.requests
+                else None
+            ),
+        }
+
+
+class ServiceClient:
+    """
+    A long-lived, pooled HTTP client to the replicas of one downstream service.
+
+    Connections are kept alive between requests, so a purchase pays the TCP
+    (and TLS) handshake once per pooled connection instead of once per call.
+    The client is opened and closed with the application lifespan.
+
+    Each request goes to the healthy replica with the fewest requests in
+    flight (ties are broken at random). A replica that fails
+    ``eject_after`` requests in a row, by a connection error or a 5xx
+    response, is ejected for ``eject_for`` seconds; if every replica is
+    ejected, the one due back soonest is used.
+
+    Each call is bounded by ``timeout``, shortened to the deadline in force
+    (see ``app.resilience.deadline``). Idempotent calls that fail by a
+    connection error, a timeout or a 502/503/504 are retried on another
+    replica after a jittered exponential backoff, while the retry budget
+    allows; other calls are only retried if the connection could not be
+    made, since the request was then never sent. A circuit breaker per service
+    fails calls fast while the service keeps failing.
+
+    :param name: The service name, used in errors.
+    :type name: str
+    :param base_urls: The base URL of each replica, as a list or a
+        comma-separated string; request paths are relative to it.
+    :type base_urls: Union[str, Sequence[str]]
+    :param limits: The connection pool limits; from the ``SALES_HTTP_*``
+        settings if omitted.
+    :type limits: Optional[httpx.Limits]
+    :param http2: Whether to negotiate HTTP/2.
+    :type http2: bool
+    :param transport: A transport to send requests through instead of the
+        network, e.g. ``httpx.MockTransport`` in tests.
+    :type transport: Optional[httpx.AsyncBaseTransport]
+    :param eject_after: The consecutive failures that eject a replica.
+    :type eject_after: int
+    :param eject_for: The seconds an ejected replica is skipped.
+    :type eject_for: float
+    :param timeout: The seconds a single call may take.
+    :type timeout: float
+    :param retries: The most retries of one call.
+    :type retries: int
+    :param breaker: The service's circuit breaker; from the ``SALES_BREAKER_*``
+        settings if omitted.
+    :type breaker: Optional[CircuitBreaker]
+    :param budget: The service's retry budget; from the ``SALES_RETRY_BUDGET_*``
+        settings if omitted.
+    :type budget: Optional[RetryBudget]
+    :raises ValueError: If no base URL is given.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_urls: Union[str, Sequence[str]],
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = HTTP2,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        eject_after: int = EJECT_AFTER_FAILURES,
+        eject_for: float = EJECT_SECONDS,
+        timeout: float = HTTP_TIMEOUT,
+        retries: int = RETRY_ATTEMPTS,
+        breaker: Optional[CircuitBreaker] = None,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.name = name
+        self.replicas = [Replica(url) for url in parse_urls(base_urls)]
+        if not self.replicas:
+            raise ValueError(f"No {name} service URL configured")
+        self.limits = limits or httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        self.http2 = http2
+        self.transport = transport
+        self.eject_after = eject_after
+        self.eject_for = eject_for
+        self.timeout = timeout
+        self.retries = retries
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+        self.retried: int = 0
+        self.retries_denied: int = 0
+        self.timeouts: int = 0
+        self.deadlines_exceeded: int = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        The open client.
+
+        :raises RuntimeError: If the client has not been opened.
+        """
+
+        if self._client is None:
+            raise RuntimeError(f"{self.name} service client is not open")
+        return self._client
+
+    async def open(self):
+        """
+        Creates the pooled client; does nothing if it is already open.
+        """
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self.transport,
+            )
+
+    async def close(self):
+        """
+        Closes the pooled client and its connections.
+        """
+
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    def pick(self, tried: Sequence[Replica] = ()) -> Replica:
+        """
+        Chooses the replica for the next request.
+
+        :param tried: Replicas this call already failed on; avoided if possible.
+        :type tried: Sequence[Replica]
+        :return: The healthy replica with the fewest requests in flight, or the
+            replica due back soonest if all are ejected.
+        :rtype: Replica
+        """
+
+        if len(self.replicas) == 1:
+            return self.replicas[0]
+        now = time.monotonic()
+        healthy = [replica for replica in self.replicas if replica.healthy(now)]
+        if not healthy:
+            return min(self.replicas, key=lambda replica: replica.ejected_until)
+        untried = [replica for replica in healthy if replica not in tried]
+        candidates = untried or healthy
+        fewest = min(replica.outstanding for replica in candidates)
+        return random.choice(
+            [replica for replica in candidates if replica.outstanding == fewest]
+        )
+
+    async def _send(
+        self, replica: Replica, method: str, path: str, timeout: float, **kwargs
+    ) -> httpx.Response:
+        replica.outstanding += 1
+        started = time.perf_counter()
+        # Stays None if the caller cancels, which says nothing about the replica
+        failed: Optional[bool] = None
+        try:
+            response = await self.client.request(
+                method, replica.base_url + path, timeout=timeout, **kwargs
+            )
+            failed = response.status_code >= 500
+            return response
+        except Exception:
+            failed = True
+            raise
+        finally:
+            replica.outstanding -= 1
+            if failed is not None:
+                replica.record(
+                    time.perf_counter() - started,
+                    failed,
+                    self.eject_after,
+                    self.eject_for,
+                )
+
+    async def request(
+        self, method: str, path: str, idempotent: Optional[bool] = None, **kwargs
+    ) -> httpx.Response:
+        """
+        Sends a request, retrying and failing fast as the service's health allows.
+
+        :param method: The HTTP method.
+        :type method: str
+        :param path: The path relative to the replica's base URL.
+        :type path: str
+        :param idempotent: Whether the call may be sent twice; by default, true
+            for GET, HEAD and OPTIONS.
+        :type idempotent: Optional[bool]
+        :return: The response; a 5xx response is returned once retries are spent.
+        :rtype: httpx.Response
+        :raises RuntimeError: If the circuit is open, the deadline has passed, or
+            the service could not be reached or timed out.
+        """
+
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        if not self.breaker.allow():
+            raise RuntimeError(f"{self.name} service circuit is open")
+        self.budget.deposit()
+        tried: list[Replica] = []
+        recorded = False
+        try:
+            while True:
+                left = remaining()
+                if left is not None and left <= 0:
+                    self.deadlines_exceeded += 1
+                    raise RuntimeError(f"Deadline exceeded calling {self.name} service")
+                timeout = self.timeout if left is None else min(self.timeout, left)
+                replica = self.pick(tried)
+                tried.append(replica)
+                error: Optional[httpx.TransportError] = None
+                response: Optional[httpx.Response] = None
+                try:
+                    response = await self._send(
+                        replica, method, path, timeout, **kwargs
+                    )
+                except httpx.TransportError as e:
+                    error = e
+                    if isinstance(e, httpx.TimeoutException):
+                        self.timeouts += 1
+                if response is not None and response.status_code not in RETRY_STATUSES:
+                    recorded = True
+                    self.breaker.record(response.status_code >= 500)
+                    return response
+
+                if self._may_retry(idempotent, error, len(tried)):
+                    backoff = random.uniform(
+                        0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** (len(tried) - 1))
+                    )
+                    left = remaining()
+                    if left is None or backoff < left:
+                        self.retried += 1
+                        await asyncio.sleep(backoff)
+                        continue
+
+                recorded = True
+                self.breaker.record(True)
+                if response is not None:
+                    return response
+                raise RuntimeError(
+                    f"{self.name} service unavailable: {error!r}"
+                ) from error
+        finally:
+            if not recorded:
+                self.breaker.release()
+
+    def _may_retry(
+        self, idempotent: bool, error: Optional[httpx.TransportError], attempts: int
+    ) -> bool:
+        # A request whose connection failed was never sent
+        if not (idempotent or isinstance(error, httpx.ConnectError)):
+            return False
+        if attempts > self.retries:
+            return False
+        if not self.budget.withdraw():
+            self.retries_denied += 1
+            return False
+        return True
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        """
+        Sends a GET request.
+
+        :param path: The path relative to the replica's base URL.
+        :type path: str
+        :return: The response.
+        :rtype: httpx.Response
+        """
+
+        return await self.request("GET", path, **kwargs)
+
+    async def put(self, path: str, **kwargs) -> httpx.Response:
+        """
+        Sends a PUT request.
+
+        :param path: The path relative to the replica's base URL.
+        :type path: str
+        :return: The response.
+        :rtype: httpx.Response
+        """
+
+        return await self.request("PUT", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        """
+        Sends a POST request.
+
+        :param path: The path relative to the replica's base URL.
+        :type path: str
+        :return: The response.
+        :rtype: httpx.Response
+        """
+
+        return await self.request("POST", path, **kwargs)
+
+    def metrics(self) -> dict:
+        """
+        Reports the circuit, retries, timeouts, and the load, health, request
+        and error counts, and mean latency of each replica.
+
+        :return: ``circuit``, ``retries``, ``retries_denied``, ``retry_tokens``,
+            ``timeouts``, ``deadlines_exceeded`` and ``replicas``.
+        :rtype: dict
+        """
+
+        return {
+            "circuit": self.breaker.metrics(),
+            "retries": self.retried,
+            "retries_denied": self.retries_denied,
+            "retry_tokens": round(self.budget.tokens, 2),
+            "timeouts": self.timeouts,
+            "deadlines_exceeded": self.deadlines_exceeded,
+            "replicas": [replica.metrics() for replica in self.replicas],
+        }
@@ -1,11 +1,14 @@
 import os
-from typing import List
+from typing import AsyncIterator, List, Optional
 
 from app.models import Purchase
 from dotenv import load_dotenv
 from loguru import logger
 from postgrest import SyncRequestBuilder, SyncSelectRequestBuilder
-from supabase import Client, create_client
+from supabase import AsyncClient, Client, acreate_client, create_client
+
+# The columns returned for a purchase
+PURCHASE_COLUMNS = "id,good_id,customer_id,amount_deducted,time"
 
 
 class SalesTable:
@@ -79,3 +82,205 @@ class SalesTable:
         except Exception as e:
             logger.exception(e)
             raise  # Re-raise the exception
+
+
+class AsyncSalesTable:
+    """
+    Manages the sales (purchases) table without blocking the event loop.
+
+    Construction only records the connection settings; the Supabase client is
+    created by ``connect`` (from the application's lifespan handler) and released
+    by ``close``.
+
+    :param url: The Supabase database URL.
+    :type url: str
+    :param key: The Supabase API key.
+    :type key: str
+    """
+
+    def __init__(self, url: str, key: str):
+        """
+        Initializes the AsyncSalesTable without connecting.
+
+        :param url: The Supabase database URL.
+        :type url: str
+        :param key: The Supabase API key.
+        :type key: str
+        """
+
+        self.url = url
+        self.key = key
+        self._client: Optional[AsyncClient] = None
+
+    @property
+    def client(self) -> AsyncClient:
+        """
+        The connected Supabase client.
+
+        :raises RuntimeError: If ``connect`` has not been awaited.
+        """
+
+        if self._client is None:
+            raise RuntimeError("Sales database is not connected")
+        return self._client
+
+    async def connect(self):
+        """
+        Creates the Supabase client; a no-op if already connected.
+        """
+
+        if self._client is None:
+            self._client = await acreate_client(self.url, self.key)
+
+    async def close(self):
+        """
+        Closes the client's HTTP connection pool.
+        """
+
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.postgrest.aclose()
+
+    async def record_purchase(self, purchase: Purchase):
+        """
+        Records a new purchase in the database.
+
+        :param purchase: The `Purchase` object containing purchase details.
+        :type purchase: Purchase
+        :return: The response data from the database after the record is inserted.
+        :rtype: dict
+        :raises Exception: If the purchase could not be recorded in the database.
+        """
+
+        logger.info(f"Adding {purchase.model_dump()}")
+        response = (
+            await self.client.table("purchases")
+            .insert(purchase.model_dump(exclude={"time"}))
+            .execute()
+        )
+        if not response.data:
+            raise Exception("Failed to record purchase")
+        return response.data
+
+    async def record_purchases(self, purchases: List[Purchase]) -> List[dict]:
+        """
+        Records several purchases with one multi-row insert.
+
+        :param purchases: The purchases to record.
+        :type purchases: List[Purchase]
+        :return: The inserted rows.
+        :rtype: List[dict]
+        :raises Exception: If the purchases could not be recorded.
+        """
+
+        response = (
+            await self.client.table("purchases")
+            .insert([purchase.model_dump(exclude={"time"}) for purchase in purchases])
+            .execute()
+        )
+        if len(response.data or []) != len(purchases):
+            raise Exception("Failed to record purchases")
+        return response.data
+
+    async def record_journaled(self, entries: List[dict]) -> List[dict]:
+        """
+        Inserts journaled purchases, skipping any already inserted.
+
+        Entries are matched on their unique ``journal_id``
+        (``sql/002_purchase_journal_id.sql``), so a batch replayed after a crash
+        is not recorded twice.
+
+        :param entries: The journal entries: purchases with ``journal_id`` and ``time``.
+        :type entries: List[dict]
+        :return: The rows inserted by this call.
+        :rtype: List[dict]
+        :raises Exception: If the insert fails.
+        """
+
+        response = (
+            await self.client.table("purchases")
+            .upsert(entries, on_conflict="journal_id", ignore_duplicates=True)
+            .execute()
+        )
+        return response.data or []
+
+    async def get_purchases(
+        self,
+        customer_id: Optional[str] = None,
+        good_id: Optional[int] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        before: Optional[tuple[str, int]] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Retrieves purchase records, newest first.
+
+        Pages are fetched with keyset pagination on ``(time, id)``: ``before``
+        is the last purchase of the previous page, so each page costs one index
+        range scan (see ``sql/001_purchase_indexes.sql``) however deep it is.
+
+        :param customer_id: Only purchases by this customer. Optional.
+        :type customer_id: Optional[str]
+        :param good_id: Only purchases of this good. Optional.
+        :type good_id: Optional[int]
+        :param since: Only purchases made at or after this ISO 8601 time. Optional.
+        :type since: Optional[str]
+        :param until: Only purchases made before this ISO 8601 time. Optional.
+        :type until: Optional[str]
+        :param before: The ``(time, id)`` of the purchase to continue after. Optional.
+        :type before: Optional[tuple[str, int]]
+        :param limit: The maximum number of purchases; all if omitted.
+        :type limit: Optional[int]
+        :return: A list of purchase records, or an empty list if no records are found.
+        :rtype: List[dict]
+        :raises Exception: If the database query fails.
+        """
+
+        request = self.client.table("purchases").select(PURCHASE_COLUMNS)
+        if customer_id is not None:
+            request = request.eq("customer_id", customer_id)
+        if good_id is not None:
+            request = request.eq("good_id", good_id)
+        if since is not None:
+            request = request.gte("time", since)
+        if until is not None:
+            request = request.lt("time", until)
+        if before is not None:
+            time, purchase_id = before
+            request = request.or_(
+                f'time.lt."{time}",and(time.eq."{time}",id.lt.{purchase_id})'
+            )
+        request = request.order("time", desc=True).order("id", desc=True)
+        if limit is not None:
+            request = request.limit(limit)
+        response = await request.execute()
+        return response.data or []
+
+    async def iter_purchases(self, page_size: int = 5000) -> AsyncIterator[list[dict]]:
+        """
+        Reads the whole purchases table in keyset-paginated pages, ordered by ID.
+
+        :param page_size: The number of rows per page.
+        :type page_size: int
+        :return: An async iterator over pages of purchase rows.
+        :rtype: AsyncIterator[list[dict]]
+        """
+
+        last_id = 0
+        while True:
+            response = (
+                await self.client.table("purchases")
+                .select(PURCHASE_COLUMNS)
+                .gt("id", last_id)
+                .order("id")
+                .limit(page_size)
+                .execute()
+            )
+            page = response.data or []
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_id = page[-1]["id"]
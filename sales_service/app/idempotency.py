@@ -0,0 +1,131 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+# Most recent idempotency keys remembered; the least recently used are dropped
+IDEMPOTENCY_MAX_KEYS: int = int(os.getenv("SALES_IDEMPOTENCY_MAX_KEYS", "10000"))
+# Seconds a key's response is replayed for
+IDEMPOTENCY_TTL: float = float(os.getenv("SALES_IDEMPOTENCY_TTL", "86400"))
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "outcome", "expires_at")
+
+    def __init__(self, fingerprint: Hashable, outcome: asyncio.Future, expires_at):
+        self.fingerprint = fingerprint
+        self.outcome = outcome
+        self.expires_at = expires_at
+
+
+class IdempotencyStore:
+    """
+    A bounded, in-memory record of recent idempotency keys and their outcomes.
+
+    The first request with a key runs; a retry with the same key gets the
+    stored result (or the stored ``ValueError``) back without calling any
+    downstream service. A retry that arrives while the first request is still
+    running waits for it instead of running again. Operations must therefore
+    raise ``ValueError`` only for deterministic refusals; other errors, such as
+    the ``RuntimeError`` of a failed or unavailable downstream service, are not
+    stored, so the request can be retried once the fault clears.
+
+    Keys are kept for ``ttl`` seconds, and at most ``max_keys`` of them, the
+    least recently used being dropped first.
+
+    :param max_keys: The number of keys to remember.
+    :type max_keys: int
+    :param ttl: The seconds a key is remembered for.
+    :type ttl: float
+    """
+
+    def __init__(
+        self, max_keys: int = IDEMPOTENCY_MAX_KEYS, ttl: float = IDEMPOTENCY_TTL
+    ):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        """
+        Forgets every key.
+        """
+
+        self._entries.clear()
+
+    def _lookup(self, key: Hashable) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    async def run(
+        self,
+        key: Hashable,
+        fingerprint: Hashable,
+        operation: Callable[[], Awaitable[Any]],
+    ) -> tuple[Any, bool]:
+        """
+        Runs an operation once per key, replaying its outcome for repeats.
+
+        :param key: The idempotency key, scoped by the caller (e.g. per customer).
+        :type key: Hashable
+        :param fingerprint: What the request asked for; a key may not be reused
+            for a different request.
+        :type fingerprint: Hashable
+        :param operation: Performs the request.
+        :type operation: Callable[[], Awaitable[Any]]
+        :return: The result, and whether it was replayed from the store.
+        :rtype: tuple[Any, bool]
+        :raises ValueError: If the key was used for a different request, or the
+            (stored) operation failed with a ``ValueError``.
+        """
+
+        entry = self._lookup(key)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise ValueError(
+                    "Idempotency-Key was already used for a different request"
+                )
+            self._entries.move_to_end(key)
+            result, error = await asyncio.shield(entry.outcome)
+            if error is not None:
+                raise error
+            return result, True
+
+        outcome = asyncio.get_running_loop().create_future()
+        entry = self._entries[key] = _Entry(
+            fingerprint, outcome, time.monotonic() + self.ttl
+        )
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+        try:
+            result = await operation()
+        except ValueError as e:
+            # The request was refused; a retry would be refused the same way
+            outcome.set_result((None, e))
+            raise
+        except Exception as e:
+            self._forget(key, entry)
+            outcome.set_result((None, e))
+            raise
+        else:
+            outcome.set_result((result, None))
+        finally:
+            if not outcome.done():
+                # Cancelled; let waiting retries (and later ones) run it again
+                self._forget(key, entry)
+                outcome.set_result(
+                    (None, RuntimeError("The original request was interrupted"))
+                )
+        return result, False
+
+    def _forget(self, key: Hashable, entry: _Entry):
+        if self._entries.get(key) is entry:
+            del self._entries[key]
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Union
+
+from app.models import Purchase
+from loguru import logger
+
+# Local journal file of the write-behind mode; purchases are inserted directly if unset
+PURCHASE_JOURNAL_PATH: str = os.getenv("SALES_PURCHASE_JOURNAL", "")
+# The most journaled purchases written to the database in one insert
+JOURNAL_BATCH_SIZE: int = int(os.getenv("SALES_JOURNAL_BATCH_SIZE", "500"))
+# Seconds between flushes of the journal to the database
+JOURNAL_FLUSH_INTERVAL: float = float(os.getenv("SALES_JOURNAL_FLUSH_INTERVAL", "0.2"))
+
+
+class PurchaseJournal:
+    """
+    A durable write-behind buffer in front of the purchases table.
+
+    ``append`` writes purchases to an append-only local file as JSON lines and
+    fsyncs it before returning, so a recorded purchase survives a crash; a
+    background task then inserts the journaled purchases into the database in
+    multi-row batches. Appends that arrive while an fsync is in progress are
+    written together by the next one (group commit).
+
+    Each entry carries a ``journal_id``, unique in the purchases table
+    (``sql/002_purchase_journal_id.sql``), and its purchase time. On ``open``
+    the entries left in the file are flushed again; entries that reached the
+    database before the crash are skipped by the insert. The file is truncated
+    whenever every entry in it has been flushed.
+
+    :param path: The journal file; created if missing.
+    :type path: Union[str, Path]
+    :param flush: Inserts a batch of entries, skipping known ``journal_id`` values,
+        and returns the rows it inserted.
+    :type flush: Callable[[list[dict]], Awaitable[list[dict]]]
+    :param batch_size: The most entries inserted at once.
+    :type batch_size: int
+    :param flush_interval: The seconds between flushes.
+    :type flush_interval: float
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        flush: Callable[[list[dict]], Awaitable[list[dict]]],
+        batch_size: int = JOURNAL_BATCH_SIZE,
+        flush_interval: float = JOURNAL_FLUSH_INTERVAL,
+    ):
+        self.path = Path(path)
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._fd: Optional[int] = None
+        self._unflushed: list[dict] = []
+        self._pending: list[tuple[bytes, list[dict], asyncio.Future]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._file_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._unflushed)
+
+    async def open(self) -> int:
+        """
+        Opens the journal, recovers the entries it holds, and starts flushing.
+
+        :return: The number of entries recovered from a previous run.
+        :rtype: int
+        """
+
+        created = not self.path.exists()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        if created:
+            # Make the new file's directory entry durable too
+            directory = os.open(self.path.parent, os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        self._unflushed = self._recover()
+        if self._unflushed:
+            logger.warning(f"Recovered {len(self._unflushed)} journaled purchases")
+        self._flusher = asyncio.create_task(self._flush_periodically())
+        return len(self._unflushed)
+
+    def _recover(self) -> list[dict]:
+        entries = []
+        with open(self.path, "rb") as journal:
+            for line in journal:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A torn final write from a crash; its append never returned
+                    logger.warning(f"Skipping an incomplete journal line: {line!r}")
+        return entries
+
+    async def close(self):
+        """
+        Stops the background flushing, flushes what it can, and closes the file.
+
+        Entries that cannot be flushed stay in the file for the next ``open``.
+        """
+
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._writer is not None:
+            await asyncio.shield(self._writer)
+        try:
+            await self.flush_all()
+        except Exception as e:
+            logger.exception(e)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    async def append(self, purchases: list[Purchase]) -> list[dict]:
+        """
+        Durably records purchases, to be inserted into the database shortly.
+
+        :param purchases: The purchases.
+        :type purchases: list[Purchase]
+        :return: The journal entries: the purchases with ``journal_id`` and
+            ``time`` set.
+        :rtype: list[dict]
+        :raises RuntimeError: If the journal is not open.
+        :raises OSError: If the entries could not be written.
+        """
+
+        if self._fd is None:
+            raise RuntimeError("Purchase journal is not open")
+        time = datetime.now(timezone.utc).isoformat()
+        entries = [
+            {**purchase.model_dump(), "journal_id": str(uuid.uuid4()), "time": time}
+            for purchase in purchases
+        ]
+        data = b"".join(
+            json.dumps(entry, separators=(",", ":")).encode() + b"\n"
+            for entry in entries
+        )
+        written = asyncio.get_running_loop().create_future()
+        self._pending.append((data, entries, written))
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_pending())
+        await written
+        return entries
+
+    async def _write_pending(self):
+        try:
+            async with self._file_lock:
+                while self._pending:
+                    pending, self._pending = self._pending, []
+                    try:
+                        await asyncio.to_thread(
+                            self._write, b"".join(data for data, _, _ in pending)
+                        )
+                    except Exception as e:
+                        for _, _, written in pending:
+                            if not written.done():
+                                written.set_exception(e)
+                        continue
+                    for _, entries, written in pending:
+                        # Durable even if the caller has stopped waiting
+                        self._unflushed.extend(entries)
+                        if not written.done():
+                            written.set_result(None)
+                    if len(self._unflushed) >= self.batch_size:
+                        self._wake.set()
+        finally:
+            self._writer = None
+
+    def _write(self, data: bytes):
+        size = os.fstat(self._fd).st_size
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._fd, view) :]
+            os.fsync(self._fd)
+        except OSError:
+            # Drop a partial line so later appends start on a line of their own
+            os.ftruncate(self._fd, size)
+            raise
+
+    async def flush_all(self):
+        """
+        Inserts every journaled entry into the database, then empties the file.
+
+        :raises Exception: If an insert fails; the remaining entries are kept.
+        """
+
+        while self._unflushed:
+            batch = self._unflushed[: self.batch_size]
+            await self.flush(batch)
+            del self._unflushed[: len(batch)]
+        async with self._file_lock:
+            # Appends hold the lock until their entries are listed as unflushed
+            if not self._unflushed and self._fd is not None:
+                await asyncio.to_thread(self._truncate)
+
+    def _truncate(self):
+        os.ftruncate(self._fd, 0)
+        os.fsync(self._fd)
+
+    async def _flush_periodically(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self._unflushed:
+                continue
+            try:
+                await self.flush_all()
+            except Exception as e:
+                # Kept in the journal; retried on the next interval
+                logger.exception(e)
@@ -1,7 +1,98 @@
-from app.service import get_purchases, process_purchase
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Annotated, Any, Awaitable, Callable, Hashable, Optional
 
-app = FastAPI()
+from app.idempotency import IdempotencyStore
+from app.models import Cart, PurchaseQuery
+from app.rollups import Granularity
+from app.service import (
+    build_sales_rollups,
+    checkout,
+    close_clients,
+    close_database,
+    connect_database,
+    get_customer_totals,
+    get_purchases,
+    get_sales_rollups,
+    get_upstream_metrics,
+    open_clients,
+    process_purchase,
+)
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from loguru import logger
+
+# Responses of recent purchase requests, replayed to retries with the same key
+idempotency_store = IdempotencyStore()
+
+
+async def _warm_up():
+    try:
+        await build_sales_rollups()
+    except Exception as e:
+        logger.exception(e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens the database and the pooled downstream clients on startup, builds the
+    sales rollups in the background while serving requests, and closes the
+    clients on shutdown.
+    """
+
+    await connect_database()
+    await open_clients()
+    warm_up_task = asyncio.create_task(_warm_up())
+    try:
+        yield
+    finally:
+        warm_up_task.cancel()
+        await close_clients()
+        await close_database()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def run_idempotent(
+    customer_username: str,
+    idempotency_key: Optional[str],
+    fingerprint: Hashable,
+    response: Response,
+    operation: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    Runs a purchase once per ``Idempotency-Key``, replaying it for retries.
+
+    Keys are scoped to the customer. Replayed responses carry an
+    ``Idempotent-Replayed: true`` header.
+
+    :param customer_username: The customer making the request.
+    :type customer_username: str
+    :param idempotency_key: The ``Idempotency-Key`` header; without one the
+        operation simply runs.
+    :type idempotency_key: Optional[str]
+    :param fingerprint: What the request asks for.
+    :type fingerprint: Hashable
+    :param response: The response, to mark replays on.
+    :type response: Response
+    :param operation: Performs the purchase.
+    :type operation: Callable[[], Awaitable[Any]]
+    :return: The purchase's result.
+    :rtype: Any
+    :raises ValueError: If the purchase was refused, or the key was used for a
+        different request.
+    """
+
+    if idempotency_key is None:
+        return await operation()
+    result, replayed = await idempotency_store.run(
+        (customer_username, idempotency_key), fingerprint, operation
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
 
 @app.get("/health")
@@ -14,47 +105,228 @@ async def health_check():
     """
     try:
         # Perform a simple database operation to ensure connectivity
-        purchases = get_purchases()
+        page = await get_purchases()
         return {
             "status": "OK",
             "db_status": "connected",
-            "records_found": len(purchases),
+            "records_found": len(page["purchases"]),
         }
     except Exception as e:
         return {"status": "ERROR", "db_status": "disconnected", "error": str(e)}
 
 
+@app.get("/api/v1/sales/upstreams")
+async def get_upstream_metrics_endpoint():
+    """
+    Reports the circuit, retries and timeouts of the inventory and customer
+    services, and the load and health of each of their replicas.
+
+    :return: Per service: ``circuit`` state, ``retries``, ``retries_denied``,
+        ``retry_tokens``, ``timeouts``, ``deadlines_exceeded``, and per replica
+        ``url``, ``healthy``, ``outstanding`` requests, ``requests``, ``errors``,
+        ``ejections`` and ``mean_latency_ms``.
+    :rtype: dict
+    """
+
+    return get_upstream_metrics()
+
+
 @app.get("/api/v1/sales/get")
-async def fetch_all_purchases():
+async def fetch_all_purchases(query: Annotated[PurchaseQuery, Query()]):
     """
-    Fetches all purchase records from the database.
+    Fetches a page of purchase records, newest first.
+
+    For example, one good's purchases in December 2023:
+    ``?good_id=7&since=2023-12-01T00:00:00Z&until=2024-01-01T00:00:00Z``. Pass a
+    page's ``next_cursor`` as ``cursor`` to fetch the next page.
 
-    :return: A list of purchase records.
-    :rtype: List[dict]
+    :param query: The filters, page size and cursor.
+    :type query: PurchaseQuery
+    :return: ``purchases`` and ``next_cursor``.
+    :rtype: dict
+    :raises HTTPException: If the cursor is malformed (status code 400) or a general exception occurs (status code 500).
     """
     try:
-        return get_purchases()
+        return await get_purchases(query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@app.get("/api/v1/sales/customer/{username}")
+async def fetch_customer_purchases(
+    username: str, query: Annotated[PurchaseQuery, Query()]
+):
+    """
+    Fetches a page of one customer's purchase history, newest first.
+
+    :param username: The username of the customer.
+    :type username: str
+    :param query: The other filters, page size and cursor; ``customer_id`` is
+        replaced by ``username``.
+    :type query: PurchaseQuery
+    :return: ``purchases`` and ``next_cursor``.
+    :rtype: dict
+    :raises HTTPException: If the cursor is malformed (status code 400) or a general exception occurs (status code 500).
+    """
+    try:
+        return await get_purchases(query.model_copy(update={"customer_id": username}))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.post("/api/v1/sales/purchase/{customer_username}/{good_id}")
-async def purchase_good(customer_username: str, good_id: int):
+async def purchase_good(
+    customer_username: str,
+    good_id: int,
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255
+    ),
+):
     """
     Processes the purchase of a good by a customer.
 
+    A retry carrying the same ``Idempotency-Key`` header is answered with the
+    first attempt's response instead of buying again.
+
     :param customer_username: The username of the customer making the purchase.
     :type customer_username: str
     :param good_id: The ID of the good being purchased.
     :type good_id: int
+    :param response: The response, to mark replays on.
+    :type response: Response
+    :param idempotency_key: A client-chosen key identifying this purchase.
+    :type idempotency_key: Optional[str]
     :return: A confirmation of the successful purchase or an error message.
     :rtype: dict
-    :raises HTTPException: If a ValueError occurs (status code 400) or a general exception occurs (status code 500).
+    :raises HTTPException: If a ValueError occurs (status code 400), a downstream service is unavailable or too slow (status code 503), or a general exception occurs (status code 500).
     """
 
     try:
-        return process_purchase(customer_username, good_id)
+        return await run_idempotent(
+            customer_username,
+            idempotency_key,
+            ("purchase", good_id),
+            response,
+            lambda: process_purchase(customer_username, good_id),
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@app.post("/api/v1/sales/checkout")
+async def checkout_cart(
+    cart: Cart,
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255
+    ),
+):
+    """
+    Buys every line of a cart in one all-or-nothing checkout.
+
+    A retry carrying the same ``Idempotency-Key`` header is answered with the
+    first attempt's response instead of checking out again.
+
+    :param cart: The customer and the ``{good_id, quantity}`` cart lines.
+    :type cart: Cart
+    :param response: The response, to mark replays on.
+    :type response: Response
+    :param idempotency_key: A client-chosen key identifying this checkout.
+    :type idempotency_key: Optional[str]
+    :return: A confirmation with the amount charged and the units bought.
+    :rtype: dict
+    :raises HTTPException: If the cart cannot be bought (status code 400), a downstream service is unavailable or too slow (status code 503), or a general exception occurs (status code 500).
+    """
+
+    try:
+        return await run_idempotent(
+            cart.customer_username,
+            idempotency_key,
+            ("checkout", cart.model_dump_json()),
+            response,
+            lambda: checkout(cart),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@app.get("/api/v1/sales/rollups")
+async def get_sales_rollups_endpoint(
+    granularity: Granularity = "day",
+    good_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Retrieves revenue and units sold per good per hour or day.
+
+    The figures are maintained incrementally as purchases are recorded, so this
+    does not scan the purchases; it costs the size of the result.
+
+    :param granularity: ``hour`` or ``day`` (UTC) buckets.
+    :type granularity: Granularity
+    :param good_id: Only this good. Optional.
+    :type good_id: Optional[int]
+    :param since: Only buckets containing or after this time. Optional.
+    :type since: Optional[datetime]
+    :param until: Only buckets starting before this time. Optional.
+    :type until: Optional[datetime]
+    :return: ``built_at`` and the ``rollups`` rows.
+    :rtype: dict
+    :raises HTTPException: If the rollups are still being built (status code 503).
+    """
+
+    try:
+        return get_sales_rollups(granularity, good_id, since, until)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.get("/api/v1/sales/rollups/customers/{username}")
+async def get_customer_totals_endpoint(username: str):
+    """
+    Retrieves a customer's lifetime units bought and amount spent.
+
+    :param username: The username of the customer.
+    :type username: str
+    :return: ``customer_id``, ``units`` and ``revenue``.
+    :rtype: dict
+    :raises HTTPException: If the rollups are still being built (status code 503).
+    """
+
+    try:
+        return get_customer_totals(username)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.post("/api/v1/sales/rollups/rebuild")
+async def rebuild_sales_rollups_endpoint():
+    """
+    Recomputes the sales rollups from the purchases table to reconcile any drift.
+
+    :return: The number of purchases rolled up and when.
+    :rtype: dict
+    :raises HTTPException: If a rebuild is already running (status code 409) or the rebuild fails (status code 500).
+    """
+
+    try:
+        return await build_sales_rollups()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
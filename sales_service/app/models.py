@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 class Purchase(BaseModel):
@@ -18,3 +19,64 @@ class Purchase(BaseModel):
     customer_id: str
     amount_deducted: float = Field(..., ge=0)
     time: Optional[str] = None
+
+
+class CartLine(BaseModel):
+    """
+    Represents one line of a cart.
+
+    Attributes:
+        good_id (int): The ID of the good.
+        quantity (int): The number of units to buy. Must be between 1 and 100.
+    """
+
+    good_id: int = Field(..., gt=0)
+    quantity: int = Field(1, ge=1, le=100)
+
+
+class Cart(BaseModel):
+    """
+    Represents a cart checked out in one purchase.
+
+    Attributes:
+        customer_username (str): The username of the customer checking out.
+        items (list[CartLine]): The lines of the cart; each good appears once.
+    """
+
+    customer_username: str
+    items: list[CartLine] = Field(..., min_length=1, max_length=50)
+
+    @field_validator("items")
+    @classmethod
+    def check_distinct_goods(cls, items: list[CartLine]) -> list[CartLine]:
+        """
+        Ensures each good appears on one line only.
+
+        :raises ValueError: If a good appears on several lines.
+        """
+
+        good_ids = [item.good_id for item in items]
+        if len(set(good_ids)) != len(good_ids):
+            raise ValueError("Each good may appear on one cart line only.")
+        return items
+
+
+class PurchaseQuery(BaseModel):
+    """
+    Represents one page of the purchase history, newest first.
+
+    Attributes:
+        customer_id (Optional[str]): Only purchases by this customer.
+        good_id (Optional[int]): Only purchases of this good.
+        since (Optional[datetime]): Only purchases made at or after this time.
+        until (Optional[datetime]): Only purchases made before this time.
+        limit (int): The maximum number of purchases returned (1 to 500).
+        cursor (Optional[str]): The ``next_cursor`` of the previous page.
+    """
+
+    customer_id: Optional[str] = None
+    good_id: Optional[int] = Field(None, gt=0)
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    limit: int = Field(100, ge=1, le=500)
+    cursor: Optional[str] = None
@@ -0,0 +1,119 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Seconds a good's price is reused before it is fetched again; 0 disables the cache
+PRICE_CACHE_TTL: float = float(os.getenv("SALES_PRICE_CACHE_TTL", "5"))
+# Most goods whose price is cached; the least recently used are dropped
+PRICE_CACHE_MAX_GOODS: int = int(os.getenv("SALES_PRICE_CACHE_MAX_GOODS", "10000"))
+
+
+class _CachedPrice:
+    __slots__ = ("price", "price_version", "expires_at")
+
+    def __init__(self, price: float, price_version: int, expires_at: float):
+        self.price = price
+        self.price_version = price_version
+        self.expires_at = expires_at
+
+
+class PriceCache:
+    """
+    A bounded, short-lived cache of goods' prices and price versions.
+
+    A purchase that finds its good here skips the availability call to the
+    inventory service and deducts the stock on condition that the price is
+    still at the cached version; the inventory service refuses the deduction
+    otherwise, so a stale entry can delay a purchase but never misprice it.
+
+    Entries are kept for ``ttl`` seconds, and for at most ``max_goods`` goods,
+    the least recently used being dropped first. Prices without a version
+    (an inventory service that does not report one) are not cached.
+
+    :param ttl: The seconds a price is reused for; 0 disables the cache.
+    :type ttl: float
+    :param max_goods: The number of goods to remember.
+    :type max_goods: int
+    """
+
+    def __init__(
+        self, ttl: float = PRICE_CACHE_TTL, max_goods: int = PRICE_CACHE_MAX_GOODS
+    ):
+        self.ttl = ttl
+        self.max_goods = max_goods
+        self.hits: int = 0
+        self.misses: int = 0
+        self.invalidations: int = 0
+        self._entries: OrderedDict[int, _CachedPrice] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        """
+        Forgets every price.
+        """
+
+        self._entries.clear()
+
+    def get(self, good_id: int) -> Optional[tuple[float, int]]:
+        """
+        Looks up a good's cached price.
+
+        :param good_id: The ID of the good.
+        :type good_id: int
+        :return: The price and its version, or None if not cached or expired.
+        :rtype: Optional[tuple[float, int]]
+        """
+
+        entry = self._entries.get(good_id)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[good_id]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(good_id)
+        self.hits += 1
+        return entry.price, entry.price_version
+
+    def put(self, good_id: int, price: float, price_version: Optional[int]):
+        """
+        Caches a good's price as just read from the inventory service.
+
+        :param good_id: The ID of the good.
+        :type good_id: int
+        :param price: The price.
+        :type price: float
+        :param price_version: The version of the price, if reported.
+        :type price_version: Optional[int]
+        """
+
+        if self.ttl <= 0 or price_version is None:
+            return
+        self._entries[good_id] = _CachedPrice(
+            price, price_version, time.monotonic() + self.ttl
+        )
+        self._entries.move_to_end(good_id)
+        while len(self._entries) > self.max_goods:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, good_id: int):
+        """
+        Drops a good's price, e.g. after a deduction found it stale.
+
+        :param good_id: The ID of the good.
+        :type good_id: int
+        """
+
+        if self._entries.pop(good_id, None) is not None:
+            self.invalidations += 1
+
+    def metrics(self) -> dict:
+        return {
+            "goods": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,186 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# Consecutive failed calls to a service after which its circuit opens
+BREAKER_FAILURES: int = int(os.getenv("SALES_BREAKER_FAILURES", "5"))
+# Seconds an open circuit fails calls fast before letting a probe through
+BREAKER_RESET_SECONDS: float = float(os.getenv("SALES_BREAKER_RESET_SECONDS", "10"))
+# Retries earned per call to a service, and the most that can be saved up
+RETRY_BUDGET_RATIO: float = float(os.getenv("SALES_RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_CAPACITY: float = float(os.getenv("SALES_RETRY_BUDGET_CAPACITY", "10"))
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float, detached: bool = False) -> Iterator[float]:
+    """
+    Bounds the downstream calls made inside the block, including those of tasks
+    it starts, to finish within ``seconds``.
+
+    A deadline already in force is only ever shortened, unless ``detached``.
+
+    :param seconds: The time budget.
+    :type seconds: float
+    :param detached: Whether to replace the deadline in force, e.g. to undo a
+        step after the caller's deadline has passed.
+    :type detached: bool
+    :return: The deadline, as a ``time.monotonic()`` value.
+    :rtype: Iterator[float]
+    """
+
+    current = _deadline.get()
+    expires_at = time.monotonic() + seconds
+    if current is not None and not detached:
+        expires_at = min(current, expires_at)
+    token = _deadline.set(expires_at)
+    try:
+        yield expires_at
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    The seconds left before the current deadline.
+
+    :return: The seconds left (negative once it has passed), or None without a
+        deadline.
+    :rtype: Optional[float]
+    """
+
+    expires_at = _deadline.get()
+    return None if expires_at is None else expires_at - time.monotonic()
+
+
+class RetryBudget:
+    """
+    A token bucket that caps retries at a fraction of the calls made.
+
+    Every call deposits ``ratio`` tokens and every retry withdraws one, so when
+    a service degrades the retries add at most ``ratio`` extra load instead of
+    multiplying it.
+
+    :param ratio: The tokens earned per call, i.e. the retries allowed per call.
+    :type ratio: float
+    :param capacity: The most tokens held; the bucket starts full.
+    :type capacity: float
+    """
+
+    def __init__(
+        self, ratio: float = RETRY_BUDGET_RATIO, capacity: float = RETRY_BUDGET_CAPACITY
+    ):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+
+    def deposit(self):
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """
+        Takes a token for one retry.
+
+        :return: Whether the retry is allowed.
+        :rtype: bool
+        """
+
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    Fails calls to a service fast while it is down.
+
+    The circuit is *closed* until ``failures`` calls in a row fail, then *open*:
+    calls are refused for ``reset_seconds``. It then turns *half-open* and lets
+    a single probe call through; the probe closes the circuit if it succeeds
+    and reopens it if it fails.
+
+    :param failures: The consecutive failures that open the circuit.
+    :type failures: int
+    :param reset_seconds: The seconds the circuit stays open before a probe.
+    :type reset_seconds: float
+    """
+
+    def __init__(
+        self,
+        failures: int = BREAKER_FAILURES,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+    ):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures: int = 0
+        self.opened_at: Optional[float] = None
+        self.opens: int = 0
+        self.rejected: int = 0
+        self._probing: bool = False
+
+    @property
+    def state(self) -> str:
+        """
+        ``"closed"``, ``"open"`` or ``"half_open"``.
+        """
+
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """
+        Decides whether a call may go ahead, claiming the probe if half-open.
+
+        :return: Whether to make the call.
+        :rtype: bool
+        """
+
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, failed: bool):
+        """
+        Records the outcome of an allowed call.
+
+        :param failed: Whether the call failed.
+        :type failed: bool
+        """
+
+        probe, self._probing = self._probing, False
+        if not failed:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            return
+        self.consecutive_failures += 1
+        if probe or self.consecutive_failures >= self.failures:
+            if self.opened_at is None or probe:
+                self.opens += 1
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Gives up an allowed call without an outcome, e.g. when it was cancelled.
+        """
+
+        self._probing = False
+
+    def metrics(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,273 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import Iterable, Literal, Optional
+
+Granularity = Literal["hour", "day"]
+
+# Width of a rollup bucket in seconds
+BUCKET_SECONDS: dict[str, int] = {"hour": 3600, "day": 86400}
+
+
+class SalesTotals:
+    """
+    Running totals of a set of purchases.
+
+    :ivar units: The units sold; each purchase row is one unit.
+    :vartype units: int
+    :ivar revenue_cents: The amount charged in cents, so totals never drift.
+    :vartype revenue_cents: int
+    """
+
+    __slots__ = ("units", "revenue_cents")
+
+    def __init__(self):
+        self.units: int = 0
+        self.revenue_cents: int = 0
+
+    def add(self, amount_cents: int):
+        self.units += 1
+        self.revenue_cents += amount_cents
+
+    def as_dict(self) -> dict:
+        return {"units": self.units, "revenue": self.revenue_cents / 100}
+
+
+def _epoch(moment: datetime) -> float:
+    """
+    Converts a time to epoch seconds, reading naive times as UTC.
+
+    :param moment: The time.
+    :type moment: datetime
+    :return: The epoch seconds.
+    :rtype: float
+    """
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _isoformat(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class _Aggregates:
+    """
+    Revenue per good per bucket, for each granularity, and per-customer totals.
+
+    Each granularity keeps its buckets' start times sorted, overall and per
+    good, so a time range is found by binary search and reading it touches only
+    the buckets returned.
+    """
+
+    def __init__(self):
+        self.purchases: int = 0
+        self.buckets: dict[str, dict[int, dict[int, SalesTotals]]] = {
+            granularity: {} for granularity in BUCKET_SECONDS
+        }
+        self.starts: dict[str, list[int]] = {
+            granularity: [] for granularity in BUCKET_SECONDS
+        }
+        self.good_starts: dict[str, dict[int, list[int]]] = {
+            granularity: {} for granularity in BUCKET_SECONDS
+        }
+        self.customers: dict[str, SalesTotals] = {}
+
+    def add(self, purchase: dict):
+        good_id = purchase["good_id"]
+        amount_cents = round(purchase["amount_deducted"] * 100)
+        timestamp = int(_epoch(datetime.fromisoformat(purchase["time"])))
+        for granularity, seconds in BUCKET_SECONDS.items():
+            start = timestamp - timestamp % seconds
+            bucket = self.buckets[granularity].get(start)
+            if bucket is None:
+                bucket = self.buckets[granularity][start] = {}
+                _insert(self.starts[granularity], start)
+            totals = bucket.get(good_id)
+            if totals is None:
+                totals = bucket[good_id] = SalesTotals()
+                _insert(self.good_starts[granularity].setdefault(good_id, []), start)
+            totals.add(amount_cents)
+        customer = self.customers.get(purchase["customer_id"])
+        if customer is None:
+            customer = self.customers[purchase["customer_id"]] = SalesTotals()
+        customer.add(amount_cents)
+        self.purchases += 1
+
+
+def _insert(starts: list[int], start: int):
+    # New purchases almost always fall in the latest bucket
+    if not starts or starts[-1] < start:
+        starts.append(start)
+    else:
+        insort(starts, start)
+
+
+class SalesRollups:
+    """
+    Revenue and units per good per hour and per day, and totals per customer,
+    kept current incrementally.
+
+    Every recorded purchase is added to its buckets as it is written, so
+    reading a range costs the size of the result rather than a scan of the
+    purchases. A rebuild (``begin_build``/``add_page``/``finish_build``)
+    recomputes everything from the purchases table while the previous figures
+    stay readable; purchases recorded during the rebuild are carried over.
+
+    :ivar ready: Whether the rollups have been built from the database.
+    :vartype ready: bool
+    """
+
+    def __init__(self):
+        """
+        Initializes empty rollups.
+        """
+
+        self.ready: bool = False
+        self.built_at: Optional[str] = None
+        self._aggregates = _Aggregates()
+        self._building: bool = False
+        self._staged = _Aggregates()
+        self._recorded_during_build: dict[int, dict] = {}
+        self._read_during_build: set[int] = set()
+
+    def __len__(self) -> int:
+        return self._aggregates.purchases
+
+    @property
+    def building(self) -> bool:
+        """
+        Whether a rebuild is in progress.
+        """
+
+        return self._building
+
+    def add(self, purchases: Iterable[dict]):
+        """
+        Records newly written purchases.
+
+        :param purchases: Purchase rows containing ``id``, ``good_id``,
+            ``customer_id``, ``amount_deducted`` and ``time``.
+        :type purchases: Iterable[dict]
+        """
+
+        for purchase in purchases:
+            self._aggregates.add(purchase)
+            if self._building:
+                self._recorded_during_build[purchase["id"]] = purchase
+
+    def begin_build(self):
+        """
+        Starts recomputing the rollups from scratch; current rollups remain readable.
+
+        :raises RuntimeError: If a rebuild is already in progress.
+        """
+
+        if self._building:
+            raise RuntimeError("Sales rollups are already being rebuilt")
+        self._building = True
+        self._staged = _Aggregates()
+        self._recorded_during_build = {}
+        self._read_during_build = set()
+
+    def add_page(self, purchases: Iterable[dict]):
+        """
+        Stages a page of purchase rows read during a rebuild.
+
+        :param purchases: Purchase rows, as for ``add``.
+        :type purchases: Iterable[dict]
+        """
+
+        for purchase in purchases:
+            self._staged.add(purchase)
+            if purchase["id"] in self._recorded_during_build:
+                self._read_during_build.add(purchase["id"])
+
+    def abort_build(self):
+        """
+        Abandons a rebuild, keeping the current rollups.
+        """
+
+        self._building = False
+        self._staged = _Aggregates()
+        self._recorded_during_build = {}
+        self._read_during_build = set()
+
+    def finish_build(self):
+        """
+        Replaces the rollups with the rebuilt ones and marks them ready.
+
+        Purchases recorded while the rebuild was running, that it did not read,
+        are added to the rebuilt figures.
+        """
+
+        for purchase_id, purchase in self._recorded_during_build.items():
+            if purchase_id not in self._read_during_build:
+                self._staged.add(purchase)
+        self._aggregates = self._staged
+        self.abort_build()
+        self.built_at = datetime.now(timezone.utc).isoformat()
+        self.ready = True
+
+    def revenue(
+        self,
+        granularity: Granularity = "day",
+        good_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> list[dict]:
+        """
+        Reads the revenue and units per good per bucket over a time range.
+
+        :param granularity: ``"hour"`` or ``"day"`` (UTC) buckets.
+        :type granularity: Granularity
+        :param good_id: Only this good. Optional.
+        :type good_id: Optional[int]
+        :param since: Only buckets containing or after this time. Optional.
+        :type since: Optional[datetime]
+        :param until: Only buckets starting before this time. Optional.
+        :type until: Optional[datetime]
+        :return: ``good_id``, bucket ``start``, ``units`` and ``revenue`` rows,
+            ordered by bucket and then good.
+        :rtype: list[dict]
+        """
+
+        aggregates = self._aggregates
+        buckets = aggregates.buckets[granularity]
+        if good_id is None:
+            starts = aggregates.starts[granularity]
+        else:
+            starts = aggregates.good_starts[granularity].get(good_id, [])
+
+        seconds = BUCKET_SECONDS[granularity]
+        low = 0
+        if since is not None:
+            timestamp = int(_epoch(since))
+            low = bisect_left(starts, timestamp - timestamp % seconds)
+        high = len(starts)
+        if until is not None:
+            high = bisect_left(starts, _epoch(until), lo=low)
+
+        rows = []
+        for start in starts[low:high]:
+            bucket = buckets[start]
+            good_ids = sorted(bucket) if good_id is None else (good_id,)
+            rows.extend(
+                {"good_id": good, "start": _isoformat(start), **bucket[good].as_dict()}
+                for good in good_ids
+            )
+        return rows
+
+    def customer(self, customer_id: str) -> dict:
+        """
+        Reads one customer's lifetime totals.
+
+        :param customer_id: The customer's username.
+        :type customer_id: str
+        :return: ``customer_id``, ``units`` and ``revenue``; zero if the customer
+            has not bought anything.
+        :rtype: dict
+        """
+
+        totals = self._aggregates.customers.get(customer_id) or SalesTotals()
+        return {"customer_id": customer_id, **totals.as_dict()}
@@ -1,23 +1,142 @@
+import asyncio
+import base64
+import binascii
+import json
 import os
+from datetime import datetime
+from typing import Optional
 
-import httpx
-from app.database import SalesTable
-from app.models import Purchase
-from dotenv import load_dotenv
+from app.clients import ServiceClient, parse_urls
+from app.database import AsyncSalesTable
+from app.journal import PURCHASE_JOURNAL_PATH, PurchaseJournal
+from app.models import Cart, CartLine, Purchase, PurchaseQuery
+from app.price_cache import PriceCache
+from app.resilience import deadline
+from app.rollups import Granularity, SalesRollups
 from fastapi import HTTPException
 from loguru import logger
 
-# URL for communicating between services
-INVENTORY_SERVICE_URL = "http://127.0.0.1:8002/api/v1/inventory"
-CUSTOMER_SERVICE_URL = "http://127.0.0.1:8001/api/v1/customer"
+# Base URLs of the downstream replicas, comma-separated
+INVENTORY_SERVICE_URLS: list[str] = parse_urls(
+    os.getenv("SALES_INVENTORY_URLS", "http://127.0.0.1:8003/api/v1/inventory")
+)
+CUSTOMER_SERVICE_URLS: list[str] = parse_urls(
+    os.getenv("SALES_CUSTOMER_URLS", "http://127.0.0.1:8000/api/v1/customer")
+)
+
+# Seconds a purchase or checkout may spend on downstream calls
+PURCHASE_DEADLINE: float = float(os.getenv("SALES_PURCHASE_DEADLINE", "5"))
 
-load_dotenv()
-db_sale: SalesTable = SalesTable(
+# The client is created by connect_database() from the application lifespan
+db_sale: AsyncSalesTable = AsyncSalesTable(
     url=os.getenv("SUPABASE_URL"), key=os.getenv("SUPABASE_KEY")
 )
+# Pooled clients, opened by open_clients() from the application lifespan
+inventory_client: ServiceClient = ServiceClient("Inventory", INVENTORY_SERVICE_URLS)
+customer_client: ServiceClient = ServiceClient("Customer", CUSTOMER_SERVICE_URLS)
+# Revenue per good per hour/day and per customer, updated as purchases are recorded
+sales_rollups: SalesRollups = SalesRollups()
+# Recently read prices, verified by the inventory service when the stock is deducted
+price_cache: PriceCache = PriceCache()
+
+
+async def _flush_journaled(entries: list[dict]) -> list[dict]:
+    recorded = await db_sale.record_journaled(entries)
+    sales_rollups.add(recorded)
+    return recorded
+
+
+# Write-behind purchase journal, opened by connect_database(); None when disabled
+purchase_journal: Optional[PurchaseJournal] = (
+    PurchaseJournal(PURCHASE_JOURNAL_PATH, _flush_journaled)
+    if PURCHASE_JOURNAL_PATH
+    else None
+)
+
+
+async def connect_database():
+    """
+    Opens the sales database client, and the purchase journal if enabled; called
+    once at application startup.
+    """
+
+    await db_sale.connect()
+    if purchase_journal is not None:
+        await purchase_journal.open()
+
+
+async def close_database():
+    """
+    Flushes and closes the purchase journal if enabled, then closes the sales
+    database client; called at application shutdown.
+    """
+
+    if purchase_journal is not None:
+        await purchase_journal.close()
+    await db_sale.close()
+
+
+def get_upstream_metrics() -> dict:
+    """
+    Reports the health of the downstream services and their replicas.
+
+    :return: The ``inventory`` and ``customer`` services' circuit state, retry,
+        timeout and deadline counts, and their replicas' health, load and
+        latency; and the ``price_cache`` size, hits, misses and invalidations.
+    :rtype: dict
+    """
+
+    return {
+        "inventory": inventory_client.metrics(),
+        "customer": customer_client.metrics(),
+        "price_cache": price_cache.metrics(),
+    }
+
+
+async def record_purchases(purchases: list[Purchase]) -> list[dict]:
+    """
+    Records purchases, through the write-behind journal if it is enabled.
+
+    Journaled purchases are durable when this returns and reach the purchases
+    table (and the rollups) within ``SALES_JOURNAL_FLUSH_INTERVAL``; otherwise
+    they are inserted, and added to the rollups, before this returns.
+
+    :param purchases: The purchases.
+    :type purchases: list[Purchase]
+    :return: The inserted rows, or the journal entries.
+    :rtype: list[dict]
+    :raises Exception: If the purchases could not be recorded.
+    """
+
+    if purchase_journal is not None:
+        return await purchase_journal.append(purchases)
+    if len(purchases) == 1:
+        recorded = await db_sale.record_purchase(purchases[0])
+    else:
+        recorded = await db_sale.record_purchases(purchases)
+    sales_rollups.add(recorded)
+    return recorded
+
+
+async def open_clients():
+    """
+    Opens the pooled downstream clients; called once at application startup.
+    """
+
+    await inventory_client.open()
+    await customer_client.open()
+
+
+async def close_clients():
+    """
+    Closes the pooled downstream clients; called at application shutdown.
+    """
+
+    await inventory_client.close()
+    await customer_client.close()
 
 
-def fetch_good_details(good_id: int):
+async def fetch_good_details(good_id: int):
     """
     Fetches details of a specific good from the inventory service.
 
@@ -30,21 +149,58 @@ def fetch_good_details(good_id: int):
 
     logger.info(f"Good details fetched: {good_id}")
 
-    with httpx.Client() as client:
-        logger.info(f"IN CLIENT: {good_id}")
-        response = client.get(f"{INVENTORY_SERVICE_URL}/{good_id}")
-        # logger.info(response.json())
-        logger.info(f"AFTER CLIENT: {good_id}")
-        if response.status_code == 404:
-            logger.info(f"IN 404: {response.status_code}")
-            raise ValueError(f"Good with ID '{good_id}' not found")
-        elif response.status_code != 200:
-            logger.info(f"IN 200: {response.status_code}")
-            raise ValueError("Failed to fetch good details")
-        return response.json()
+    response = await inventory_client.get(f"/{good_id}")
+    if response.status_code == 404:
+        raise ValueError(f"Good with ID '{good_id}' not found")
+    elif response.status_code != 200:
+        raise ValueError("Failed to fetch good details")
+    return response.json()
 
 
-def deduct_wallet_balance(customer_username: str, amount: float):
+async def fetch_good_availability(good_id: int):
+    """
+    Fetches the stock, price and versions of a good from the inventory service.
+
+    Lighter than ``fetch_good_details``: the inventory service reads and sends
+    only the fields a purchase needs.
+
+    :param good_id: The ID of the good.
+    :type good_id: int
+    :return: The good's ``count``, ``price``, ``version`` and ``price_version``.
+    :rtype: dict
+    :raises ValueError: If the good is not found.
+    :raises RuntimeError: If the request fails.
+    """
+
+    response = await inventory_client.get(f"/{good_id}/availability")
+    if response.status_code == 404:
+        raise ValueError(f"Good with ID '{good_id}' not found")
+    elif response.status_code != 200:
+        raise RuntimeError("Failed to fetch good availability")
+    return response.json()
+
+
+async def fetch_wallet_balance(customer_username: str) -> float:
+    """
+    Fetches a customer's wallet balance from the customer service.
+
+    :param customer_username: The username of the customer.
+    :type customer_username: str
+    :return: The balance.
+    :rtype: float
+    :raises ValueError: If the customer is not found.
+    :raises RuntimeError: If the request fails.
+    """
+
+    response = await customer_client.get(f"/get/{customer_username}")
+    if response.status_code == 404:
+        raise ValueError(f"Customer '{customer_username}' not found in the database")
+    elif response.status_code != 200:
+        raise RuntimeError("Failed to fetch wallet balance")
+    return response.json()["data"]["wallet"]["amount"]
+
+
+async def deduct_wallet_balance(customer_username: str, amount: float):
     """
     Deducts the specified amount from a customer's wallet.
 
@@ -54,108 +210,461 @@ def deduct_wallet_balance(customer_username: str, amount: float):
     :type amount: float
     :return: Response from the customer service.
     :rtype: dict
-    :raises ValueError: If the customer is not found, insufficient funds, or the request fails.
+    :raises ValueError: If the customer is not found or funds are insufficient.
+    :raises RuntimeError: If the request fails.
     """
 
-    with httpx.Client() as client:
-        response = client.put(
-            f"{CUSTOMER_SERVICE_URL}/wallet/{customer_username}/deduct", json=amount
-        )
-        logger.info(response.status_code)
-        if response.status_code == 404:
-            raise ValueError(
-                f"Customer '{customer_username}' not found in the database"
-            )
-        elif response.status_code == 400:
-            raise ValueError("Amount not enough")
-        elif response.status_code != 200:
-            raise ValueError("Failed to deduct wallet balance")
-        return response.json()
+    response = await customer_client.put(
+        f"/wallet/{customer_username}/deduct", json=amount
+    )
+    logger.info(response.status_code)
+    if response.status_code == 404:
+        raise ValueError(f"Customer '{customer_username}' not found in the database")
+    elif response.status_code == 400:
+        raise ValueError("Amount not enough")
+    elif response.status_code != 200:
+        raise RuntimeError("Failed to deduct wallet balance")
+    return response.json()
 
 
-def deduct_inventory(good_id: int):
+async def deduct_inventory(good_id: int, price_version: Optional[int] = None):
     """
     Deducts one unit from the inventory stock of a specific good.
 
     :param good_id: The ID of the good to deduct stock for.
     :type good_id: int
+    :param price_version: Only deduct if the good's price is still at this
+        version, i.e. the price charged is current. Optional.
+    :type price_version: Optional[int]
     :return: Response from the inventory service.
     :rtype: dict
-    :raises ValueError: If the good is not found, stock is zero, or the request fails.
+    :raises ValueError: If the good is not found or stock is zero.
+    :raises RuntimeError: If the price has changed, or the request fails.
     """
 
-    with httpx.Client() as client:
-        logger.info(f"IN DEDUCT INV: {good_id}")
-
-        response = client.put(f"{INVENTORY_SERVICE_URL}/deduct/{good_id}")
-        logger.info(f"RESPONSE: {response.status_code}")
+    params = None if price_version is None else {"price_version": price_version}
+    response = await inventory_client.put(f"/deduct/{good_id}", params=params)
+    logger.info(f"RESPONSE: {response.status_code}")
 
-        if response.status_code == 404:
-            raise ValueError(f"Good with ID '{good_id}' not found")
-        elif response.status_code == 400:
-            raise ValueError("Stock already zero")
-        elif response.status_code != 200:
-            raise ValueError("Failed to deduct inventory")
-        return response.json()
+    if response.status_code == 404:
+        raise ValueError(f"Good with ID '{good_id}' not found")
+    elif response.status_code == 400:
+        raise ValueError("Stock already zero")
+    elif response.status_code == 409:
+        raise RuntimeError("The price of the good has changed, please try again")
+    elif response.status_code != 200:
+        raise RuntimeError("Failed to deduct inventory")
+    return response.json()
 
 
-def process_purchase(customer_username: str, good_id: int):
+async def process_purchase(customer_username: str, good_id: int):
     """
     Processes the purchase of a good by a customer.
 
+    The good's availability and the customer's balance are looked up
+    concurrently, so a purchase that cannot succeed is refused before anything
+    is charged. The wallet debit, stock deduction and purchase record then
+    follow in order, each awaited without blocking other purchases.
+
+    While the good's price is in ``price_cache`` the availability and balance
+    calls are skipped: the debit refuses an amount the wallet cannot cover,
+    and the stock is deducted on condition that the price has not changed
+    since. If the deduction is refused (price changed, out of stock)
+    the wallet is refunded and the cached price dropped, so the next purchase
+    reads the good afresh. If the purchase cannot be recorded, the wallet is
+    refunded and the unit restocked before the error is raised.
+
     :param customer_username: The username of the customer making the purchase.
     :type customer_username: str
     :param good_id: The ID of the good being purchased.
     :type good_id: int
     :return: A success message confirming the purchase.
     :rtype: dict
-    :raises ValueError: If any error occurs during the purchase process.
+    :raises ValueError: If the purchase is refused (unknown good or customer,
+        no stock, insufficient funds); retrying it would be refused again.
+    :raises RuntimeError: If a downstream service failed, was unavailable or too
+        slow, or the price changed; the purchase can be retried.
+    """
+
+    with deadline(PURCHASE_DEADLINE):
+        try:
+            logger.info(
+                f"Processing purchase for {customer_username} and good {good_id}"
+            )
+            cached = price_cache.get(good_id)
+            if cached is None:
+                good, balance = await asyncio.gather(
+                    fetch_good_availability(good_id),
+                    fetch_wallet_balance(customer_username),
+                )
+                if good["count"] < 1:
+                    raise ValueError("Stock already zero")
+                price, price_version = good["price"], good.get("price_version")
+                price_cache.put(good_id, price, price_version)
+                if balance < price:
+                    raise ValueError("Amount not enough")
+            else:
+                # The stock is checked by the deduction and the balance by the
+                # debit, which refuses an amount the wallet cannot cover
+                price, price_version = cached
+
+            await deduct_wallet_balance(customer_username, price)
+
+            try:
+                await deduct_inventory(good_id, price_version)
+            except Exception:
+                price_cache.invalidate(good_id)
+                await _compensate(
+                    "refund", charge_wallet_balance(customer_username, price)
+                )
+                raise
+
+            purchase = Purchase(
+                good_id=good_id,
+                customer_id=customer_username,
+                amount_deducted=price,
+            )
+            try:
+                await record_purchases([purchase])
+            except Exception:
+                await asyncio.gather(
+                    _compensate(
+                        "refund", charge_wallet_balance(customer_username, price)
+                    ),
+                    _compensate(
+                        "restock", restock_inventory_batch([CartLine(good_id=good_id)])
+                    ),
+                )
+                raise
+            logger.info(f"Purchase recorded: {purchase}")
+
+            return {"message": "Purchase successful"}
+
+        except ValueError as e:
+            raise ValueError(str(e))
+
+
+async def fetch_goods_availability(good_ids: list[int]) -> dict[int, dict]:
+    """
+    Fetches the stock, price and versions of several goods in one request.
+
+    The prices read are also stored in ``price_cache`` for later purchases.
+
+    :param good_ids: The IDs of the goods.
+    :type good_ids: list[int]
+    :return: The ``count``, ``price``, ``version`` and ``price_version`` of
+        each good found, by ID.
+    :rtype: dict[int, dict]
+    :raises RuntimeError: If the request fails.
+    """
+
+    response = await inventory_client.get(
+        "/availability", params={"ids": ",".join(map(str, good_ids))}
+    )
+    if response.status_code != 200:
+        raise RuntimeError("Failed to fetch good availability")
+    goods = {good["id"]: good for good in response.json()["goods"]}
+    for good_id, good in goods.items():
+        price_cache.put(good_id, good["price"], good.get("price_version"))
+    return goods
+
+
+async def charge_wallet_balance(customer_username: str, amount: float):
+    """
+    Adds the specified amount to a customer's wallet, e.g. to refund a checkout.
+
+    :param customer_username: The username of the customer.
+    :type customer_username: str
+    :param amount: The amount to add.
+    :type amount: float
+    :return: Response from the customer service.
+    :rtype: dict
+    :raises RuntimeError: If the request fails.
+    """
+
+    response = await customer_client.put(
+        f"/wallet/{customer_username}/charge", json=amount
+    )
+    if response.status_code != 200:
+        raise RuntimeError("Failed to charge wallet balance")
+    return response.json()
+
+
+def _stock_items(lines: list[CartLine]) -> list[dict]:
+    return [{"id": line.good_id, "quantity": line.quantity} for line in lines]
+
+
+async def deduct_inventory_batch(lines: list[CartLine]):
+    """
+    Deducts the stock of every cart line in one all-or-nothing request.
+
+    :param lines: The cart lines.
+    :type lines: list[CartLine]
+    :return: Response from the inventory service.
+    :rtype: dict
+    :raises ValueError: If any good is missing or short of stock (nothing is
+        deducted).
+    :raises RuntimeError: If the request fails.
+    """
+
+    response = await inventory_client.post("/stock/deduct", json=_stock_items(lines))
+    if response.status_code == 400:
+        raise ValueError(response.json()["detail"])
+    elif response.status_code != 200:
+        raise RuntimeError("Failed to deduct inventory")
+    return response.json()
+
+
+async def restock_inventory_batch(lines: list[CartLine]):
+    """
+    Returns the stock of every cart line, e.g. to undo a checkout.
+
+    :param lines: The cart lines.
+    :type lines: list[CartLine]
+    :return: Response from the inventory service.
+    :rtype: dict
+    :raises RuntimeError: If the request fails.
+    """
+
+    response = await inventory_client.post("/stock/restock", json=_stock_items(lines))
+    if response.status_code != 200:
+        raise RuntimeError("Failed to restock inventory")
+    return response.json()
+
+
+async def _compensate(action: str, step):
+    """
+    Runs an undo step of a failed purchase or checkout, logging rather than
+    raising errors.
     """
 
     try:
-        logger.info(f"Processing purchase for {customer_username} and good {good_id}")
-        good = fetch_good_details(good_id)
-        price = good["price"]
+        # Undo even when the purchase failed by running out of time
+        with deadline(PURCHASE_DEADLINE, detached=True):
+            await step
+    except Exception as e:
+        logger.exception(f"Could not {action} after a failed purchase: {e}")
 
-        deduct_wallet_balance(customer_username, price)
 
-        deduct_inventory(good_id)
+async def checkout(cart: Cart):
+    """
+    Buys every line of a cart in one all-or-nothing checkout.
+
+    Prices and stock for the whole cart and the customer's balance are fetched
+    concurrently; the cart is refused before anything is charged if a good is
+    missing or short of stock, or the balance does not cover the total. The
+    wallet is then debited once for the total, the stock of all lines is
+    deducted in one transaction, and one purchase per unit is recorded with a
+    single insert. If a later step fails, the earlier ones are undone (refund,
+    restock) before the error is raised. All downstream calls share a deadline
+    of ``SALES_PURCHASE_DEADLINE`` seconds, the undo steps a fresh one.
 
-        purchase = Purchase(
-            good_id=good_id,
-            customer_id=customer_username,
-            amount_deducted=price,
+    :param cart: The customer and the cart lines.
+    :type cart: Cart
+    :return: A success message, the amount charged and the number of units bought.
+    :rtype: dict
+    :raises ValueError: If the cart cannot be bought.
+    :raises RuntimeError: If a downstream service failed, was unavailable or too
+        slow; the checkout can be retried.
+    :raises Exception: If recording the purchases fails.
+    """
+
+    with deadline(PURCHASE_DEADLINE):
+        customer = cart.customer_username
+        logger.info(f"Checking out {len(cart.items)} cart lines for {customer}")
+        goods, balance = await asyncio.gather(
+            fetch_goods_availability([line.good_id for line in cart.items]),
+            fetch_wallet_balance(customer),
+        )
+        missing = [line.good_id for line in cart.items if line.good_id not in goods]
+        if missing:
+            raise ValueError(f"Goods not found: {missing}")
+        short = [
+            line.good_id
+            for line in cart.items
+            if goods[line.good_id]["count"] < line.quantity
+        ]
+        if short:
+            raise ValueError(f"Insufficient stock for goods: {short}")
+        total = round(
+            sum(goods[line.good_id]["price"] * line.quantity for line in cart.items), 2
         )
-        db_sale.record_purchase(purchase)
-        logger.info(f"Purchase recorded: {purchase}")
+        if balance < total:
+            raise ValueError("Amount not enough")
+
+        await deduct_wallet_balance(customer, total)
+        try:
+            await deduct_inventory_batch(cart.items)
+        except Exception:
+            await _compensate("refund", charge_wallet_balance(customer, total))
+            raise
+
+        purchases = [
+            Purchase(
+                good_id=line.good_id,
+                customer_id=customer,
+                amount_deducted=goods[line.good_id]["price"],
+            )
+            for line in cart.items
+            for _ in range(line.quantity)
+        ]
+        try:
+            await record_purchases(purchases)
+        except Exception:
+            await asyncio.gather(
+                _compensate("refund", charge_wallet_balance(customer, total)),
+                _compensate("restock", restock_inventory_batch(cart.items)),
+            )
+            raise
+        logger.info(f"Checkout recorded: {len(purchases)} units for {customer}")
 
-        return {"message": "Purchase successful"}
+        return {
+            "message": "Checkout successful",
+            "total": total,
+            "units": len(purchases),
+        }
 
-    except ValueError as e:
-        raise ValueError(str(e))
 
+def encode_cursor(purchase: dict) -> str:
+    """
+    Encodes the position after a purchase as an opaque page cursor.
 
-def get_purchases():
+    :param purchase: The last purchase of a page.
+    :type purchase: dict
+    :return: The cursor.
+    :rtype: str
     """
-    Retrieves all purchase records from the database.
 
-    :return: A list of purchase records.
-    :rtype: list[dict]
+    position = json.dumps([purchase["time"], purchase["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """
+    Decodes a page cursor made by ``encode_cursor``.
+
+    :param cursor: The cursor.
+    :type cursor: str
+    :return: The ``(time, id)`` of the purchase to continue after.
+    :rtype: tuple[str, int]
+    :raises ValueError: If the cursor is malformed.
+    """
+
+    try:
+        time, purchase_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(time, str) and isinstance(purchase_id, int):
+            return time, purchase_id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        pass
+    raise ValueError("Invalid cursor")
+
+
+async def get_purchases(query: Optional[PurchaseQuery] = None) -> dict:
+    """
+    Retrieves one page of purchase records, newest first.
+
+    :param query: The filters, page size and cursor; the first 100 purchases if
+        omitted.
+    :type query: Optional[PurchaseQuery]
+    :return: The page's ``purchases``, and the ``next_cursor`` to fetch the next
+        page with (None on the last page).
+    :rtype: dict
+    :raises ValueError: If the cursor is malformed.
     :raises HTTPException: If the database query fails.
     """
 
+    query = query or PurchaseQuery()
+    before = decode_cursor(query.cursor) if query.cursor else None
     try:
-        purchases = db_sale.get_purchases()
-        return [
-            {
-                "id": purchase["id"],
-                "good_id": purchase["good_id"],
-                "customer_id": purchase["customer_id"],
-                "amount_deducted": purchase["amount_deducted"],
-                "time": purchase["time"],
-            }
-            for purchase in purchases
-        ]
+        # One extra row tells whether there is a next page
+        purchases = await db_sale.get_purchases(
+            customer_id=query.customer_id,
+            good_id=query.good_id,
+            since=query.since.isoformat() if query.since else None,
+            until=query.until.isoformat() if query.until else None,
+            before=before,
+            limit=query.limit + 1,
+        )
     except Exception as e:
         logger.exception(e)
         raise HTTPException(status_code=500, detail=str(e))
+    page = purchases[: query.limit]
+    has_more = len(purchases) > query.limit
+    return {
+        "purchases": page,
+        "next_cursor": encode_cursor(page[-1]) if has_more else None,
+    }
+
+
+async def build_sales_rollups(page_size: int = 5000) -> dict:
+    """
+    Recomputes the sales rollups from the purchases table.
+
+    Runs at startup and on demand to reconcile the incrementally maintained
+    figures with the database, streaming the table in pages. The previous
+    figures are served until it completes.
+
+    :param page_size: The number of purchases read per database round trip.
+    :type page_size: int
+    :return: The number of purchases rolled up and when.
+    :rtype: dict
+    :raises RuntimeError: If a rebuild is already in progress.
+    """
+
+    sales_rollups.begin_build()
+    try:
+        async for page in db_sale.iter_purchases(page_size=page_size):
+            sales_rollups.add_page(page)
+    except BaseException:
+        sales_rollups.abort_build()
+        raise
+    sales_rollups.finish_build()
+    logger.info(f"Sales rollups built over {len(sales_rollups)} purchases")
+    return {"purchases": len(sales_rollups), "built_at": sales_rollups.built_at}
+
+
+def get_sales_rollups(
+    granularity: Granularity = "day",
+    good_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> dict:
+    """
+    Reads the revenue and units per good per hour or day.
+
+    :param granularity: ``"hour"`` or ``"day"`` (UTC) buckets.
+    :type granularity: Granularity
+    :param good_id: Only this good. Optional.
+    :type good_id: Optional[int]
+    :param since: Only buckets containing or after this time. Optional.
+    :type since: Optional[datetime]
+    :param until: Only buckets starting before this time. Optional.
+    :type until: Optional[datetime]
+    :return: ``built_at`` and the ``rollups`` rows of ``good_id``, ``start``,
+        ``units`` and ``revenue``.
+    :rtype: dict
+    :raises RuntimeError: If the rollups have not finished their initial build.
+    """
+
+    if not sales_rollups.ready:
+        raise RuntimeError("Sales rollups are still being built")
+    return {
+        "built_at": sales_rollups.built_at,
+        "rollups": sales_rollups.revenue(granularity, good_id, since, until),
+    }
+
+
+def get_customer_totals(customer_username: str) -> dict:
+    """
+    Reads a customer's lifetime units bought and amount spent.
+
+    :param customer_username: The username of the customer.
+    :type customer_username: str
+    :return: ``customer_id``, ``units`` and ``revenue``.
+    :rtype: dict
+    :raises RuntimeError: If the rollups have not finished their initial build.
+    """
+
+    if not sales_rollups.ready:
+        raise RuntimeError("Sales rollups are still being built")
+    return sales_rollups.customer(customer_username)
@@ -0,0 +1,14 @@
+-- Indexes for the paginated purchase history.
+--
+-- Pages are read newest first with keyset pagination on (time, id), so each
+-- query is a range scan of one of these indexes, optionally narrowed to one
+-- customer or one good, and never sorts or skips rows.
+
+create index if not exists purchases_time_id
+    on purchases (time desc, id desc);
+
+create index if not exists purchases_customer_time_id
+    on purchases (customer_id, time desc, id desc);
+
+create index if not exists purchases_good_time_id
+    on purchases (good_id, time desc, id desc);
@@ -0,0 +1,11 @@
+-- Idempotent inserts from the write-behind purchase journal.
+--
+-- Every journaled purchase carries a journal_id generated when it was
+-- journaled. After a crash the journal is flushed again, and the unique
+-- constraint lets the insert skip the purchases that had already reached the
+-- table. Purchases inserted directly leave it null.
+
+alter table purchases add column if not exists journal_id uuid;
+
+create unique index if not exists purchases_journal_id
+    on purchases (journal_id);
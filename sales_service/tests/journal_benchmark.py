@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from app.journal import PurchaseJournal
+from app.models import Purchase
+from loguru import logger
+
+
+class SimulatedSalesTable:
+    """Stands in for the purchases table, taking a fixed time per insert."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.inserts = 0
+        self.rows = 0
+
+    async def record_purchases(self, purchases: list) -> list:
+        await asyncio.sleep(self.latency)
+        self.inserts += 1
+        self.rows += len(purchases)
+        return purchases
+
+
+def report(label: str, latencies: list[float], elapsed: float):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(
+        f"{label:<14}: p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  "
+        f"{len(latencies) / elapsed:8.1f} purchases/s"
+    )
+
+
+async def timed(record, purchases: int, concurrency: int) -> tuple[list, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await record(
+                [Purchase(good_id=index, customer_id="user", amount_deducted=1)]
+            )
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(purchases)))
+    return latencies, time.perf_counter() - started
+
+
+async def benchmark(purchases: int, concurrency: int, latency: float, directory: str):
+    print(
+        f"{purchases} purchases, {concurrency} at a time, "
+        f"{latency * 1000:g} ms per database insert"
+    )
+    table = SimulatedSalesTable(latency)
+    report(
+        "direct insert", *await timed(table.record_purchases, purchases, concurrency)
+    )
+
+    table = SimulatedSalesTable(latency)
+    with tempfile.TemporaryDirectory(dir=directory) as scratch:
+        journal = PurchaseJournal(
+            Path(scratch) / "purchases.journal", table.record_purchases
+        )
+        await journal.open()
+        report("journal", *await timed(journal.append, purchases, concurrency))
+        await journal.close()
+    print(f"{'':<14}  flushed in {table.inserts} inserts of up to {journal.batch_size}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Purchase recording latency: direct insert vs write-behind journal"
+    )
+    parser.add_argument("--purchases", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument(
+        "--dir", default=None, help="where to put the journal (default: system temp)"
+    )
+    args = parser.parse_args()
+    logger.remove()
+
+    asyncio.run(
+        benchmark(args.purchases, args.concurrency, args.latency_ms / 1000, args.dir)
+    )
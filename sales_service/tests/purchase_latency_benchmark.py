@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import socket
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+import uvicorn
+from app import service
+from app.clients import ServiceClient
+from app.price_cache import PriceCache
+from fastapi import FastAPI
+from loguru import logger
+
+inventory_stub = FastAPI()
+customer_stub = FastAPI()
+# Seconds each stub call (and the purchase insert) takes, set from --latency-ms
+STUB_LATENCY: float = 0.0
+
+
+@inventory_stub.get("/api/v1/inventory/{good_id}/availability")
+async def stub_availability(good_id: int):
+    await asyncio.sleep(STUB_LATENCY)
+    return {"count": 1_000_000, "price": 10.0, "version": 1, "price_version": 1}
+
+
+@inventory_stub.put("/api/v1/inventory/deduct/{good_id}")
+async def stub_deduct_inventory(good_id: int, price_version: Optional[int] = None):
+    await asyncio.sleep(STUB_LATENCY)
+    return {"message": "Stock deducted successfully"}
+
+
+@customer_stub.get("/api/v1/customer/get/{username}")
+async def stub_get_customer(username: str):
+    await asyncio.sleep(STUB_LATENCY)
+    return {"data": {"wallet": {"customer_id": username, "amount": 1e9}}}
+
+
+@customer_stub.put("/api/v1/customer/wallet/{username}/deduct")
+async def stub_deduct_wallet(username: str):
+    await asyncio.sleep(STUB_LATENCY)
+    return {"message": "Balance deducted"}
+
+
+class StubSalesTable:
+    def __init__(self):
+        self.rows = itertools.count(1)
+
+    async def record_purchase(self, purchase):
+        await asyncio.sleep(STUB_LATENCY)
+        now = datetime.now(timezone.utc).isoformat()
+        return [{**purchase.model_dump(), "id": next(self.rows), "time": now}]
+
+
+def run_stub(app: FastAPI, port: int, latency: float):
+    global STUB_LATENCY
+    STUB_LATENCY = latency
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def serve(app: FastAPI) -> str:
+    # A separate process, so the stub does not compete with the client for the GIL
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    multiprocessing.Process(
+        target=run_stub, args=(app, port, STUB_LATENCY), daemon=True
+    ).start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def purchase_per_call_clients(inventory_url: str, customer_url: str):
+    # The previous implementation: a new client (and connection) per call
+    with httpx.Client() as client:
+        client.get(f"{inventory_url}/1/availability").json()
+    with httpx.Client() as client:
+        client.put(f"{customer_url}/wallet/user/deduct", json=10.0).json()
+    with httpx.Client() as client:
+        client.put(f"{inventory_url}/deduct/1").json()
+
+
+async def purchase_pooled_clients():
+    good = await service.fetch_good_availability(1)
+    await service.deduct_wallet_balance("user", good["price"])
+    await service.deduct_inventory(1)
+
+
+def purchase_blocking(client: httpx.Client, inventory_url: str, customer_url: str):
+    # A synchronous pipeline inside the event loop: nothing else runs meanwhile
+    good = client.get(f"{inventory_url}/1/availability").json()
+    client.put(f"{customer_url}/wallet/user/deduct", json=good["price"]).json()
+    client.put(f"{inventory_url}/deduct/1").json()
+    time.sleep(STUB_LATENCY)
+
+
+async def cached_prices(purchases: int):
+    # Whole purchases, with prices read every time vs. reused for 5 s
+    service.db_sale = StubSalesTable()
+    for label, ttl in (("price read each time", 0), ("price cached", 5)):
+        service.price_cache = PriceCache(ttl=ttl)
+        latencies = []
+        inventory_calls = service.inventory_client.metrics()["replicas"][0]["requests"]
+        for _ in range(purchases):
+            started = time.perf_counter()
+            await service.process_purchase("user", 1)
+            latencies.append(time.perf_counter() - started)
+        inventory_calls = (
+            service.inventory_client.metrics()["replicas"][0]["requests"]
+            - inventory_calls
+        )
+        report(label, latencies)
+        print(f"{'':<22}  {inventory_calls / purchases:.2f} inventory calls/purchase")
+
+
+async def concurrent_checkouts(checkouts: int, inventory_url: str, customer_url: str):
+    print(f"{checkouts} concurrent checkouts, {STUB_LATENCY * 1000:g} ms per step")
+
+    async def blocking():
+        purchase_blocking(client, inventory_url, customer_url)
+
+    with httpx.Client() as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(blocking() for _ in range(checkouts)))
+        elapsed = time.perf_counter() - started
+    print(f"{'blocking pipeline':<22}: {checkouts / elapsed:8.1f} purchases/s")
+
+    service.db_sale = StubSalesTable()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(service.process_purchase("user", 1) for _ in range(checkouts))
+    )
+    elapsed = time.perf_counter() - started
+    print(f"{'async pipeline':<22}: {checkouts / elapsed:8.1f} purchases/s")
+
+
+def report(label: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<22}: p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+
+
+async def benchmark(purchases: int, checkouts: int):
+    inventory_url = serve(inventory_stub) + "/api/v1/inventory"
+    customer_url = serve(customer_stub) + "/api/v1/customer"
+    print(f"{purchases} sequential purchases (3 downstream calls each) against stubs")
+
+    latencies = []
+    for _ in range(purchases):
+        started = time.perf_counter()
+        purchase_per_call_clients(inventory_url, customer_url)
+        latencies.append(time.perf_counter() - started)
+    report("client per call", latencies)
+
+    service.inventory_client = ServiceClient("Inventory", inventory_url)
+    service.customer_client = ServiceClient("Customer", customer_url)
+    await service.open_clients()
+    try:
+        latencies = []
+        for _ in range(purchases):
+            started = time.perf_counter()
+            await purchase_pooled_clients()
+            latencies.append(time.perf_counter() - started)
+        report("pooled keep-alive", latencies)
+        await cached_prices(purchases)
+        if checkouts:
+            await concurrent_checkouts(checkouts, inventory_url, customer_url)
+    finally:
+        await service.close_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Purchase latency with per-call vs pooled downstream clients"
+    )
+    parser.add_argument("--purchases", type=int, default=500)
+    parser.add_argument(
+        "--checkouts",
+        type=int,
+        default=200,
+        help="concurrent purchases for the throughput comparison (0 to skip)",
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    STUB_LATENCY = args.latency_ms / 1000
+    # Per-call log lines would dominate the timings
+    logger.remove()
+
+    asyncio.run(benchmark(args.purchases, args.checkouts))
@@ -0,0 +1,269 @@
+import asyncio
+
+import httpx
+import pytest
+from app.clients import ServiceClient, parse_urls
+from app.resilience import CircuitBreaker, RetryBudget, deadline
+
+
+def test_client_must_be_opened():
+    service_client = ServiceClient("Inventory", "http://inventory.test")
+    with pytest.raises(RuntimeError, match="Inventory service client is not open"):
+        service_client.client
+
+
+@pytest.mark.asyncio
+async def test_open_reuses_one_pooled_client():
+    limits = httpx.Limits(max_connections=5, max_keepalive_connections=2)
+    service_client = ServiceClient("Inventory", "http://inventory.test", limits)
+
+    await service_client.open()
+    client = service_client.client
+    await service_client.open()
+
+    assert service_client.client is client
+    assert [replica.base_url for replica in service_client.replicas] == [
+        "http://inventory.test"
+    ]
+    await service_client.close()
+    assert client.is_closed
+    await service_client.close()
+
+
+@pytest.mark.asyncio
+async def test_requests_are_relative_to_base_url():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"ok": True})
+
+    service_client = ServiceClient(
+        "Inventory", "http://inventory.test/api/v1/inventory"
+    )
+    await service_client.open()
+    service_client.client._transport = httpx.MockTransport(handler)
+    try:
+        response = await service_client.get("/1/availability")
+    finally:
+        await service_client.close()
+
+    assert response.json() == {"ok": True}
+    assert (
+        str(requests[0].url) == "http://inventory.test/api/v1/inventory/1/availability"
+    )
+
+
+def test_parse_urls():
+    assert parse_urls(" http://a:8003/api/, http://b:8003/api ,") == [
+        "http://a:8003/api",
+        "http://b:8003/api",
+    ]
+    with pytest.raises(ValueError, match="No Inventory service URL configured"):
+        ServiceClient("Inventory", "")
+
+
+@pytest.mark.asyncio
+async def test_least_outstanding_replica_is_chosen():
+    release = asyncio.Event()
+    hosts = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if request.url.path == "/slow":
+            await release.wait()
+        return httpx.Response(200)
+
+    service_client = ServiceClient(
+        "Inventory",
+        "http://a.test,http://b.test",
+        transport=httpx.MockTransport(handler),
+    )
+    await service_client.open()
+    try:
+        slow = asyncio.create_task(service_client.get("/slow"))
+        await asyncio.sleep(0)
+        busy = hosts[0]
+        # While one replica is busy, every other request goes to the idle one
+        for _ in range(5):
+            await service_client.get("/fast")
+        release.set()
+        await slow
+    finally:
+        await service_client.close()
+
+    assert set(hosts[1:]) == {"b.test" if busy == "a.test" else "a.test"}
+    replicas = service_client.metrics()["replicas"]
+    assert sum(replica["requests"] for replica in replicas) == 6
+
+
+@pytest.mark.asyncio
+async def test_failing_replica_is_ejected():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "down.test":
+            raise httpx.ConnectError("Connection refused", request=request)
+        return httpx.Response(500 if request.url.host == "bad.test" else 200)
+
+    service_client = ServiceClient(
+        "Inventory",
+        ["http://down.test", "http://bad.test", "http://up.test"],
+        transport=httpx.MockTransport(handler),
+        eject_after=2,
+        retries=0,
+        breaker=CircuitBreaker(failures=100),
+    )
+    await service_client.open()
+    try:
+        for _ in range(20):
+            try:
+                await service_client.get("/")
+            except RuntimeError:
+                pass
+    finally:
+        await service_client.close()
+
+    replicas = service_client.metrics()["replicas"]
+    metrics = {replica["url"]: replica for replica in replicas}
+    assert not metrics["http://down.test"]["healthy"]
+    assert not metrics["http://bad.test"]["healthy"]
+    assert metrics["http://down.test"]["errors"] == 2
+    assert metrics["http://bad.test"]["errors"] == 2
+    assert metrics["http://up.test"]["requests"] == 16
+    assert metrics["http://up.test"]["errors"] == 0
+
+
+def test_all_ejected_falls_back_to_the_first_due_back():
+    service_client = ServiceClient("Inventory", "http://a.test,http://b.test")
+    first, second = service_client.replicas
+    first.ejected_until = float("inf")
+    second.ejected_until = 1e12
+    assert service_client.pick() is second
+
+
+async def open_client(handler, base_urls="http://a.test,http://b.test", **kwargs):
+    service_client = ServiceClient(
+        "Inventory", base_urls, transport=httpx.MockTransport(handler), **kwargs
+    )
+    await service_client.open()
+    return service_client
+
+
+@pytest.mark.asyncio
+async def test_idempotent_calls_are_retried_on_another_replica():
+    hosts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        return httpx.Response(503 if len(hosts) == 1 else 200)
+
+    service_client = await open_client(handler)
+    try:
+        response = await service_client.get("/1/availability")
+    finally:
+        await service_client.close()
+
+    assert response.status_code == 200
+    assert len(set(hosts)) == 2
+    assert service_client.metrics()["retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unsafe_calls_are_only_retried_if_never_sent():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host)
+        if len(calls) == 1 and request.url.path == "/refused":
+            raise httpx.ConnectError("Connection refused", request=request)
+        return httpx.Response(503 if request.url.path == "/deduct" else 200)
+
+    service_client = await open_client(handler)
+    try:
+        assert (await service_client.put("/refused")).status_code == 200
+        assert (await service_client.put("/deduct")).status_code == 503
+    finally:
+        await service_client.close()
+
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_caps_retries():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(503)
+
+    service_client = await open_client(
+        handler,
+        retries=5,
+        budget=RetryBudget(ratio=0, capacity=2),
+        breaker=CircuitBreaker(failures=100),
+    )
+    try:
+        for _ in range(3):
+            await service_client.get("/")
+    finally:
+        await service_client.close()
+
+    # Two retries in total, then every call gets a single attempt
+    assert len(calls) == 5
+    assert service_client.metrics()["retries_denied"] == 3
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_then_probes():
+    status = {"code": 500}
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(status["code"])
+
+    breaker = CircuitBreaker(failures=2, reset_seconds=3600)
+    service_client = await open_client(handler, breaker=breaker)
+    try:
+        await service_client.get("/")
+        await service_client.get("/")
+        with pytest.raises(RuntimeError, match="Inventory service circuit is open"):
+            await service_client.get("/")
+        assert len(calls) == 2
+
+        breaker.opened_at -= 3600
+        status["code"] = 200
+        assert (await service_client.get("/")).status_code == 200
+    finally:
+        await service_client.close()
+
+    assert service_client.metrics()["circuit"] == {
+        "state": "closed",
+        "consecutive_failures": 0,
+        "opens": 1,
+        "rejected": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_calls_are_bounded_by_the_deadline():
+    timeouts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        timeouts.append(request.extensions["timeout"]["read"])
+        return httpx.Response(200)
+
+    service_client = await open_client(handler, "http://a.test", timeout=2)
+    try:
+        await service_client.get("/")
+        with deadline(0.5):
+            await service_client.get("/")
+        with deadline(-1):
+            with pytest.raises(RuntimeError, match="Deadline exceeded"):
+                await service_client.get("/")
+    finally:
+        await service_client.close()
+
+    assert timeouts[0] == 2
+    assert 0 < timeouts[1] <= 0.5
+    assert len(timeouts) == 2
+    assert service_client.metrics()["deadlines_exceeded"] == 1
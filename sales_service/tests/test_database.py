@@ -1,7 +1,7 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from app.database import SalesTable
+from app.database import PURCHASE_COLUMNS, AsyncSalesTable, SalesTable
 from app.models import Purchase
 
 
@@ -101,3 +101,103 @@ def test_get_purchases_no_records(mock_sales_table, mock_client):
     mock_sales_table.table.select.assert_called_once_with("*")
     mock_execute.assert_called_once()
     assert result == []
+
+
+@pytest.fixture
+def async_sales_table():
+    client_mock = MagicMock()
+    client_mock.postgrest.aclose = AsyncMock()
+    with patch("app.database.acreate_client", AsyncMock(return_value=client_mock)):
+        yield AsyncSalesTable("test_url", "test_key"), client_mock
+
+
+@pytest.mark.asyncio
+async def test_async_sales_table_connects_lazily(async_sales_table):
+    sales_table, client_mock = async_sales_table
+    with pytest.raises(RuntimeError, match="Sales database is not connected"):
+        sales_table.client
+    await sales_table.connect()
+    assert sales_table.client is client_mock
+    await sales_table.close()
+    client_mock.postgrest.aclose.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_async_record_purchase(async_sales_table):
+    sales_table, client_mock = async_sales_table
+    await sales_table.connect()
+    purchase = Purchase(good_id=101, customer_id="C001", amount_deducted=9.99)
+    insert = client_mock.table.return_value.insert
+    insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[{"id": 1}]))
+
+    assert await sales_table.record_purchase(purchase) == [{"id": 1}]
+    client_mock.table.assert_called_with("purchases")
+    insert.assert_called_once_with(purchase.model_dump(exclude={"time"}))
+
+    insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
+    with pytest.raises(Exception, match="Failed to record purchase"):
+        await sales_table.record_purchase(purchase)
+
+
+@pytest.mark.asyncio
+async def test_async_record_purchases_uses_one_insert(async_sales_table):
+    sales_table, client_mock = async_sales_table
+    await sales_table.connect()
+    purchases = [
+        Purchase(good_id=good_id, customer_id="C001", amount_deducted=1.0)
+        for good_id in (1, 2)
+    ]
+    insert = client_mock.table.return_value.insert
+    insert.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{"id": 1}, {"id": 2}])
+    )
+
+    assert await sales_table.record_purchases(purchases) == [{"id": 1}, {"id": 2}]
+    insert.assert_called_once_with(
+        [purchase.model_dump(exclude={"time"}) for purchase in purchases]
+    )
+
+
+@pytest.mark.asyncio
+async def test_async_get_purchases_pushes_filters_down(async_sales_table):
+    sales_table, client_mock = async_sales_table
+    await sales_table.connect()
+    request = MagicMock()
+    for method in ("select", "eq", "gte", "lt", "or_", "order", "limit"):
+        getattr(request, method).return_value = request
+    request.execute = AsyncMock(return_value=MagicMock(data=[{"id": 1}]))
+    client_mock.table.return_value = request
+
+    result = await sales_table.get_purchases(
+        customer_id="C001",
+        good_id=7,
+        since="2023-12-01T00:00:00",
+        until="2024-01-01T00:00:00",
+        before=("2023-12-24T10:00:00", 42),
+        limit=51,
+    )
+
+    assert result == [{"id": 1}]
+    request.select.assert_called_once_with(PURCHASE_COLUMNS)
+    request.eq.assert_any_call("customer_id", "C001")
+    request.eq.assert_any_call("good_id", 7)
+    request.gte.assert_called_once_with("time", "2023-12-01T00:00:00")
+    request.lt.assert_called_once_with("time", "2024-01-01T00:00:00")
+    request.or_.assert_called_once_with(
+        'time.lt."2023-12-24T10:00:00",and(time.eq."2023-12-24T10:00:00",id.lt.42)'
+    )
+    request.limit.assert_called_once_with(51)
+
+
+@pytest.mark.asyncio
+async def test_async_record_journaled_skips_known_entries(async_sales_table):
+    sales_table, client_mock = async_sales_table
+    await sales_table.connect()
+    upsert = client_mock.table.return_value.upsert
+    upsert.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
+    entries = [{"good_id": 1, "journal_id": "a"}]
+
+    assert await sales_table.record_journaled(entries) == []
+    upsert.assert_called_once_with(
+        entries, on_conflict="journal_id", ignore_duplicates=True
+    )
@@ -0,0 +1,80 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from app.idempotency import IdempotencyStore
+
+
+@pytest.mark.asyncio
+async def test_retry_replays_the_first_result():
+    store = IdempotencyStore()
+    operation = AsyncMock(return_value={"message": "Purchase successful"})
+
+    assert await store.run("key", "request", operation) == (
+        {"message": "Purchase successful"},
+        False,
+    )
+    assert await store.run("key", "request", operation) == (
+        {"message": "Purchase successful"},
+        True,
+    )
+    operation.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_retry_waits_for_the_first_attempt():
+    store = IdempotencyStore()
+    release = asyncio.Event()
+    calls = 0
+
+    async def operation():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(store.run("key", "request", operation))
+    retry = asyncio.create_task(store.run("key", "request", operation))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await first == ("done", False)
+    assert await retry == ("done", True)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_refusals_are_replayed_but_failures_are_not():
+    store = IdempotencyStore()
+    refused = AsyncMock(side_effect=ValueError("Amount not enough"))
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Amount not enough"):
+            await store.run("refused", "request", refused)
+    refused.assert_awaited_once()
+
+    failing = AsyncMock(side_effect=[Exception("Timeout"), "done"])
+    with pytest.raises(Exception, match="Timeout"):
+        await store.run("failing", "request", failing)
+    assert await store.run("failing", "request", failing) == ("done", False)
+
+
+@pytest.mark.asyncio
+async def test_key_reused_for_another_request():
+    store = IdempotencyStore()
+    await store.run("key", "first request", AsyncMock())
+    with pytest.raises(ValueError, match="different request"):
+        await store.run("key", "second request", AsyncMock())
+
+
+@pytest.mark.asyncio
+async def test_store_is_bounded_and_expires_keys():
+    store = IdempotencyStore(max_keys=2)
+    for key in ("a", "b", "c"):
+        await store.run(key, "request", AsyncMock())
+    assert len(store) == 2
+    operation = AsyncMock(return_value="again")
+    assert await store.run("a", "request", operation) == ("again", False)
+
+    store = IdempotencyStore(ttl=0)
+    await store.run("a", "request", AsyncMock())
+    assert await store.run("a", "request", operation) == ("again", False)
@@ -0,0 +1,107 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+from app.journal import PurchaseJournal
+from app.models import Purchase
+
+
+def purchase(good_id: int = 1) -> Purchase:
+    return Purchase(good_id=good_id, customer_id="C001", amount_deducted=9.99)
+
+
+def lines(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_append_is_durable_until_flushed(tmp_path):
+    path = tmp_path / "purchases.journal"
+    flush = AsyncMock(return_value=[])
+    journal = PurchaseJournal(path, flush, flush_interval=3600)
+    await journal.open()
+
+    entries = await journal.append([purchase(1), purchase(2)])
+    assert [entry["good_id"] for entry in entries] == [1, 2]
+    assert all(entry["journal_id"] and entry["time"] for entry in entries)
+    assert lines(path) == entries
+    flush.assert_not_called()
+
+    await journal.close()
+    flush.assert_awaited_once_with(entries)
+    assert path.read_text() == ""
+
+
+@pytest.mark.asyncio
+async def test_open_recovers_unflushed_entries(tmp_path):
+    path = tmp_path / "purchases.journal"
+    recorded = [{"good_id": 1, "journal_id": "a"}, {"good_id": 2, "journal_id": "b"}]
+    path.write_text(
+        "".join(json.dumps(entry) + "\n" for entry in recorded) + '{"good_id": 3, "jou'
+    )
+    flush = AsyncMock(return_value=[])
+    journal = PurchaseJournal(path, flush, flush_interval=3600)
+
+    assert await journal.open() == 2
+    await journal.close()
+    flush.assert_awaited_once_with(recorded)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_share_an_fsync(tmp_path):
+    journal = PurchaseJournal(tmp_path / "purchases.journal", AsyncMock(), 1000, 3600)
+    await journal.open()
+    writes = []
+    write = journal._write
+    journal._write = lambda data: writes.append(data) or write(data)
+
+    await asyncio.gather(
+        *(journal.append([purchase(good_id)]) for good_id in range(50))
+    )
+
+    assert len(journal) == 50
+    assert len(writes) < 50
+    journal._write = write
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_flushes_in_batches_and_keeps_failed_entries(tmp_path):
+    path = tmp_path / "purchases.journal"
+    flush = AsyncMock(side_effect=[[], Exception("Database down"), [], []])
+    journal = PurchaseJournal(path, flush, batch_size=2, flush_interval=3600)
+    await journal.open()
+    for good_id in range(3):
+        await journal.append([purchase(good_id)])
+
+    with pytest.raises(Exception, match="Database down"):
+        await journal.flush_all()
+    assert len(journal) == 1
+    assert len(lines(path)) == 3
+
+    await journal.flush_all()
+    assert len(journal) == 0
+    assert path.read_text() == ""
+    assert [len(call.args[0]) for call in flush.await_args_list] == [2, 1, 1]
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_background_flush_when_a_batch_fills(tmp_path):
+    flushed = asyncio.Event()
+    flush = AsyncMock(side_effect=lambda entries: flushed.set() or [])
+    journal = PurchaseJournal(tmp_path / "purchases.journal", flush, 2, 3600)
+    await journal.open()
+
+    await journal.append([purchase(1), purchase(2)])
+    await asyncio.wait_for(flushed.wait(), 1)
+    await journal.close()
+    assert flush.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_append_requires_open_journal(tmp_path):
+    journal = PurchaseJournal(tmp_path / "purchases.journal", AsyncMock())
+    with pytest.raises(RuntimeError, match="not open"):
+        await journal.append([purchase()])
@@ -1,6 +1,6 @@
 from unittest.mock import patch
 
-from app.main import app
+from app.main import app, idempotency_store
 from fastapi.testclient import TestClient
 
 client = TestClient(app)
@@ -9,7 +9,8 @@ client = TestClient(app)
 # Test for the health check endpoint
 def test_health_check_success():
     # Mock `get_purchases` to simulate successful database connection
-    with patch("app.main.get_purchases", return_value=[{"id": 1}, {"id": 2}]):
+    page = {"purchases": [{"id": 1}, {"id": 2}], "next_cursor": None}
+    with patch("app.main.get_purchases", return_value=page):
         response = client.get("/health")
         assert response.status_code == 200
         assert response.json() == {
@@ -29,6 +30,23 @@ def test_health_check_failure():
         assert "error" in response.json()
 
 
+def test_lifespan_opens_and_closes_clients():
+    with patch("app.main.open_clients") as mock_open, patch(
+        "app.main.close_clients"
+    ) as mock_close, patch("app.main.connect_database") as mock_connect, patch(
+        "app.main.close_database"
+    ) as mock_close_database, patch(
+        "app.main.build_sales_rollups"
+    ) as mock_build:
+        with TestClient(app):
+            mock_open.assert_awaited_once()
+            mock_connect.assert_awaited_once()
+            mock_close.assert_not_awaited()
+        mock_close.assert_awaited_once()
+        mock_close_database.assert_awaited_once()
+        mock_build.assert_awaited_once()
+
+
 # Test for fetching all purchases
 def test_fetch_all_purchases_success():
     # Mock `get_purchases` to return a list of purchases
@@ -70,3 +88,117 @@ def test_purchase_good_general_error():
         response = client.post("/api/v1/sales/purchase/testuser/123")
         assert response.status_code == 500
         assert response.json()["detail"] == "Internal server error"
+
+
+def test_checkout_cart():
+    result = {"message": "Checkout successful", "total": 22.5, "units": 3}
+    cart = {"customer_username": "testuser", "items": [{"good_id": 1, "quantity": 3}]}
+    with patch("app.main.checkout", return_value=result) as mock_checkout:
+        response = client.post("/api/v1/sales/checkout", json=cart)
+        assert response.status_code == 200
+        assert response.json() == result
+        assert mock_checkout.call_args.args[0].items[0].quantity == 3
+
+    with patch("app.main.checkout", side_effect=ValueError("Amount not enough")):
+        response = client.post("/api/v1/sales/checkout", json=cart)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Amount not enough"
+
+
+def test_purchase_retry_with_idempotency_key_is_replayed():
+    idempotency_store.clear()
+    headers = {"Idempotency-Key": "9f2c"}
+    result = {"message": "Purchase successful"}
+    with patch("app.main.process_purchase", return_value=result) as mock_purchase:
+        first = client.post("/api/v1/sales/purchase/testuser/1", headers=headers)
+        retry = client.post("/api/v1/sales/purchase/testuser/1", headers=headers)
+        other = client.post("/api/v1/sales/purchase/testuser/2", headers=headers)
+        unkeyed = client.post("/api/v1/sales/purchase/testuser/1")
+
+    assert first.json() == retry.json() == result
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert other.status_code == 400
+    assert unkeyed.status_code == 200
+    assert mock_purchase.call_count == 2
+
+
+def test_purchase_retry_after_downstream_failure_runs_again():
+    idempotency_store.clear()
+    headers = {"Idempotency-Key": "4b1e"}
+    outcomes = [RuntimeError("Failed to fetch good availability"), {"message": "ok"}]
+    with patch("app.main.process_purchase", side_effect=outcomes) as mock_purchase:
+        first = client.post("/api/v1/sales/purchase/testuser/1", headers=headers)
+        retry = client.post("/api/v1/sales/purchase/testuser/1", headers=headers)
+
+    assert first.status_code == 503
+    assert retry.status_code == 200
+    assert "Idempotent-Replayed" not in retry.headers
+    assert mock_purchase.call_count == 2
+
+
+def test_customer_purchase_history():
+    page = {"purchases": [{"id": 3}], "next_cursor": "abc"}
+    with patch("app.main.get_purchases", return_value=page) as mock_get:
+        response = client.get(
+            "/api/v1/sales/customer/testuser?good_id=7&limit=1&cursor=xyz"
+        )
+        assert response.status_code == 200
+        assert response.json() == page
+        query = mock_get.call_args.args[0]
+        assert (query.customer_id, query.good_id, query.limit, query.cursor) == (
+            "testuser",
+            7,
+            1,
+            "xyz",
+        )
+
+    with patch("app.main.get_purchases", side_effect=ValueError("Invalid cursor")):
+        response = client.get("/api/v1/sales/get?cursor=bad")
+        assert response.status_code == 400
+    assert client.get("/api/v1/sales/get?limit=0").status_code == 422
+
+
+def test_sales_rollups_endpoints():
+    rollups = {"built_at": "2023-12-02T00:00:00+00:00", "rollups": []}
+    with patch("app.main.get_sales_rollups", return_value=rollups) as mock_get:
+        response = client.get(
+            "/api/v1/sales/rollups?granularity=hour&good_id=7"
+            "&since=2023-12-01T00:00:00Z"
+        )
+        assert response.status_code == 200
+        assert response.json() == rollups
+        granularity, good_id, since, until = mock_get.call_args.args
+        assert (granularity, good_id, since.day, until) == ("hour", 7, 1, None)
+    assert client.get("/api/v1/sales/rollups?granularity=week").status_code == 422
+
+    with patch(
+        "app.main.get_customer_totals",
+        side_effect=RuntimeError("Sales rollups are still being built"),
+    ):
+        response = client.get("/api/v1/sales/rollups/customers/testuser")
+        assert response.status_code == 503
+
+    with patch(
+        "app.main.build_sales_rollups",
+        side_effect=RuntimeError("Sales rollups are already being rebuilt"),
+    ):
+        assert client.post("/api/v1/sales/rollups/rebuild").status_code == 409
+
+
+def test_upstream_metrics():
+    metrics = {"inventory": [{"url": "http://a", "healthy": True}], "customer": []}
+    with patch("app.main.get_upstream_metrics", return_value=metrics):
+        response = client.get("/api/v1/sales/upstreams")
+        assert response.status_code == 200
+        assert response.json() == metrics
+
+
+def test_purchase_unavailable_downstream():
+    with patch(
+        "app.main.process_purchase",
+        side_effect=RuntimeError("Inventory service circuit is open"),
+    ):
+        response = client.post("/api/v1/sales/purchase/testuser/1")
+        assert response.status_code == 503
+        assert response.json()["detail"] == "Inventory service circuit is open"
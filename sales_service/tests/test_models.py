@@ -1,5 +1,8 @@
 import pytest
-from app.models import Purchase  # Replace with the correct import path if different
+from app.models import (  # Replace with the correct import path if different
+    Cart,
+    Purchase,
+)
 from pydantic import ValidationError
 
 
@@ -45,3 +48,18 @@ def test_purchase_invalid_good_id_type():
     data = {"good_id": "invalid_id", "customer_id": "cust123", "amount_deducted": 100.0}
     with pytest.raises(ValidationError):
         Purchase(**data)
+
+
+def test_cart_rejects_repeated_goods():
+    """Test that a good may only appear on one cart line."""
+    with pytest.raises(ValidationError, match="one cart line only"):
+        Cart(
+            customer_username="cust123",
+            items=[{"good_id": 1}, {"good_id": 1, "quantity": 2}],
+        )
+
+
+def test_cart_requires_items():
+    """Test that an empty cart is rejected."""
+    with pytest.raises(ValidationError):
+        Cart(customer_username="cust123", items=[])
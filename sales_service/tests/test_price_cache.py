@@ -0,0 +1,49 @@
+from app.price_cache import PriceCache
+
+
+def test_prices_expire():
+    cache = PriceCache(ttl=60)
+    cache.put(1, 9.5, 2)
+    assert cache.get(1) == (9.5, 2)
+
+    cache._entries[1].expires_at -= 60
+    assert cache.get(1) is None
+    assert len(cache) == 0
+    assert cache.metrics() == {
+        "goods": 0,
+        "hits": 1,
+        "misses": 1,
+        "invalidations": 0,
+    }
+
+
+def test_least_recently_used_good_is_dropped():
+    cache = PriceCache(ttl=60, max_goods=2)
+    cache.put(1, 1.0, 1)
+    cache.put(2, 2.0, 1)
+    cache.get(1)
+    cache.put(3, 3.0, 1)
+
+    assert cache.get(2) is None
+    assert cache.get(1) == (1.0, 1)
+    assert cache.get(3) == (3.0, 1)
+
+
+def test_unversioned_prices_are_not_cached():
+    cache = PriceCache(ttl=60)
+    cache.put(1, 9.5, None)
+    assert cache.get(1) is None
+
+    disabled = PriceCache(ttl=0)
+    disabled.put(1, 9.5, 2)
+    assert disabled.get(1) is None
+
+
+def test_invalidate():
+    cache = PriceCache(ttl=60)
+    cache.put(1, 9.5, 2)
+    cache.invalidate(1)
+    cache.invalidate(1)
+
+    assert cache.get(1) is None
+    assert cache.metrics()["invalidations"] == 1
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from app.resilience import CircuitBreaker, RetryBudget, deadline, remaining
+
+
+def test_deadlines_only_shorten_unless_detached():
+    assert remaining() is None
+    with deadline(10):
+        with deadline(60):
+            assert 9 < remaining() <= 10
+        with deadline(1):
+            assert remaining() <= 1
+            with deadline(60, detached=True):
+                assert remaining() > 59
+    assert remaining() is None
+
+
+@pytest.mark.asyncio
+async def test_deadline_reaches_concurrent_tasks():
+    async def left():
+        return remaining()
+
+    with deadline(5):
+        results = await asyncio.gather(left(), left())
+    assert all(0 < result <= 5 for result in results)
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, capacity=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_circuit_breaker_half_open_probe():
+    breaker = CircuitBreaker(failures=2, reset_seconds=3600)
+    breaker.record(True)
+    assert breaker.state == "closed"
+    breaker.record(True)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    breaker.opened_at -= 3600
+    assert breaker.state == "half_open"
+    # A single probe at a time
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "open"
+    assert breaker.opens == 2
+
+    breaker.opened_at -= 3600
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "closed"
+    assert breaker.allow()
@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+from app.rollups import SalesRollups
+
+
+def purchase(purchase_id, good_id, customer_id, amount, time):
+    return {
+        "id": purchase_id,
+        "good_id": good_id,
+        "customer_id": customer_id,
+        "amount_deducted": amount,
+        "time": time,
+    }
+
+
+@pytest.fixture
+def rollups():
+    rollups = SalesRollups()
+    rollups.begin_build()
+    rollups.add_page(
+        [
+            purchase(1, 7, "alice", 10.0, "2023-12-01T10:15:00+00:00"),
+            purchase(2, 7, "bob", 10.0, "2023-12-01T10:45:00.123456+00:00"),
+            purchase(3, 3, "alice", 0.1, "2023-12-01T23:59:59+00:00"),
+            purchase(4, 7, "alice", 12.5, "2023-12-02T01:00:00+00:00"),
+        ]
+    )
+    rollups.finish_build()
+    return rollups
+
+
+def test_daily_and_hourly_revenue(rollups):
+    assert rollups.ready
+    assert rollups.revenue("day") == [
+        {
+            "good_id": 3,
+            "start": "2023-12-01T00:00:00+00:00",
+            "units": 1,
+            "revenue": 0.1,
+        },
+        {
+            "good_id": 7,
+            "start": "2023-12-01T00:00:00+00:00",
+            "units": 2,
+            "revenue": 20.0,
+        },
+        {
+            "good_id": 7,
+            "start": "2023-12-02T00:00:00+00:00",
+            "units": 1,
+            "revenue": 12.5,
+        },
+    ]
+    assert rollups.revenue("hour", good_id=7) == [
+        {
+            "good_id": 7,
+            "start": "2023-12-01T10:00:00+00:00",
+            "units": 2,
+            "revenue": 20.0,
+        },
+        {
+            "good_id": 7,
+            "start": "2023-12-02T01:00:00+00:00",
+            "units": 1,
+            "revenue": 12.5,
+        },
+    ]
+
+
+def test_time_range(rollups):
+    # The bucket containing `since` is included; buckets from `until` on are not
+    hours = rollups.revenue(
+        "hour", since=datetime(2023, 12, 1, 10, 30), until=datetime(2023, 12, 2, 1)
+    )
+    assert [(row["good_id"], row["start"][11:13]) for row in hours] == [
+        (7, "10"),
+        (3, "23"),
+    ]
+    assert rollups.revenue("day", good_id=99) == []
+
+
+def test_customer_totals(rollups):
+    assert rollups.customer("alice") == {
+        "customer_id": "alice",
+        "units": 3,
+        "revenue": 22.6,
+    }
+    assert rollups.customer("carol") == {
+        "customer_id": "carol",
+        "units": 0,
+        "revenue": 0.0,
+    }
+
+
+def test_incremental_purchases_out_of_order(rollups):
+    rollups.add([purchase(6, 3, "bob", 1.0, "2023-11-30T12:00:00+00:00")])
+    rollups.add([purchase(5, 3, "bob", 1.0, "2023-12-01T23:00:00")])
+    days = rollups.revenue("day", good_id=3)
+    assert [(row["start"][:10], row["units"]) for row in days] == [
+        ("2023-11-30", 1),
+        ("2023-12-01", 2),
+    ]
+    assert len(rollups) == 6
+
+
+def test_rebuild_keeps_purchases_recorded_meanwhile(rollups):
+    rollups.begin_build()
+    with pytest.raises(RuntimeError, match="already being rebuilt"):
+        rollups.begin_build()
+    late = purchase(5, 7, "bob", 10.0, "2023-12-02T02:00:00+00:00")
+    read = purchase(6, 7, "bob", 10.0, "2023-12-02T03:00:00+00:00")
+    rollups.add([late, read])
+    # The previous figures are served until the rebuild finishes
+    assert len(rollups) == 6
+    rollups.add_page([purchase(1, 7, "alice", 10.0, "2023-12-01T10:15:00+00:00")])
+    rollups.add_page([read])
+    rollups.finish_build()
+
+    assert len(rollups) == 3
+    assert rollups.customer("bob")["units"] == 2
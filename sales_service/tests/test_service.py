@@ -1,319 +1,619 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from app.models import Cart, Purchase, PurchaseQuery
 from app.service import (
+    build_sales_rollups,
+    checkout,
+    decode_cursor,
     deduct_inventory,
     deduct_wallet_balance,
+    fetch_good_availability,
     fetch_good_details,
+    fetch_goods_availability,
+    fetch_wallet_balance,
     get_purchases,
+    get_sales_rollups,
+    price_cache,
     process_purchase,
+    record_purchases,
+    sales_rollups,
 )
 from fastapi import HTTPException
 
-# Constants used in the service module
-INVENTORY_SERVICE_URL = "http://127.0.0.1:8002/api/v1/inventory"
-CUSTOMER_SERVICE_URL = "http://127.0.0.1:8001/api/v1/customer"
-
 
 # Tests for fetch_good_details function
-def test_fetch_good_details_success():
+@pytest.mark.asyncio
+async def test_fetch_good_details_success():
     # Arrange
     good_id = 123
     expected_response = {"id": good_id, "name": "Test Good", "price": 10.0}
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.inventory_client.get") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = expected_response
-        mock_client_instance.get.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act
-        result = fetch_good_details(good_id)
+        result = await fetch_good_details(good_id)
 
         # Assert
-        mock_client_instance.get.assert_called_once_with(
-            f"{INVENTORY_SERVICE_URL}/{good_id}"
-        )
+        mock_request.assert_awaited_once_with(f"/{good_id}")
         assert result == expected_response
 
 
-def test_fetch_good_details_not_found():
+@pytest.mark.asyncio
+async def test_fetch_good_details_not_found():
     # Arrange
     good_id = 123
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.inventory_client.get") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 404
-        mock_client_instance.get.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act & Assert
         with pytest.raises(ValueError, match=f"Good with ID '{good_id}' not found"):
-            fetch_good_details(good_id)
+            await fetch_good_details(good_id)
 
 
-def test_fetch_good_details_error():
+@pytest.mark.asyncio
+async def test_fetch_good_details_error():
     # Arrange
     good_id = 123
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.inventory_client.get") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 500
-        mock_client_instance.get.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act & Assert
         with pytest.raises(ValueError, match="Failed to fetch good details"):
-            fetch_good_details(good_id)
+            await fetch_good_details(good_id)
+
+
+@pytest.mark.asyncio
+async def test_fetch_good_availability_success():
+    availability = {"count": 5, "price": 10.0, "version": 2}
+
+    with patch("app.service.inventory_client.get") as mock_request:
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = availability
+        mock_request.return_value = mock_response
+
+        assert await fetch_good_availability(123) == availability
+        mock_request.assert_awaited_once_with("/123/availability")
+
+
+@pytest.mark.asyncio
+async def test_fetch_good_availability_not_found():
+    with patch("app.service.inventory_client.get") as mock_request:
+        mock_request.return_value = MagicMock(status_code=404)
+
+        with pytest.raises(ValueError, match="Good with ID '123' not found"):
+            await fetch_good_availability(123)
+
+
+@pytest.mark.asyncio
+async def test_fetch_wallet_balance():
+    body = {"message": "ok", "data": {"wallet": {"customer_id": "u", "amount": 42.5}}}
+    with patch("app.service.customer_client.get") as mock_request:
+        mock_request.return_value = MagicMock(status_code=200, json=lambda: body)
+        assert await fetch_wallet_balance("u") == 42.5
+        mock_request.assert_awaited_once_with("/get/u")
+
+    with patch("app.service.customer_client.get") as mock_request:
+        mock_request.return_value = MagicMock(status_code=404)
+        with pytest.raises(ValueError, match="Customer 'u' not found"):
+            await fetch_wallet_balance("u")
 
 
 # Tests for deduct_wallet_balance function
-def test_deduct_wallet_balance_success():
+@pytest.mark.asyncio
+async def test_deduct_wallet_balance_success():
     # Arrange
     customer_username = "testuser"
     amount = 10.0
     expected_response = {"message": "Balance deducted"}
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.customer_client.put") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = expected_response
-        mock_client_instance.put.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act
-        result = deduct_wallet_balance(customer_username, amount)
+        result = await deduct_wallet_balance(customer_username, amount)
 
         # Assert
-        mock_client_instance.put.assert_called_once_with(
-            f"{CUSTOMER_SERVICE_URL}/wallet/{customer_username}/deduct", json=amount
+        mock_request.assert_awaited_once_with(
+            f"/wallet/{customer_username}/deduct", json=amount
         )
         assert result == expected_response
 
 
-def test_deduct_wallet_balance_customer_not_found():
+@pytest.mark.asyncio
+async def test_deduct_wallet_balance_customer_not_found():
     # Arrange
     customer_username = "testuser"
     amount = 10.0
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.customer_client.put") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 404
-        mock_client_instance.put.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act & Assert
         with pytest.raises(
             ValueError,
             match=f"Customer '{customer_username}' not found in the database",
         ):
-            deduct_wallet_balance(customer_username, amount)
+            await deduct_wallet_balance(customer_username, amount)
 
 
-def test_deduct_wallet_balance_insufficient_funds():
+@pytest.mark.asyncio
+async def test_deduct_wallet_balance_insufficient_funds():
     # Arrange
     customer_username = "testuser"
     amount = 10.0
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.customer_client.put") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 400
-        mock_client_instance.put.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act & Assert
         with pytest.raises(ValueError, match="Amount not enough"):
-            deduct_wallet_balance(customer_username, amount)
+            await deduct_wallet_balance(customer_username, amount)
 
 
-def test_deduct_wallet_balance_error():
+@pytest.mark.asyncio
+async def test_deduct_wallet_balance_error():
     # Arrange
     customer_username = "testuser"
     amount = 10.0
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.customer_client.put") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 500
-        mock_client_instance.put.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act & Assert
-        with pytest.raises(ValueError, match="Failed to deduct wallet balance"):
-            deduct_wallet_balance(customer_username, amount)
+        with pytest.raises(RuntimeError, match="Failed to deduct wallet balance"):
+            await deduct_wallet_balance(customer_username, amount)
 
 
 # Tests for deduct_inventory function
-def test_deduct_inventory_success():
+@pytest.mark.asyncio
+async def test_deduct_inventory_success():
     # Arrange
     good_id = 123
     expected_response = {"message": "Inventory deducted"}
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.inventory_client.put") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = expected_response
-        mock_client_instance.put.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act
-        result = deduct_inventory(good_id)
+        result = await deduct_inventory(good_id)
 
         # Assert
-        mock_client_instance.put.assert_called_once_with(
-            f"{INVENTORY_SERVICE_URL}/deduct/{good_id}"
-        )
+        mock_request.assert_awaited_once_with(f"/deduct/{good_id}", params=None)
         assert result == expected_response
 
 
-def test_deduct_inventory_not_found():
+@pytest.mark.asyncio
+async def test_deduct_inventory_not_found():
     # Arrange
     good_id = 123
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.inventory_client.put") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 404
-        mock_client_instance.put.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act & Assert
         with pytest.raises(ValueError, match=f"Good with ID '{good_id}' not found"):
-            deduct_inventory(good_id)
+            await deduct_inventory(good_id)
 
 
-def test_deduct_inventory_stock_zero():
+@pytest.mark.asyncio
+async def test_deduct_inventory_stock_zero():
     # Arrange
     good_id = 123
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.inventory_client.put") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 400
-        mock_client_instance.put.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act & Assert
         with pytest.raises(ValueError, match="Stock already zero"):
-            deduct_inventory(good_id)
+            await deduct_inventory(good_id)
 
 
-def test_deduct_inventory_error():
+@pytest.mark.asyncio
+async def test_deduct_inventory_error():
     # Arrange
     good_id = 123
 
-    with patch("app.service.httpx.Client") as mock_client_class:
-        mock_client_instance = mock_client_class.return_value.__enter__.return_value
+    with patch("app.service.inventory_client.put") as mock_request:
         mock_response = MagicMock()
         mock_response.status_code = 500
-        mock_client_instance.put.return_value = mock_response
+        mock_request.return_value = mock_response
 
         # Act & Assert
-        with pytest.raises(ValueError, match="Failed to deduct inventory"):
-            deduct_inventory(good_id)
+        with pytest.raises(RuntimeError, match="Failed to deduct inventory"):
+            await deduct_inventory(good_id)
+
+
+@pytest.mark.asyncio
+async def test_deduct_inventory_at_price_version():
+    with patch("app.service.inventory_client.put") as mock_request:
+        mock_request.return_value = MagicMock(status_code=409)
+
+        with pytest.raises(RuntimeError, match="The price of the good has changed"):
+            await deduct_inventory(123, price_version=4)
+        mock_request.assert_awaited_once_with(
+            "/deduct/123", params={"price_version": 4}
+        )
 
 
 # Tests for process_purchase function
-def test_process_purchase_success():
+@pytest.fixture
+def wallet_balance():
+    with patch("app.service.fetch_wallet_balance", return_value=100.0) as mock_fetch:
+        yield mock_fetch
+
+
+@pytest.mark.asyncio
+async def test_process_purchase_success(wallet_balance):
     # Arrange
     customer_username = "testuser"
     good_id = 123
     price = 10.0
-    good_details = {"id": good_id, "name": "Test Good", "price": price}
+    good_details = {"count": 5, "price": price, "version": 1}
 
-    with patch("app.service.fetch_good_details") as mock_fetch_good_details, patch(
+    with patch(
+        "app.service.fetch_good_availability"
+    ) as mock_fetch_good_availability, patch(
         "app.service.deduct_wallet_balance"
     ) as mock_deduct_wallet_balance, patch(
         "app.service.deduct_inventory"
     ) as mock_deduct_inventory, patch(
-        "app.service.db_sale"
-    ) as mock_db_sale:
+        "app.service.db_sale.record_purchase"
+    ) as mock_record_purchase:
 
-        mock_fetch_good_details.return_value = good_details
+        mock_fetch_good_availability.return_value = good_details
         mock_deduct_wallet_balance.return_value = {"message": "Balance deducted"}
         mock_deduct_inventory.return_value = {"message": "Inventory deducted"}
-        mock_db_sale.record_purchase.return_value = None
+        row = {
+            "id": 1,
+            "good_id": good_id,
+            "customer_id": customer_username,
+            "amount_deducted": price,
+            "time": "2023-12-01T10:00:00+00:00",
+        }
+        mock_record_purchase.return_value = [row]
 
         # Act
-        result = process_purchase(customer_username, good_id)
+        with patch("app.service.sales_rollups") as mock_rollups:
+            result = await process_purchase(customer_username, good_id)
 
         # Assert
-        mock_fetch_good_details.assert_called_once_with(good_id)
+        mock_fetch_good_availability.assert_called_once_with(good_id)
         mock_deduct_wallet_balance.assert_called_once_with(customer_username, price)
-        mock_deduct_inventory.assert_called_once_with(good_id)
-        mock_db_sale.record_purchase.assert_called_once()
+        mock_deduct_inventory.assert_called_once_with(good_id, None)
+        mock_record_purchase.assert_awaited_once()
+        mock_rollups.add.assert_called_once_with([row])
         assert result == {"message": "Purchase successful"}
 
 
-def test_process_purchase_fetch_good_details_error():
+@pytest.mark.asyncio
+async def test_process_purchase_fetch_good_availability_error(wallet_balance):
     # Arrange
     customer_username = "testuser"
     good_id = 123
 
-    with patch("app.service.fetch_good_details") as mock_fetch_good_details, patch(
-        "app.service.logger"
-    ) as mock_logger:
+    with patch(
+        "app.service.fetch_good_availability"
+    ) as mock_fetch_good_availability, patch("app.service.logger") as mock_logger:
 
-        mock_fetch_good_details.side_effect = ValueError("Good not found")
+        mock_fetch_good_availability.side_effect = ValueError("Good not found")
 
         # Act & Assert
         with pytest.raises(ValueError, match="Good not found"):
-            process_purchase(customer_username, good_id)
+            await process_purchase(customer_username, good_id)
 
-        mock_fetch_good_details.assert_called_once_with(good_id)
+        mock_fetch_good_availability.assert_called_once_with(good_id)
         mock_logger.info.assert_called_with(
             f"Processing purchase for {customer_username} and good {good_id}"
         )
 
 
-def test_process_purchase_deduct_wallet_balance_error():
+@pytest.mark.asyncio
+async def test_process_purchase_deduct_wallet_balance_error(wallet_balance):
     # Arrange
     customer_username = "testuser"
     good_id = 123
     price = 10.0
-    good_details = {"id": good_id, "name": "Test Good", "price": price}
+    good_details = {"count": 5, "price": price, "version": 1}
 
-    with patch("app.service.fetch_good_details") as mock_fetch_good_details, patch(
+    with patch(
+        "app.service.fetch_good_availability"
+    ) as mock_fetch_good_availability, patch(
         "app.service.deduct_wallet_balance"
     ) as mock_deduct_wallet_balance:
 
-        mock_fetch_good_details.return_value = good_details
+        mock_fetch_good_availability.return_value = good_details
         mock_deduct_wallet_balance.side_effect = ValueError("Insufficient funds")
 
         # Act & Assert
         with pytest.raises(ValueError, match="Insufficient funds"):
-            process_purchase(customer_username, good_id)
+            await process_purchase(customer_username, good_id)
 
-        mock_fetch_good_details.assert_called_once_with(good_id)
+        mock_fetch_good_availability.assert_called_once_with(good_id)
         mock_deduct_wallet_balance.assert_called_once_with(customer_username, price)
 
 
-def test_process_purchase_deduct_inventory_error():
+@pytest.mark.asyncio
+async def test_process_purchase_deduct_inventory_error(wallet_balance):
     # Arrange
     customer_username = "testuser"
     good_id = 123
     price = 10.0
-    good_details = {"id": good_id, "name": "Test Good", "price": price}
+    good_details = {"count": 5, "price": price, "version": 1}
 
-    with patch("app.service.fetch_good_details") as mock_fetch_good_details, patch(
+    with patch(
+        "app.service.fetch_good_availability"
+    ) as mock_fetch_good_availability, patch(
         "app.service.deduct_wallet_balance"
     ) as mock_deduct_wallet_balance, patch(
         "app.service.deduct_inventory"
-    ) as mock_deduct_inventory:
+    ) as mock_deduct_inventory, patch(
+        "app.service.charge_wallet_balance"
+    ) as mock_refund:
 
-        mock_fetch_good_details.return_value = good_details
+        mock_fetch_good_availability.return_value = good_details
         mock_deduct_wallet_balance.return_value = {"message": "Balance deducted"}
         mock_deduct_inventory.side_effect = ValueError("Stock already zero")
 
         # Act & Assert
         with pytest.raises(ValueError, match="Stock already zero"):
-            process_purchase(customer_username, good_id)
+            await process_purchase(customer_username, good_id)
 
-        mock_fetch_good_details.assert_called_once_with(good_id)
+        mock_fetch_good_availability.assert_called_once_with(good_id)
         mock_deduct_wallet_balance.assert_called_once_with(customer_username, price)
-        mock_deduct_inventory.assert_called_once_with(good_id)
+        mock_deduct_inventory.assert_called_once_with(good_id, None)
+        mock_refund.assert_awaited_once_with(customer_username, price)
+
+
+@pytest.mark.asyncio
+async def test_process_purchase_record_error_is_undone(wallet_balance):
+    with patch(
+        "app.service.fetch_good_availability",
+        return_value={"count": 5, "price": 10.0, "version": 1},
+    ), patch("app.service.deduct_wallet_balance"), patch(
+        "app.service.deduct_inventory"
+    ), patch(
+        "app.service.record_purchases", side_effect=Exception("Insert failed")
+    ), patch(
+        "app.service.charge_wallet_balance"
+    ) as mock_refund, patch(
+        "app.service.restock_inventory_batch"
+    ) as mock_restock:
+        with pytest.raises(Exception, match="Insert failed"):
+            await process_purchase("testuser", 123)
+
+        mock_refund.assert_awaited_once_with("testuser", 10.0)
+        lines = mock_restock.await_args.args[0]
+        assert [(line.good_id, line.quantity) for line in lines] == [(123, 1)]
+
+
+@pytest.mark.asyncio
+async def test_process_purchase_out_of_stock_skips_wallet(wallet_balance):
+    with patch(
+        "app.service.fetch_good_availability",
+        return_value={"count": 0, "price": 10.0, "version": 1},
+    ), patch("app.service.deduct_wallet_balance") as mock_deduct_wallet_balance:
+        with pytest.raises(ValueError, match="Stock already zero"):
+            await process_purchase("testuser", 123)
+        mock_deduct_wallet_balance.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_process_purchase_insufficient_balance_skips_wallet(wallet_balance):
+    wallet_balance.return_value = 5.0
+    with patch(
+        "app.service.fetch_good_availability",
+        return_value={"count": 3, "price": 10.0, "version": 1},
+    ), patch("app.service.deduct_wallet_balance") as mock_deduct_wallet_balance:
+        with pytest.raises(ValueError, match="Amount not enough"):
+            await process_purchase("testuser", 123)
+        mock_deduct_wallet_balance.assert_not_called()
+    wallet_balance.assert_awaited_once_with("testuser")
+
+
+@pytest.fixture
+def cached_prices():
+    price_cache.clear()
+    yield price_cache
+    price_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_process_purchase_reuses_cached_price(wallet_balance, cached_prices):
+    availability = {"count": 5, "price": 10.0, "version": 1, "price_version": 3}
+    with patch(
+        "app.service.fetch_good_availability", return_value=availability
+    ) as mock_fetch_good_availability, patch(
+        "app.service.deduct_wallet_balance"
+    ) as mock_deduct_wallet_balance, patch(
+        "app.service.deduct_inventory"
+    ) as mock_deduct_inventory, patch(
+        "app.service.record_purchases"
+    ):
+        await process_purchase("testuser", 123)
+        await process_purchase("testuser", 123)
+
+        mock_fetch_good_availability.assert_awaited_once_with(123)
+        assert mock_deduct_wallet_balance.await_count == 2
+        mock_deduct_wallet_balance.assert_awaited_with("testuser", 10.0)
+        assert mock_deduct_inventory.await_args_list[1].args == (123, 3)
+    # The balance is only read alongside the availability
+    wallet_balance.assert_awaited_once_with("testuser")
+    assert cached_prices.metrics()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_purchase_cache_hit_makes_two_calls(
+    wallet_balance, cached_prices
+):
+    cached_prices.put(123, 10.0, 3)
+    with patch(
+        "app.service.fetch_good_availability"
+    ) as mock_fetch_good_availability, patch(
+        "app.service.deduct_wallet_balance"
+    ) as mock_deduct_wallet_balance, patch(
+        "app.service.deduct_inventory"
+    ) as mock_deduct_inventory, patch(
+        "app.service.record_purchases"
+    ):
+        await process_purchase("testuser", 123)
+
+        mock_fetch_good_availability.assert_not_called()
+        wallet_balance.assert_not_called()
+        mock_deduct_wallet_balance.assert_awaited_once_with("testuser", 10.0)
+        mock_deduct_inventory.assert_awaited_once_with(123, 3)
+
+        # A wallet that cannot cover the price is refused by the debit itself
+        mock_deduct_wallet_balance.side_effect = ValueError("Amount not enough")
+        with pytest.raises(ValueError, match="Amount not enough"):
+            await process_purchase("testuser", 123)
+        assert mock_deduct_inventory.await_count == 1
+    wallet_balance.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_process_purchase_stale_price_is_refunded(wallet_balance, cached_prices):
+    cached_prices.put(123, 10.0, 3)
+    with patch("app.service.deduct_wallet_balance"), patch(
+        "app.service.deduct_inventory",
+        side_effect=RuntimeError("The price of the good has changed, please try again"),
+    ), patch("app.service.charge_wallet_balance") as mock_refund, patch(
+        "app.service.record_purchases"
+    ) as mock_record_purchases:
+        with pytest.raises(RuntimeError, match="price of the good has changed"):
+            await process_purchase("testuser", 123)
+
+        mock_refund.assert_awaited_once_with("testuser", 10.0)
+        mock_record_purchases.assert_not_called()
+    assert cached_prices.get(123) is None
+
+
+# Tests for checkout function
+@pytest.fixture
+def cart():
+    return Cart(
+        customer_username="testuser",
+        items=[{"good_id": 1, "quantity": 2}, {"good_id": 2, "quantity": 1}],
+    )
+
+
+@pytest.fixture
+def cart_goods():
+    return {
+        1: {"id": 1, "count": 5, "price": 10.0, "version": 1},
+        2: {"id": 2, "count": 1, "price": 2.5, "version": 4},
+    }
+
+
+@pytest.mark.asyncio
+async def test_fetch_goods_availability():
+    body = {
+        "goods": [{"id": 1, "count": 5, "price": 10.0, "version": 1}],
+        "missing": [],
+    }
+    with patch("app.service.inventory_client.get") as mock_request:
+        mock_request.return_value = MagicMock(status_code=200, json=lambda: body)
+        assert await fetch_goods_availability([1, 2]) == {1: body["goods"][0]}
+        mock_request.assert_awaited_once_with("/availability", params={"ids": "1,2"})
+
+
+@pytest.mark.asyncio
+async def test_checkout_batches_every_step(cart, cart_goods):
+    with patch("app.service.fetch_goods_availability", return_value=cart_goods), patch(
+        "app.service.fetch_wallet_balance", return_value=100.0
+    ), patch("app.service.deduct_wallet_balance") as mock_debit, patch(
+        "app.service.deduct_inventory_batch"
+    ) as mock_deduct, patch(
+        "app.service.db_sale.record_purchases"
+    ) as mock_record:
+        result = await checkout(cart)
+
+    assert result == {"message": "Checkout successful", "total": 22.5, "units": 3}
+    mock_debit.assert_awaited_once_with("testuser", 22.5)
+    mock_deduct.assert_awaited_once_with(cart.items)
+    (purchases,) = mock_record.await_args.args
+    assert [purchase.good_id for purchase in purchases] == [1, 1, 2]
+    assert [purchase.amount_deducted for purchase in purchases] == [10.0, 10.0, 2.5]
+
+
+@pytest.mark.asyncio
+async def test_checkout_refuses_short_stock_before_charging(cart, cart_goods):
+    cart_goods[2]["count"] = 0
+    with patch("app.service.fetch_goods_availability", return_value=cart_goods), patch(
+        "app.service.fetch_wallet_balance", return_value=100.0
+    ), patch("app.service.deduct_wallet_balance") as mock_debit:
+        with pytest.raises(ValueError, match=r"Insufficient stock for goods: \[2\]"):
+            await checkout(cart)
+    mock_debit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_checkout_refunds_when_stock_deduction_fails(cart, cart_goods):
+    with patch("app.service.fetch_goods_availability", return_value=cart_goods), patch(
+        "app.service.fetch_wallet_balance", return_value=100.0
+    ), patch("app.service.deduct_wallet_balance"), patch(
+        "app.service.deduct_inventory_batch",
+        side_effect=ValueError("No stock was deducted"),
+    ), patch(
+        "app.service.charge_wallet_balance"
+    ) as mock_refund, patch(
+        "app.service.db_sale.record_purchases"
+    ) as mock_record:
+        with pytest.raises(ValueError, match="No stock was deducted"):
+            await checkout(cart)
+    mock_refund.assert_awaited_once_with("testuser", 22.5)
+    mock_record.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_checkout_undoes_charge_and_stock_when_recording_fails(cart, cart_goods):
+    with patch("app.service.fetch_goods_availability", return_value=cart_goods), patch(
+        "app.service.fetch_wallet_balance", return_value=100.0
+    ), patch("app.service.deduct_wallet_balance"), patch(
+        "app.service.deduct_inventory_batch"
+    ), patch(
+        "app.service.db_sale.record_purchases", side_effect=Exception("Insert failed")
+    ), patch(
+        "app.service.charge_wallet_balance"
+    ) as mock_refund, patch(
+        "app.service.restock_inventory_batch"
+    ) as mock_restock:
+        with pytest.raises(Exception, match="Insert failed"):
+            await checkout(cart)
+    mock_refund.assert_awaited_once_with("testuser", 22.5)
+    mock_restock.assert_awaited_once_with(cart.items)
 
 
 # Tests for get_purchases function
-def test_get_purchases_success():
+@pytest.mark.asyncio
+async def test_get_purchases_success():
     # Arrange
     purchases = [
         {
@@ -324,39 +624,109 @@ def test_get_purchases_success():
             "time": "2023-12-01T10:00:00",
         }
     ]
-    expected_result = [
-        {
-            "id": 1,
-            "good_id": 123,
-            "customer_id": "testuser",
-            "amount_deducted": 10.0,
-            "time": "2023-12-01T10:00:00",
-        }
-    ]
-    with patch("app.service.db_sale") as mock_db_sale:
-        mock_db_sale.get_purchases.return_value = purchases
+    expected_result = {"purchases": purchases, "next_cursor": None}
+    with patch("app.service.db_sale.get_purchases") as mock_get_purchases:
+        mock_get_purchases.return_value = purchases
 
         # Act
-        result = get_purchases()
+        result = await get_purchases()
 
         # Assert
-        mock_db_sale.get_purchases.assert_called_once()
+        mock_get_purchases.assert_awaited_once()
         assert result == expected_result
 
 
-def test_get_purchases_failure():
+@pytest.mark.asyncio
+async def test_get_purchases_failure():
     # Arrange
-    with patch("app.service.db_sale") as mock_db_sale, patch(
+    with patch("app.service.db_sale.get_purchases") as mock_get_purchases, patch(
         "app.service.logger"
     ) as mock_logger:
 
-        mock_db_sale.get_purchases.side_effect = Exception("Database error")
+        mock_get_purchases.side_effect = Exception("Database error")
 
         # Act & Assert
         with pytest.raises(HTTPException) as exc_info:
-            get_purchases()
+            await get_purchases()
 
-        mock_db_sale.get_purchases.assert_called_once()
+        mock_get_purchases.assert_awaited_once()
         mock_logger.exception.assert_called_once()
         assert exc_info.value.status_code == 500
         assert exc_info.value.detail == "Database error"
+
+
+@pytest.mark.asyncio
+async def test_get_purchases_pages_with_a_cursor():
+    purchases = [
+        {"id": purchase_id, "time": f"2023-12-0{purchase_id}T10:00:00+00:00"}
+        for purchase_id in (3, 2, 1)
+    ]
+    with patch("app.service.db_sale.get_purchases") as mock_get_purchases:
+        mock_get_purchases.return_value = purchases
+        page = await get_purchases(PurchaseQuery(customer_id="testuser", limit=2))
+        assert page["purchases"] == purchases[:2]
+        assert decode_cursor(page["next_cursor"]) == ("2023-12-02T10:00:00+00:00", 2)
+        assert mock_get_purchases.await_args.kwargs["limit"] == 3
+
+        mock_get_purchases.return_value = purchases[2:]
+        page = await get_purchases(PurchaseQuery(limit=2, cursor=page["next_cursor"]))
+        assert page == {"purchases": purchases[2:], "next_cursor": None}
+        assert mock_get_purchases.await_args.kwargs["before"] == (
+            "2023-12-02T10:00:00+00:00",
+            2,
+        )
+
+
+@pytest.mark.asyncio
+async def test_get_purchases_rejects_bad_cursor():
+    with patch("app.service.db_sale.get_purchases") as mock_get_purchases:
+        for cursor in ("not base64!", "WzFd"):
+            with pytest.raises(ValueError, match="Invalid cursor"):
+                await get_purchases(PurchaseQuery(cursor=cursor))
+        mock_get_purchases.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_build_sales_rollups_streams_the_purchases():
+    pages = [
+        [
+            {
+                "id": purchase_id,
+                "good_id": 7,
+                "customer_id": "testuser",
+                "amount_deducted": 2.5,
+                "time": "2023-12-01T10:00:00+00:00",
+            }
+            for purchase_id in range(start, start + 2)
+        ]
+        for start in (1, 3)
+    ]
+
+    async def iter_purchases(page_size):
+        for page in pages:
+            yield page
+
+    with patch("app.service.db_sale.iter_purchases", iter_purchases):
+        result = await build_sales_rollups()
+
+    assert result["purchases"] == 4
+    assert get_sales_rollups("day")["rollups"] == [
+        {
+            "good_id": 7,
+            "start": "2023-12-01T00:00:00+00:00",
+            "units": 4,
+            "revenue": 10.0,
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_record_purchases_goes_through_the_journal_when_enabled():
+    purchase = Purchase(good_id=1, customer_id="testuser", amount_deducted=10.0)
+    journal = MagicMock(append=AsyncMock(return_value=[{"journal_id": "a"}]))
+    with patch("app.service.purchase_journal", journal), patch(
+        "app.service.db_sale.record_purchase"
+    ) as mock_record:
+        assert await record_purchases([purchase]) == [{"journal_id": "a"}]
+    journal.append.assert_awaited_once_with([purchase])
+    mock_record.assert_not_called()
@@ -51,10 +51,10 @@ if __name__ == "__main__":
     goods: list[Good] = generate_fake_goods(10)
 
     # _ = [customer_table.create_customer(customer) for customer in customers]
-    _ = [
-        customer_table.client.table("inventory").insert(good.model_dump()).execute()
-        for good in goods
-    ]
+    # One multi-row insert instead of a round trip per good
+    customer_table.client.table("inventory").insert(
+        [good.model_dump() for good in goods]
+    ).execute()
 
     print(create_fake_customer().model_dump())
     print(generate_fake_goods(10))